@@ -0,0 +1,332 @@
+# acquisition.py
+"""
+Acquisition répartie sur plusieurs processus (ACQUISITION_WORKERS > 0) :
+- les groupes (serveur, namespace, classe) du TagRegistry sont répartis entre les processus ;
+  un groupe plus gros que la part d'un processus est découpé en paquets de variables
+- chaque ordre de lecture porte les classes de scrutation à lire (fast / normal / slow)
+- chaque processus a ses propres sessions OPC UA (pas de GIL partagé) et écrit ses
+  valeurs / qualités directement dans deux tableaux en mémoire partagée, aux
+  positions du registre qui lui sont attribuées
+- un Pipe par processus ne transporte que l'ordre de lecture et l'accusé (numéro de scan,
+  compteurs) : le contrôle des seuils et l'écriture en base restent dans la surveillance
+- les valeurs d'un processus qui n'a pas renvoyé l'accusé du scan en cours (en retard,
+  arrêté) sont écartées de ce scan : un processus en retard qui termine le scan précédent
+  n'y mêle pas ses valeurs
+- au rechargement de la configuration, seuls les processus dont les paquets ont changé sont
+  redémarrés ; les autres gardent leurs sessions OPC UA
+"""
+import multiprocessing
+import time
+from multiprocessing import connection, shared_memory
+
+import numpy as np
+
+from config import ACQUISITION_WORKERS, OPC_SIMULATION, OPC_READ_TIMEOUT
+from opc_client import OPCClient, QUALITY_BAD, QUALITY_SIMULATED
+from tag_registry import to_values
+
+# Compteurs OPCClient remontés par les processus
+OPC_STATS = ("reads", "read_errors", "simulation_fallbacks", "reconnects", "fast_failures")
+
+
+def _views(shm, n):
+    """Valeurs (float64) puis qualités (int8) dans le même segment partagé."""
+    values = np.ndarray(n, np.float64, buffer=shm.buf)
+    quality = np.ndarray(n, np.int8, buffer=shm.buf, offset=8 * n)
+    return values, quality
+
+
+def share(groups, workers):
+    """Part d'un processus : variables par processus si la charge était parfaitement répartie."""
+    total = sum(len(pos) for pos in groups.values())
+    return max(1, -(-total // max(1, workers)))
+
+
+def packets(groups, part):
+    """Groupes {(url, namespace, classe): positions} découpés en paquets [(clé, positions)] d'au plus `part` variables."""
+    return [(key, pos[i:i + part]) for key, pos in groups.items() for i in range(0, len(pos), part)]
+
+
+def _balance(paquets, charges):
+    """Attribue les paquets [(…, positions, …)], du plus gros au plus petit, à la charge la moins remplie."""
+    tailles = [sum(len(p[-2]) for p in charge) for charge in charges]
+    for paquet in sorted(paquets, key=lambda p: len(p[-2]), reverse=True):
+        i = tailles.index(min(tailles))
+        charges[i].append(paquet)
+        tailles[i] += len(paquet[-2])
+    return charges
+
+
+def shard(groups, workers):
+    """
+    Répartit les groupes {(url, namespace, classe): positions} entre `workers` processus.
+    Retourne une liste (un élément par processus utile) de paquets [(clé, positions)] ;
+    les paquets sont attribués du plus gros au plus petit au processus le moins chargé.
+    """
+    paquets = [(key, pos, None) for key, pos in packets(groups, share(groups, workers))]
+    charges = _balance(paquets, [[] for _ in range(workers)])
+    return [[(key, pos) for key, pos, _ in charge] for charge in charges if charge]
+
+
+def _unit_key(unit):
+    """Identité d'un paquet (url, classe, positions, simulation_specs) : inchangé → processus gardé."""
+    url, classe, pos, specs = unit
+    return url, classe, pos.tobytes(), repr(specs)
+
+
+def _read_unit(opc, pos, specs, sim_index, values, quality):
+    """Lit un paquet de variables et l'écrit aux positions `pos` des tableaux partagés."""
+    if not opc.connected:
+        opc.connect()           # refusé immédiatement tant que le disjoncteur est ouvert
+    if opc.connected:
+        results = opc.read_many([spec[:3] for spec in specs])
+        values[pos] = to_values([res.value for res in results])
+        quality[pos] = [res.quality for res in results]
+    elif opc.simulation_mode:
+        opc.stats["reads"] += len(pos)
+        if sim_index is None:
+            opc.simulator.add_tags(specs)
+            sim_index = opc.simulator.positions([spec[0] for spec in specs])
+        values[pos] = opc.simulator.read_at(sim_index)
+        quality[pos] = QUALITY_SIMULATED
+    else:
+        opc.stats["fast_failures"] += len(pos)
+        values[pos] = np.nan
+        quality[pos] = QUALITY_BAD
+    return sim_index
+
+
+def _worker(conn, shm_name, n, units, simulation):
+    """
+    Boucle d'un processus d'acquisition : units = [(url, classe, positions, simulation_specs)].
+    Reçoit (numéro de scan, classes à lire ou None = toutes) — None = arrêt —, lit ses
+    variables de ces classes, répond (numéro, compteurs).
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    values, quality = _views(shm, n)
+    clients = {}
+    for url, _, _, _ in units:
+        if url not in clients:
+            clients[url] = OPCClient(url, simulation=simulation)
+            clients[url].connect()
+    sim_index = [None] * len(units)
+    try:
+        while True:
+            ordre = conn.recv()
+            if ordre is None:
+                break
+            k, classes = ordre
+            for i, (url, classe, pos, specs) in enumerate(units):
+                if classes is not None and classe not in classes:
+                    continue
+                try:
+                    sim_index[i] = _read_unit(clients[url], pos, specs, sim_index[i], values, quality)
+                except Exception as e:
+                    print(f"⚠️ Erreur d'acquisition ({len(pos)} variables sur {url}) : {e}")
+                    values[pos], quality[pos] = np.nan, QUALITY_BAD
+            conn.send((k, {cle: sum(opc.stats[cle] for opc in clients.values()) for cle in OPC_STATS}))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        for opc in clients.values():
+            opc.disconnect()
+        del values, quality
+        shm.close()
+
+
+class AcquisitionPool:
+    """
+    Processus d'acquisition pour toutes les variables du registre.
+    assign(registry) répartit les variables de la configuration courante (seuls les
+    processus dont les paquets changent sont redémarrés) ;
+    scan(classes) lance une lecture des classes de scrutation demandées dans tous les
+    processus et retourne (valeurs, qualités) dans l'ordre du registre. Un processus qui n'a pas répondu après `timeout`
+    secondes laisse ses variables en qualité "bad" pour ce scan ; un processus
+    arrêté est redémarré au scan suivant.
+    """
+
+    def __init__(self, workers=ACQUISITION_WORKERS, simulation=OPC_SIMULATION, timeout=OPC_READ_TIMEOUT):
+        self.workers = workers
+        self.simulation = simulation
+        self.timeout = timeout
+        self.context = multiprocessing.get_context("spawn")
+        self.shm = None
+        self.n = 0
+        self.capacity = 0       # variables que peut contenir le segment partagé (≥ n)
+        self.part = 1           # taille maximale d'un paquet, fixée à la répartition complète
+        self.units = []         # par processus : [(url, classe, positions, simulation_specs)]
+        self.positions = []     # par processus : toutes ses positions (valeurs écartées s'il est en retard)
+        self.processes = []
+        self.pipes = []
+        self.k = 0
+        self.worker_stats = []
+        self.stats = {"scans": 0, "late_workers": 0, "worker_restarts": 0, "reassigned_workers": 0}
+
+    def __len__(self):
+        return len(self.processes)
+
+    def assign(self, registry):
+        """
+        Répartit les variables du registre entre les processus. Premier appel, ou registre
+        plus grand que le segment partagé : tous les processus (re)démarrent. Sinon seuls
+        ceux dont un paquet a changé (variables ajoutées, supprimées, modifiées, positions
+        décalées) sont redémarrés avec les paquets à reprendre ; les autres continuent.
+        """
+        self.n = len(registry)
+        complete = self.shm is None or self.n > self.capacity
+        if complete:
+            # Découpage gardé jusqu'à la prochaine répartition complète : une variable ajoutée
+            # ne change que le dernier paquet de son groupe
+            self.part = share(registry.groups, self.workers)
+        nouveaux = {}
+        for key, pos in packets(registry.groups, self.part):
+            unit = (key[0], key[2], pos, registry.simulation_specs(pos))
+            nouveaux[_unit_key(unit)] = unit
+        if complete:
+            self.close()
+            # Marge pour les variables ajoutées à chaud sans redémarrer tous les processus
+            self.capacity = self.n + self.n // 4
+            self.shm = shared_memory.SharedMemory(create=True, size=max(1, 9 * self.capacity))
+            self.values, self.quality = _views(self.shm, self.capacity)
+            self._replace(list(range(self.workers)), list(nouveaux.values()))
+            print(f"⚙️ Acquisition : {self.n} variables réparties sur {len(self.units)} processus")
+            return
+
+        redemarrer = []
+        for i, units in enumerate(self.units):
+            cles = [_unit_key(unit) for unit in units]
+            if i < self.workers and all(cle in nouveaux for cle in cles):
+                for cle in cles:
+                    del nouveaux[cle]
+            else:
+                redemarrer.append(i)
+        if nouveaux and not redemarrer:
+            if len(self.units) < self.workers:
+                redemarrer.append(len(self.units))
+            else:
+                # Variables ajoutées : reprises par le processus le moins chargé
+                i = min(range(len(self.units)), key=lambda i: len(self.positions[i]))
+                redemarrer.append(i)
+                nouveaux.update((_unit_key(unit), unit) for unit in self.units[i])
+        if redemarrer:
+            self._replace(redemarrer, list(nouveaux.values()))
+            self.stats["reassigned_workers"] += len(redemarrer)
+            print(f"⚙️ Acquisition : {self.n} variables, {len(redemarrer)} processus sur "
+                  f"{len(self.units)} réaffectés")
+
+    def _replace(self, indices, units):
+        """Arrête les processus `indices`, leur répartit `units` puis les redémarre (inutiles → retirés)."""
+        charges = _balance(units, [[] for _ in indices])
+        for i, charge in zip(indices, charges):
+            if i < len(self.units):
+                self._stop(i)
+            else:
+                self.units.append(None)
+                self.positions.append(None)
+                self.processes.append(None)
+                self.pipes.append(None)
+                self.worker_stats.append({})
+            self.units[i] = charge
+            self.positions[i] = np.concatenate([pos for _, _, pos, _ in charge]) if charge \
+                else np.empty(0, np.int64)
+            self.worker_stats[i] = {}
+            if charge:
+                self._start(i)
+        garder = [i for i, units in enumerate(self.units) if units]
+        for liste in (self.units, self.positions, self.processes, self.pipes, self.worker_stats):
+            liste[:] = [liste[i] for i in garder]
+
+    def _start(self, i):
+        if self.pipes[i] is not None:
+            self.pipes[i].close()
+        parent, enfant = self.context.Pipe()
+        process = self.context.Process(
+            target=_worker, args=(enfant, self.shm.name, self.capacity, self.units[i], self.simulation),
+            name=f"acquisition-{i}", daemon=True)
+        process.start()
+        enfant.close()
+        self.processes[i], self.pipes[i] = process, parent
+
+    def _stop(self, i):
+        """Arrêt d'un processus (fin de son ordre en cours, sinon terminate)."""
+        pipe, process = self.pipes[i], self.processes[i]
+        if pipe is not None:
+            try:
+                pipe.send(None)
+            except (OSError, ValueError):
+                pass
+        if process is not None:
+            process.join(timeout=2)
+            if process.is_alive():
+                process.terminate()
+        if pipe is not None:
+            pipe.close()
+        self.processes[i] = self.pipes[i] = None
+
+    def scan(self, classes=None):
+        """
+        Une lecture des variables des classes `classes` (None = toutes) ; retourne
+        (valeurs, qualités), copies des tableaux partagés (seules les positions de ces
+        classes sont à jour). Les positions des processus sans accusé pour ce numéro de
+        scan sont rendues sans valeur, en qualité "bad" : un processus en retard peut encore
+        être en train d'y écrire les valeurs d'un scan précédent.
+        """
+        self.k += 1
+        attente, a_jour = {}, []
+        for i, process in enumerate(self.processes):
+            if not process.is_alive():
+                self.stats["worker_restarts"] += 1
+                self._start(i)
+            try:
+                self.pipes[i].send((self.k, classes))
+                attente[self.pipes[i]] = i
+            except OSError:
+                self.stats["late_workers"] += 1     # redémarré au scan suivant
+
+        fin = time.monotonic() + self.timeout
+        while attente:
+            prets = connection.wait(list(attente), timeout=max(0.0, fin - time.monotonic()))
+            if not prets:
+                break
+            for pipe in prets:
+                try:
+                    k, stats = pipe.recv()
+                except EOFError:
+                    del attente[pipe]
+                    continue
+                self.worker_stats[attente[pipe]] = stats
+                if k == self.k:         # accusés d'un scan précédent (processus en retard) ignorés
+                    a_jour.append(attente.pop(pipe))
+
+        self.stats["scans"] += 1
+        self.stats["late_workers"] += len(attente)
+        values, quality = self.values[:self.n].copy(), self.quality[:self.n].copy()
+        perimees = set(range(len(self.processes))) - set(a_jour)
+        if perimees:
+            pos = np.concatenate([self.positions[i] for i in perimees])
+            values[pos] = np.nan
+            quality[pos] = QUALITY_BAD
+        return values, quality
+
+    def opc_stats(self):
+        """Compteurs OPCClient cumulés de tous les processus."""
+        return {cle: sum(stats.get(cle, 0) for stats in self.worker_stats) for cle in OPC_STATS}
+
+    def close(self):
+        for pipe in self.pipes:
+            try:
+                pipe.send(None)
+            except (OSError, ValueError):
+                pass
+        for process in self.processes:
+            process.join(timeout=2)
+            if process.is_alive():
+                process.terminate()
+        for pipe in self.pipes:
+            pipe.close()
+        self.processes, self.pipes, self.units, self.positions, self.worker_stats = [], [], [], [], []
+        if self.shm is not None:
+            del self.values, self.quality
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
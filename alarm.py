@@ -1,25 +1,76 @@
 # alarm.py
+"""
+Alarmes opérateur :
+- AlarmManager : file non bloquante, dédoublonnage, limite de débit, acquittement
+- sorties (AlarmSink) interchangeables : pop-up Tk, synthèse vocale, console, journal ;
+  choisies par nom (ALARM_SINKS / ALARM_SINKS_HEADLESS) ou passées comme objets.
+  Tkinter et pyttsx3 ne sont importés qu'à la première alarme affichée / prononcée :
+  la surveillance démarre sans écran ni carte son.
+"""
+import logging
+import queue
 import threading
-import tkinter as tk
-from tkinter import messagebox
-import pyttsx3
+import time
+from abc import ABC, abstractmethod
+from collections import deque
 
 # On importe ici pour pouvoir acquitter juste après le clic "OK"
 from database import acquit_alarme
+from config import ALARM_QUEUE_SIZE, ALARM_RATE_LIMIT, ALARM_TTS_QUEUE_SIZE, ALARM_SINKS
 
 
-class AlarmManager:
+# -------- Sorties d'alarme --------
+class AlarmSink(ABC):
+    """
+    Sortie d'alarme. notify() est appelé dans le thread consommateur de AlarmManager,
+    une alarme à la fois ; retourne True si l'opérateur a acquitté l'alarme.
+    """
+
+    @abstractmethod
+    def notify(self, message, variable_id):
+        ...
+
+
+class ConsoleSink(AlarmSink):
+    def notify(self, message, variable_id):
+        print(f"🚨 {message}", flush=True)
+        return False
+
+
+class LogSink(AlarmSink):
+    """Journal "surveillance.alarms" (JSON si metrics.setup_logging() est actif)."""
+
     def __init__(self):
-        # Init TTS (hors thread UI)
-        self.engine = pyttsx3.init()
-        # Petit réglage de voix/volume si tu veux
+        self.logger = logging.getLogger("surveillance.alarms")
+
+    def notify(self, message, variable_id):
+        self.logger.warning(message, extra={"fields": {"variable_id": variable_id}})
+        return False
+
+
+class VoiceSink(AlarmSink):
+    """Synthèse vocale dans son propre thread, avec sa propre file bornée (messages en trop ignorés)."""
+
+    def __init__(self, queue_size=ALARM_TTS_QUEUE_SIZE):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.engine = None
+        threading.Thread(target=self._worker, daemon=True).start()
+
+    def _worker(self):
+        # Le moteur pyttsx3 est créé et utilisé uniquement dans ce thread
         try:
+            import pyttsx3
+            self.engine = pyttsx3.init()
+            # Petit réglage de voix/volume si tu veux
             self.engine.setProperty("rate", 180)
             self.engine.setProperty("volume", 1.0)
-        except Exception:
-            pass
+        except Exception as e:
+            print(f"⚠️ Synthèse vocale indisponible ({e}) : alarmes non prononcées")
+            return
+        while True:
+            self._speak(self.queue.get())
 
-    def _speak(self, text: str):
+    def _speak(self, text):
         try:
             self.engine.say(text)
             self.engine.runAndWait()
@@ -27,23 +78,167 @@ class AlarmManager:
             # On n'échoue pas la logique si la synthèse vocale a un souci
             pass
 
-    def trigger_alarm(self, message: str, variable_id: int | None = None):
-        """
-        Affiche un pop-up bloquant (warning) et lance la synthèse vocale en parallèle.
-        Si l'utilisateur clique OK et que variable_id est fourni, on acquitte en DB.
-        """
-        # Voix en arrière-plan
-        threading.Thread(target=self._speak, args=(message,), daemon=True).start()
+    def notify(self, message, variable_id):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            pass
+        return False
+
+
+class PopupSink(AlarmSink):
+    """Pop-up bloquant (warning) ; un clic sur OK acquitte l'alarme."""
+
+    def __init__(self):
+        self.available = True
+
+    def notify(self, message, variable_id):
+        if not self.available:
+            return False
+        try:
+            import tkinter as tk
+            from tkinter import messagebox
 
-        # Pop-up bloquant depuis un mini root isolé
-        root = tk.Tk()
+            # Pop-up bloquant depuis un mini root isolé (ne bloque que ce thread)
+            root = tk.Tk()
+        except Exception as e:
+            self.available = False
+            print(f"⚠️ Pop-ups d'alarme indisponibles ({e}) : pas d'affichage graphique")
+            return False
         root.withdraw()
         response = messagebox.showwarning("ALERTE CRITIQUE", message, parent=root)
         root.destroy()
+        return response == "ok"
+
+
+SINKS = {"popup": PopupSink, "voice": VoiceSink, "console": ConsoleSink, "log": LogSink}
+
+
+def register_sink(nom, fabrique):
+    """Ajoute une sortie nommée (fabrique() → AlarmSink), utilisable dans ALARM_SINKS."""
+    SINKS[nom] = fabrique
+
+
+def make_sinks(sinks):
+    """Noms (voir SINKS) ou objets AlarmSink → liste d'objets AlarmSink."""
+    resultat = []
+    for sink in sinks:
+        if isinstance(sink, str):
+            if sink not in SINKS:
+                raise ValueError(f"Sortie d'alarme inconnue : {sink!r} (disponibles : {', '.join(SINKS)})")
+            sink = SINKS[sink]()
+        resultat.append(sink)
+    return resultat
+
+
+# -------- Gestionnaire --------
+class AlarmManager:
+    """
+    File d'alarmes non bloquante :
+    - trigger_alarm() ne fait que déposer l'alarme dans une file bornée
+      → la surveillance continue à pleine vitesse, quoi que fasse l'opérateur
+    - un thread consommateur remet les alarmes une par une aux sorties (`sinks`)
+    - une alarme déjà en attente (ou affichée) pour la même variable n'est pas dupliquée
+    - au-delà de ALARM_RATE_LIMIT alarmes par minute, les alarmes sont regroupées
+      dans un message récapitulatif
+    - la synthèse vocale a son propre thread et sa propre file bornée (VoiceSink)
+    """
+
+    def __init__(self, max_pending=ALARM_QUEUE_SIZE, rate_limit=ALARM_RATE_LIMIT, sinks=ALARM_SINKS):
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.rate_limit = rate_limit
+        self.sinks = make_sinks(sinks)
+        self.pending = set()          # variable_id en attente ou affichés
+        self.lock = threading.Lock()
+        self.recent = deque()         # instants des dernières alarmes remises (fenêtre d'une minute)
+        self.suppressed = 0           # alarmes non remises à cause de la limite de débit
+        # Appelé avec variable_id après acquittement opérateur (ex: machine d'états)
+        self.on_acknowledge = None
+        self.stats = {
+            "raised": 0,
+            "deduplicated": 0,
+            "dropped": 0,
+            "rate_limited": 0,
+            "acknowledged": 0,
+            "sink_errors": 0,
+        }
+
+        threading.Thread(target=self._consume, daemon=True).start()
+
+    # -------- Producteur (thread de surveillance) --------
+    def trigger_alarm(self, message: str, variable_id: int | None = None):
+        """
+        Dépose l'alarme dans la file et rend la main immédiatement.
+        Retourne False si l'alarme est ignorée (doublon ou file pleine).
+        """
+        with self.lock:
+            if variable_id is not None and variable_id in self.pending:
+                self.stats["deduplicated"] += 1
+                return False
+            try:
+                self.queue.put_nowait((message, variable_id))
+            except queue.Full:
+                self.stats["dropped"] += 1
+                return False
+            if variable_id is not None:
+                self.pending.add(variable_id)
+            self.stats["raised"] += 1
+        return True
+
+    # -------- Consommateur --------
+    def _consume(self):
+        while True:
+            try:
+                message, variable_id = self.queue.get(timeout=5)
+            except queue.Empty:
+                # Rafale terminée : récapitulatif des alarmes non affichées
+                if self.suppressed and not self._rate_limited():
+                    message = f"{self.suppressed} alarmes non affichées (limite de débit), voir l'historique."
+                    self.suppressed = 0
+                    self._show(message, None)
+                continue
+            try:
+                if self._rate_limited():
+                    self.suppressed += 1
+                    self.stats["rate_limited"] += 1
+                    continue
+
+                if self.suppressed:
+                    message = f"{message}\n\n(+{self.suppressed} autres alarmes non affichées, voir l'historique)"
+                    self.suppressed = 0
+                self._show(message, variable_id)
+            finally:
+                with self.lock:
+                    self.pending.discard(variable_id)
+
+    def _rate_limited(self):
+        now = time.monotonic()
+        while self.recent and now - self.recent[0] > 60:
+            self.recent.popleft()
+        if len(self.recent) >= self.rate_limit:
+            return True
+        self.recent.append(now)
+        return False
+
+    def _show(self, message, variable_id):
+        """
+        Remet l'alarme à chaque sortie, dans l'ordre (voix avant le pop-up bloquant).
+        Si une sortie signale un acquittement et que variable_id est fourni, on acquitte en DB.
+        """
+        acquittee = False
+        for sink in self.sinks:
+            try:
+                acquittee = sink.notify(message, variable_id) or acquittee
+            except Exception as e:
+                self.stats["sink_errors"] += 1
+                print(f"⚠️ Sortie d'alarme {type(sink).__name__} en erreur : {e}")
 
         # Après clic OK → acquittement automatique
-        if response == "ok" and variable_id is not None:
+        if acquittee and variable_id is not None:
             try:
                 acquit_alarme(variable_id)
+                self.stats["acknowledged"] += 1
+                if self.on_acknowledge:
+                    self.on_acknowledge(variable_id)
             except Exception:
                 pass
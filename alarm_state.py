@@ -0,0 +1,119 @@
+# alarm_state.py
+import threading
+
+import numpy as np
+
+from config import ALARM_HYSTERESIS_PCT, ALARM_ON_DELAY, ALARM_OFF_DELAY
+
+# États d'une alarme
+NORMAL = "normal"
+ACTIVE = "active"
+ACKNOWLEDGED = "acknowledged"
+CLEARED = "cleared"
+STATES = (NORMAL, ACTIVE, ACKNOWLEDGED, CLEARED)   # code = position dans ce tuple
+
+# Côté du dépassement
+SIDES = {-1: "min", 1: "max"}
+
+
+def as_slice(pos):
+    """Tranche équivalente si les positions sont contiguës (vue sans copie), sinon les positions."""
+    if len(pos) and pos[-1] - pos[0] + 1 == len(pos):
+        return slice(int(pos[0]), int(pos[-1]) + 1)
+    return pos
+
+
+class AlarmStateMachine:
+    """
+    Machine d'états des alarmes, une entrée par variable (tableaux NumPy indexés
+    par la position de la variable dans le TagRegistry) :
+        normal → active → acknowledged → cleared → (normal)
+    - apparition : valeur hors [min, max] pendant au moins `on_delay` secondes
+    - disparition : valeur revenue dans [min + h, max - h] pendant `off_delay` secondes,
+      avec h = hystérésis en % de l'étendue (max - min) → pas de battement autour du seuil
+    update() traite un lot de variables en quelques comparaisons vectorisées et ne
+    retourne que les changements d'état : c'est le seul moment où la surveillance
+    écrit des événements en base.
+    """
+
+    def __init__(self, hysteresis_pct=ALARM_HYSTERESIS_PCT, on_delay=ALARM_ON_DELAY,
+                 off_delay=ALARM_OFF_DELAY, size=0):
+        self.hysteresis_pct = hysteresis_pct
+        self.on_delay = on_delay
+        self.off_delay = off_delay
+        self.lock = threading.Lock()
+        self.state = np.zeros(size, np.int8)
+        self.side = np.zeros(size, np.int8)        # -1 min, 1 max quand l'alarme est active
+        self.since_out = np.full(size, np.nan)     # début de la sortie de seuil en cours
+        self.since_in = np.full(size, np.nan)      # début du retour dans la bande
+
+    def resize(self, size):
+        """Agrandit les tableaux (nouvelles variables à l'état normal)."""
+        with self.lock:
+            ajout = size - len(self.state)
+            if ajout > 0:
+                self.state = np.r_[self.state, np.zeros(ajout, np.int8)]
+                self.side = np.r_[self.side, np.zeros(ajout, np.int8)]
+                self.since_out = np.r_[self.since_out, np.full(ajout, np.nan)]
+                self.since_in = np.r_[self.since_in, np.full(ajout, np.nan)]
+
+    def get(self, pos):
+        return STATES[self.state[pos]]
+
+    def update(self, pos, values, vmin, vmax, now):
+        """
+        Applique les nouvelles valeurs des variables aux positions `pos` (tableau croissant).
+        Retourne (activées, côtés, revenues, côtés) : positions des nouvelles alarmes
+        (ou changements de côté) et des retours à la normale, avec le côté (-1 / 1).
+        Seules les variables hors seuil, en alarme ou en cours de temporisation passent
+        par la machine d'états ; les autres (le cas courant) coûtent trois comparaisons.
+        """
+        sous, dessus = values < vmin, values > vmax
+        with self.lock:
+            sel = as_slice(pos)
+            a_suivre = sous | dessus | (self.state[sel] != 0) | ~np.isnan(self.since_out[sel])
+            idx = np.flatnonzero(a_suivre)
+            if not len(idx):
+                vide = np.empty(0, np.int64)
+                return vide, np.empty(0, np.int8), vide, np.empty(0, np.int8)
+
+            pos, values, vmin, vmax = pos[idx], values[idx], vmin[idx], vmax[idx]
+            cote = dessus[idx].astype(np.int8) - sous[idx].astype(np.int8)
+            state, side = self.state[pos], self.side[pos]
+            since_out, since_in = self.since_out[pos], self.since_in[pos]
+            en_alarme = (state == 1) | (state == 2)
+            dehors = cote != 0
+
+            # --- Hors seuil : temporisation d'apparition ---
+            candidat = dehors & ~(en_alarme & (cote == side))
+            since_out = np.where(candidat & np.isnan(since_out), now, since_out)
+            active = candidat & (now - since_out >= self.on_delay)
+
+            # --- Dans la plage : hystérésis puis temporisation de disparition ---
+            h = (vmax - vmin) * self.hysteresis_pct / 100.0
+            dans_bande = ~dehors & en_alarme & (values >= vmin + h) & (values <= vmax - h)
+            since_in = np.where(dans_bande, np.where(np.isnan(since_in), now, since_in), np.nan)
+            revenue = dans_bande & (now - since_in >= self.off_delay)
+
+            cotes_revenues = side[revenue]
+            state = np.where(active, 1, np.where(revenue, 3, np.where(~dehors & ~en_alarme, 0, state)))
+            side = np.where(active, cote, np.where(revenue, 0, side))
+
+            self.state[pos] = state
+            self.side[pos] = side
+            self.since_out[pos] = np.where(dehors, since_out, np.nan)
+            self.since_in[pos] = np.where(revenue, np.nan, since_in)
+        return pos[active], cote[active], pos[revenue], cotes_revenues
+
+    def acknowledge(self, pos):
+        """Acquittement opérateur : active → acknowledged."""
+        with self.lock:
+            if self.state[pos] == 1:
+                self.state[pos] = 2
+                return True
+        return False
+
+    def forget(self, pos):
+        with self.lock:
+            self.state[pos], self.side[pos] = 0, 0
+            self.since_out[pos] = self.since_in[pos] = np.nan
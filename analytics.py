@@ -0,0 +1,158 @@
+# analytics.py
+"""
+Analyse statistique des alarmes (ISA-18.2) sur l'historique des événements.
+Tous les calculs sont vectorisés (NumPy / pandas) sur des colonnes complètes :
+aucune boucle Python par événement.
+"""
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+import archive
+import database
+from config import (
+    ANALYTICS_FLOOD_THRESHOLD, ANALYTICS_FLOOD_WINDOW,
+    ANALYTICS_CHATTER_COUNT, ANALYTICS_CHATTER_WINDOW,
+    ANALYTICS_FLEETING_SECONDS, ANALYTICS_STANDING_SECONDS,
+)
+from database import EVENT_RETOUR_NORMAL
+
+
+# -------- Chargement par lots colonnaires --------
+def load_events(debut=None, fin=None, db_file=None):
+    """
+    Charge (ts, variable_id, retour) des événements, en base et archivés (archive.query_events),
+    en tableaux NumPy. retour = True pour un retour à la normale, False pour une apparition d'alarme.
+    db_file : base lue (défaut : database.DB_FILE au moment de l'appel).
+    """
+    db_file = db_file or database.DB_FILE
+    conn = sqlite3.connect(db_file)
+    try:
+        # Sans tri : events_frame() trie déjà par (variable_id, ts)
+        ev = archive.query_events(conn, debut, fin, columns=("ts", "variable_id", "evenement"),
+                                  db_file=db_file, sort=None)
+    finally:
+        conn.close()
+    return events_frame(ev["ts"], ev["variable_id"], ev["evenement"] == EVENT_RETOUR_NORMAL)
+
+
+def events_frame(ts, variable_id, retour):
+    """Événements triés par (variable_id, ts) sous forme de colonnes NumPy."""
+    ordre = np.lexsort((ts, variable_id))
+    return {"ts": ts[ordre], "variable_id": variable_id[ordre], "retour": retour[ordre]}
+
+
+# -------- Épisodes d'alarme --------
+def alarm_episodes(ev):
+    """
+    Regroupe les événements en épisodes (apparition → retour à la normale).
+    Une apparition ouvre un épisode si l'événement précédent de la même variable
+    n'est pas déjà une apparition (changement de côté min → max = même épisode).
+    Retourne (variable_id, début, fin) ; fin = NaN pour un épisode encore ouvert.
+    """
+    ts, var, retour = ev["ts"], ev["variable_id"], ev["retour"]
+    if len(ts) == 0:
+        vide = np.empty(0, np.int64)
+        return {"variable_id": vide, "debut": vide, "fin": np.empty(0, float)}
+
+    meme_var_prec = np.r_[False, var[1:] == var[:-1]]
+    apparition = ~retour
+    ouvre = apparition & ~(meme_var_prec & np.r_[False, apparition[:-1]])
+    debuts = np.flatnonzero(ouvre)
+
+    # Premier retour à la normale après chaque début, dans la même variable
+    retours = np.flatnonzero(retour)
+    fin = np.full(len(debuts), np.nan)
+    if len(retours):
+        k = np.searchsorted(retours, debuts)
+        pos = retours[np.minimum(k, len(retours) - 1)]
+        ok = (k < len(retours)) & (var[pos] == var[debuts])
+        fin[ok] = ts[pos[ok]]
+    return {"variable_id": var[debuts], "debut": ts[debuts], "fin": fin}
+
+
+# -------- Indicateurs --------
+def flood_windows(ev, seuil=ANALYTICS_FLOOD_THRESHOLD, fenetre=ANALYTICS_FLOOD_WINDOW):
+    """Fenêtres de `fenetre` secondes avec plus de `seuil` apparitions (toutes variables)."""
+    ts = ev["ts"][~ev["retour"]]
+    if len(ts) == 0:
+        return pd.DataFrame({"debut": pd.Series(dtype="int64"), "alarmes": pd.Series(dtype="int64")})
+    fenetres = ts // fenetre
+    origine = fenetres.min()
+    comptes = np.bincount(fenetres - origine)
+    idx = np.flatnonzero(comptes > seuil)
+    return pd.DataFrame({"debut": (idx + origine) * fenetre, "alarmes": comptes[idx]})
+
+
+def chattering_counts(ev, nombre=ANALYTICS_CHATTER_COUNT, fenetre=ANALYTICS_CHATTER_WINDOW):
+    """
+    Nombre d'occurrences de battement par variable : `nombre` apparitions
+    de la même alarme en moins de `fenetre` secondes.
+    """
+    app = ~ev["retour"]
+    ts, var = ev["ts"][app], ev["variable_id"][app]
+    if len(ts) < nombre:
+        return pd.Series(dtype="int64")
+    pas = nombre - 1
+    battement = (var[pas:] == var[:-pas]) & (ts[pas:] - ts[:-pas] <= fenetre)
+    ids, comptes = np.unique(var[:-pas][battement], return_counts=True)
+    return pd.Series(comptes, index=ids, dtype="int64")
+
+
+def alarm_statistics(ev, now=None):
+    """
+    Indicateurs par variable :
+    - episodes       : nombre d'épisodes d'alarme
+    - mttr_s         : durée moyenne d'un épisode terminé (temps moyen de retour à la normale)
+    - mtbf_s         : temps moyen entre la fin d'un épisode et le début du suivant
+    - fugitives      : épisodes plus courts que ANALYTICS_FLEETING_SECONDS
+    - battements     : voir chattering_counts
+    - permanentes    : épisodes actifs depuis plus de ANALYTICS_STANDING_SECONDS
+    - permanente_max_s : plus longue durée d'alarme permanente
+    """
+    now = int(now or time.time())
+    ep = alarm_episodes(ev)
+    var, debut, fin = ep["variable_id"], ep["debut"].astype(float), ep["fin"]
+    duree = np.where(np.isnan(fin), now - debut, fin - debut)
+
+    # Temps entre épisodes successifs d'une même variable
+    suivant_meme_var = np.r_[var[1:] == var[:-1], False] if len(var) else np.empty(0, bool)
+    entre = np.full(len(var), np.nan)
+    if len(var) > 1:
+        entre[:-1] = np.where(suivant_meme_var[:-1], debut[1:] - fin[:-1], np.nan)
+
+    permanente = duree > ANALYTICS_STANDING_SECONDS
+    df = pd.DataFrame({
+        "variable_id": var,
+        "termine": ~np.isnan(fin),
+        "mttr_s": np.where(np.isnan(fin), np.nan, duree),
+        "mtbf_s": entre,
+        "fugitive": ~np.isnan(fin) & (duree < ANALYTICS_FLEETING_SECONDS),
+        "permanente": permanente,
+        "permanente_s": np.where(permanente, duree, np.nan),
+    })
+    stats = df.groupby("variable_id").agg(
+        episodes=("termine", "size"),
+        mttr_s=("mttr_s", "mean"),
+        mtbf_s=("mtbf_s", "mean"),
+        fugitives=("fugitive", "sum"),
+        permanentes=("permanente", "sum"),
+        permanente_max_s=("permanente_s", "max"),
+    )
+    stats["battements"] = chattering_counts(ev).reindex(stats.index, fill_value=0)
+    return stats
+
+
+def analyse(debut=None, fin=None, db_file=None, now=None):
+    """Chargement + indicateurs par variable + fenêtres d'avalanche d'alarmes."""
+    ev = load_events(debut, fin, db_file)
+    return {"par_variable": alarm_statistics(ev, now), "avalanches": flood_windows(ev)}
+
+
+# -------- Exécution directe --------
+if __name__ == "__main__":
+    resultat = analyse()
+    print(resultat["par_variable"].to_string())
+    print(f"\n{len(resultat['avalanches'])} fenêtres d'avalanche d'alarmes")
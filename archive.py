@@ -0,0 +1,424 @@
+# archive.py
+"""
+Archivage colonnaire des données froides (fichiers Parquet compressés) :
+- compact() déplace les mois terminés (ARCHIVE_AFTER_DAYS après leur fin) de la table
+  evenements et des partitions brutes de l'historique vers ARCHIVE_DIR, les supprime de
+  la base puis rend l'espace libéré par petits pas (PRAGMA incremental_vacuum) ; la
+  surveillance l'appelle depuis son propre thread, toutes les ARCHIVE_INTERVAL secondes
+- vacuum() : VACUUM complet, une seule fois et surveillance arrêtée, pour passer une base
+  créée avant l'archivage en auto_vacuum incrémental (sans cela les pages libérées
+  restent dans le fichier et sont réutilisées par les écritures suivantes)
+- les alarmes non acquittées (alarme = 1) restent en base ; une fois acquittées, elles
+  rejoignent l'archive du mois au passage suivant (fichier supplémentaire du même mois)
+- un fichier est écrit sous un nom temporaire puis renommé, et n'est déclaré dans
+  historique_meta que par la transaction qui supprime les lignes de la base : un arrêt
+  entre les deux laisse un fichier non déclaré, réécrit au passage suivant
+- query_events() / read_cold() lisent la base et l'archive ensemble : seuls les fichiers
+  des mois demandés sont ouverts, et le filtre sur le temps et les variables est appliqué
+  aux statistiques des groupes de lignes Parquet (groupes hors plage non lus)
+pyarrow est optionnel et importé au premier usage : sans lui rien n'est archivé et les
+lectures ne portent que sur la base.
+
+    python archive.py [compact|status|vacuum]
+"""
+import calendar
+import functools
+import importlib.util
+import operator
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import numpy as np
+
+import database
+from config import (
+    ARCHIVE_ENABLED, ARCHIVE_DIR, ARCHIVE_AFTER_DAYS, ARCHIVE_RETENTION_DAYS,
+    ARCHIVE_COMPRESSION, ARCHIVE_ROW_GROUP, ARCHIVE_VACUUM_PAGES,
+)
+
+ARROW_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+
+# Tables archivées : colonnes et types (evenements : même ordre que SELECT *)
+TABLES = {
+    "evenements": {"id": "int64", "date_heure": "string", "variable_id": "int64",
+                   "evenement": "string", "alarme": "int64", "ts": "int64"},
+    "historique": {"variable_id": "int64", "ts": "int64", "valeur": "float64", "qualite": "int64"},
+}
+EVENT_COLUMNS = tuple(TABLES["evenements"])
+HISTORY_COLUMNS = tuple(TABLES["historique"])
+_NUMPY = {"int64": np.int64, "float64": np.float64, "string": object}
+# Lignes converties à la fois en lecture de la base
+_FETCH_ROWS = 10_000
+
+# Événements archivables d'un mois (idx_evenements_ts), dans l'ordre du temps
+SQL_ARCHIVE_EVENTS = f"""
+    SELECT {", ".join(EVENT_COLUMNS)} FROM evenements
+    WHERE ts >= ? AND ts < ? AND alarme = 0
+    ORDER BY ts
+"""
+SQL_DELETE_EVENT = "DELETE FROM evenements WHERE id = ?"
+
+_pyarrow = None
+_compaction_lock = threading.Lock()
+_vacuum_hint = False
+
+
+def arrow():
+    """Module pyarrow (avec dataset et parquet), importé au premier usage."""
+    global _pyarrow
+    if _pyarrow is None:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+        _pyarrow = pyarrow
+    return _pyarrow
+
+
+def enabled():
+    return ARCHIVE_ENABLED and ARROW_AVAILABLE
+
+
+def archive_dir(db_file=None):
+    return ARCHIVE_DIR or f"{db_file or database.DB_FILE}.archive"
+
+
+# -------- Mois (UTC, comme les partitions de l'historique) --------
+def month_of(ts):
+    return time.strftime("%Y%m", time.gmtime(ts))
+
+
+def month_bounds(mois):
+    """Bornes epoch [début, fin) du mois "AAAAMM"."""
+    annee, numero = int(mois[:4]), int(mois[4:])
+    debut = calendar.timegm((annee, numero, 1, 0, 0, 0))
+    fin = calendar.timegm((annee + numero // 12, numero % 12 + 1, 1, 0, 0, 0))
+    return debut, fin
+
+
+# -------- Fichiers déclarés (historique_meta : "archive:<table>:<mois>" → nombre de fichiers) --------
+def _meta_key(table, mois):
+    return f"archive:{table}:{mois}"
+
+
+def archived_months(c, table):
+    """{mois: nombre de fichiers} des mois archivés de `table` (c : curseur ou connexion)."""
+    prefixe = f"archive:{table}:"
+    rows = c.execute("SELECT cle, valeur FROM historique_meta WHERE cle >= ? AND cle < ?",
+                     (prefixe, prefixe[:-1] + ";")).fetchall()
+    return {cle[len(prefixe):]: n for cle, n in rows}
+
+
+def part_path(table, mois, part, db_file=None):
+    return os.path.join(archive_dir(db_file), table, f"{mois}-{part:03d}.parquet")
+
+
+def cold_files(c, table, debut=None, fin=None, db_file=None):
+    """Fichiers des mois archivés qui recouvrent [debut, fin) (None = sans borne)."""
+    premier = month_of(debut) if debut is not None else ""
+    dernier = month_of(max(debut or 0, fin - 1)) if fin is not None else "999999"
+    return [part_path(table, mois, part, db_file)
+            for mois, n in sorted(archived_months(c, table).items()) if premier <= mois <= dernier
+            for part in range(1, n + 1)]
+
+
+# -------- Lecture --------
+def _empty(table, columns):
+    return {nom: np.empty(0, _NUMPY[TABLES[table][nom]]) for nom in columns}
+
+
+def _from_cursor(table, columns, curseur):
+    """Lignes d'un curseur SQLite → colonnes NumPy, converties par paquets (transposition en cache)."""
+    types = [_NUMPY[TABLES[table][nom]] for nom in columns]
+    morceaux = [[np.empty(0, dtype)] for dtype in types]
+    while rows := curseur.fetchmany(_FETCH_ROWS):
+        for morceau, valeurs, dtype in zip(morceaux, zip(*rows), types):
+            morceau.append(np.array(valeurs, dtype))
+    return {nom: np.concatenate(morceau) for nom, morceau in zip(columns, morceaux)}
+
+
+def _sorted(colonnes, cle):
+    ordre = np.argsort(colonnes[cle], kind="stable")
+    return {nom: valeurs[ordre] for nom, valeurs in colonnes.items()}
+
+
+def _filter(debut, fin, var_ids):
+    champ = arrow().dataset.field
+    conditions = []
+    if debut is not None:
+        conditions.append(champ("ts") >= debut)
+    if fin is not None:
+        conditions.append(champ("ts") < fin)
+    if var_ids is not None:
+        conditions.append(champ("variable_id").isin(list(var_ids)))
+    return functools.reduce(operator.and_, conditions) if conditions else None
+
+
+def read_cold(c, table, debut=None, fin=None, var_ids=None, columns=None, db_file=None, sort=None):
+    """
+    Lignes archivées de `table` ("evenements" ou "historique") sur [debut, fin),
+    éventuellement limitées aux variables `var_ids`, en colonnes NumPy {nom: tableau}.
+    sort : colonne de tri (par défaut, ordre des fichiers).
+    """
+    fichiers = cold_files(c, table, debut, fin, db_file) if ARROW_AVAILABLE else []
+    return read_files(table, fichiers, debut, fin, var_ids, columns, sort)
+
+
+def read_files(table, fichiers, debut=None, fin=None, var_ids=None, columns=None, sort=None):
+    """Comme read_cold, sur une liste de fichiers déjà établie (cold_files) : aucun accès à la base."""
+    columns = list(columns or TABLES[table])
+    if not fichiers:
+        return _empty(table, columns)
+    donnees = arrow().dataset.dataset(fichiers, format="parquet").to_table(
+        columns=columns, filter=_filter(debut, fin, var_ids))
+    resultat = {nom: np.asarray(donnees.column(nom).to_numpy(), dtype=_NUMPY[TABLES[table][nom]])
+                for nom in columns}
+    return _sorted(resultat, sort) if sort else resultat
+
+
+def query_events(c, debut=None, fin=None, var_ids=None, columns=EVENT_COLUMNS, db_file=None, sort="ts"):
+    """
+    Événements sur [debut, fin) (epoch s, None = sans borne), de la base et de l'archive,
+    en colonnes NumPy {nom: tableau} triées par `sort` (None = sans tri).
+    c : curseur ou connexion sur la base.
+    """
+    conditions, params = [], []
+    if debut is not None:
+        conditions.append("ts >= ?")
+        params.append(debut)
+    if fin is not None:
+        conditions.append("ts < ?")
+        params.append(fin)
+    if var_ids is not None:
+        conditions.append(f"variable_id IN ({','.join('?' * len(var_ids))})")
+        params.extend(var_ids)
+    where = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+    chaud = _from_cursor("evenements", columns,
+                         c.execute(f"SELECT {', '.join(columns)} FROM evenements {where}", params))
+    froid = read_cold(c, "evenements", debut, fin, var_ids, columns, db_file)
+    tous = {nom: np.concatenate([froid[nom], chaud[nom]]) for nom in columns}
+    return _sorted(tous, sort) if sort else tous
+
+
+def latest_events(c, limit, columns=EVENT_COLUMNS, db_file=None):
+    """Les `limit` événements archivés les plus récents, du plus récent au plus ancien."""
+    morceaux, reste = [], limit
+    for mois in sorted(archived_months(c, "evenements"), reverse=True):
+        if reste <= 0:
+            break
+        debut, fin = month_bounds(mois)
+        colonnes = read_cold(c, "evenements", debut, fin, columns=columns, db_file=db_file, sort="ts")
+        colonnes = {nom: valeurs[::-1][:reste] for nom, valeurs in colonnes.items()}
+        morceaux.append(colonnes)
+        reste -= len(colonnes["ts"])
+    if not morceaux:
+        return _empty("evenements", columns)
+    return {nom: np.concatenate([m[nom] for m in morceaux]) for nom in columns}
+
+
+# -------- Écriture --------
+def _write_parquet(chemin, table, columns, curseur, cle=None):
+    """
+    Écrit les lignes de `curseur` (un groupe Parquet par paquet de ARCHIVE_ROW_GROUP lignes)
+    dans `chemin` : fichier temporaire, fsync puis renommage. Aucun fichier si aucune ligne.
+    Retourne (nombre de lignes, valeurs de la colonne `cle`).
+    """
+    pa = arrow()
+    schema = pa.schema([(nom, getattr(pa, TABLES[table][nom])()) for nom in columns])
+    os.makedirs(os.path.dirname(chemin), exist_ok=True)
+    temporaire = chemin + ".tmp"
+    lignes, cles = 0, []
+    with pa.parquet.ParquetWriter(temporaire, schema, compression=ARCHIVE_COMPRESSION) as writer:
+        while rows := curseur.fetchmany(ARCHIVE_ROW_GROUP):
+            valeurs = list(zip(*rows))
+            writer.write_batch(pa.record_batch(
+                [pa.array(v, type=champ.type) for v, champ in zip(valeurs, schema)], schema=schema))
+            lignes += len(rows)
+            if cle:
+                cles.extend(valeurs[columns.index(cle)])
+    if not lignes:
+        os.remove(temporaire)
+        return 0, cles
+    with open(temporaire, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(temporaire, chemin)
+    return lignes, cles
+
+
+def _next_part(lecture, table, mois):
+    return archived_months(lecture, table).get(mois, 0) + 1
+
+
+def _archive_events_month(lecture, mois):
+    """Événements terminés (alarme = 0) du mois → Parquet, puis suppression par id."""
+    debut, fin = month_bounds(mois)
+    part = _next_part(lecture, "evenements", mois)
+    lignes, ids = _write_parquet(part_path("evenements", mois, part), "evenements", EVENT_COLUMNS,
+                                 lecture.execute(SQL_ARCHIVE_EVENTS, (debut, fin)), cle="id")
+    if lignes:
+        # Suppression des seules lignes écrites : une alarme acquittée entre-temps attend le passage suivant
+        with database.transaction() as c:
+            c.executemany(SQL_DELETE_EVENT, ((i,) for i in ids))
+            c.execute("INSERT OR REPLACE INTO historique_meta (cle, valeur) VALUES (?, ?)",
+                      (_meta_key("evenements", mois), part))
+    return lignes
+
+
+def _archive_history_partition(lecture, table):
+    """Partition brute d'un mois terminé → Parquet (ordre de la clé variable_id, ts), puis DROP TABLE."""
+    mois = table[len(database.HISTORY_PREFIX):]
+    _, fin = month_bounds(mois)
+    row = lecture.execute("SELECT valeur FROM historique_meta WHERE cle = 'rollup_1m'").fetchone()
+    if not row or row[0] < fin:
+        return 0        # agrégats du mois pas encore calculés
+    part = _next_part(lecture, "historique", mois)
+    lignes, _ = _write_parquet(part_path("historique", mois, part), "historique", HISTORY_COLUMNS,
+                               lecture.execute(f"SELECT {', '.join(HISTORY_COLUMNS)} FROM {table}"))
+    with database.transaction() as c:
+        # Échantillon arrivé pendant l'écriture (rejeu du journal) → nouvel essai au passage suivant
+        if c.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] != lignes:
+            return 0
+        database.drop_history_partition(c, table)
+        if lignes:
+            c.execute("INSERT OR REPLACE INTO historique_meta (cle, valeur) VALUES (?, ?)",
+                      (_meta_key("historique", mois), part))
+    return lignes
+
+
+def _apply_cold_retention(now):
+    """Fichiers des mois plus anciens que ARCHIVE_RETENTION_DAYS : déclaration puis fichiers supprimés."""
+    if ARCHIVE_RETENTION_DAYS is None:
+        return 0
+    limite = month_of(now - ARCHIVE_RETENTION_DAYS * 86400)
+    supprimes = 0
+    for table in TABLES:
+        with database.transaction() as c:
+            anciens = {mois: n for mois, n in archived_months(c, table).items() if mois < limite}
+            c.executemany("DELETE FROM historique_meta WHERE cle = ?",
+                          [(_meta_key(table, mois),) for mois in anciens])
+        for mois, n in anciens.items():
+            for part in range(1, n + 1):
+                try:
+                    os.remove(part_path(table, mois, part))
+                    supprimes += 1
+                except FileNotFoundError:
+                    pass
+    return supprimes
+
+
+def incremental_vacuum(pages=ARCHIVE_VACUUM_PAGES):
+    """
+    Rend au système les pages libres de la base, par pas de `pages` (verrou relâché entre
+    deux pas : l'écriture des scans continue). Jamais de VACUUM complet : une base qui n'est
+    pas en auto_vacuum incrémental est laissée telle quelle (voir vacuum()).
+    Retourne le nombre de pages libérées.
+    """
+    global _vacuum_hint
+    with database.transaction() as c:
+        if c.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            if not _vacuum_hint:
+                _vacuum_hint = True
+                print("ℹ️ Base sans auto_vacuum incrémental : espace libéré réutilisé mais pas rendu "
+                      "(python archive.py vacuum, surveillance arrêtée)")
+            return 0
+    liberees, precedent = 0, None
+    while True:
+        with database.transaction() as c:
+            libres = c.execute("PRAGMA freelist_count").fetchone()[0]
+            if not libres or libres == precedent:
+                return liberees
+            # fetchall() : chaque ligne lue libère des pages, execute() seul s'arrêterait à la première
+            c.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+        liberees += min(libres, pages)
+        precedent = libres
+
+
+def compact(now=None):
+    """
+    Un passage d'archivage : mois terminés des événements et de l'historique brut → Parquet,
+    rétention des fichiers, puis libération de l'espace. Retourne les compteurs du passage.
+    """
+    if not ARROW_AVAILABLE:
+        raise RuntimeError("pyarrow n'est pas installé : archivage Parquet indisponible")
+    now = int(now or time.time())
+    limite = month_of(now - ARCHIVE_AFTER_DAYS * 86400)     # mois archivables : < limite
+    debut = time.perf_counter()
+    resultat = {"evenements": 0, "historique": 0, "fichiers_supprimes": 0, "pages_liberees": 0}
+
+    with _compaction_lock:
+        lecture = sqlite3.connect(database.DB_FILE)
+        try:
+            premier = lecture.execute("SELECT MIN(ts) FROM evenements").fetchone()[0]
+            if premier is not None:
+                mois = month_of(premier)
+                while mois < limite:
+                    resultat["evenements"] += _archive_events_month(lecture, mois)
+                    mois = month_of(month_bounds(mois)[1])
+
+            for table in database.list_history_partitions(lecture.cursor()):
+                if table[len(database.HISTORY_PREFIX):] < limite:
+                    resultat["historique"] += _archive_history_partition(lecture, table)
+        finally:
+            lecture.close()
+
+        resultat["fichiers_supprimes"] = _apply_cold_retention(now)
+        if resultat["evenements"] or resultat["historique"]:
+            resultat["pages_liberees"] = incremental_vacuum()
+
+    resultat["duree_s"] = time.perf_counter() - debut
+    if resultat["evenements"] or resultat["historique"]:
+        print(f"🗄️ Archivage : {resultat['evenements']} événements, {resultat['historique']} valeurs brutes "
+              f"→ Parquet ({resultat['pages_liberees']} pages libérées, {resultat['duree_s']:.1f}s)")
+    return resultat
+
+
+def vacuum(db_file=None):
+    """
+    Opération hors ligne (surveillance arrêtée) : VACUUM complet qui passe la base en
+    auto_vacuum incrémental. La base entière est réécrite et verrouillée pendant l'opération.
+    Retourne la taille du fichier (octets) avant et après.
+    """
+    db_file = db_file or database.DB_FILE
+    avant = os.path.getsize(db_file)
+    conn = sqlite3.connect(db_file, isolation_level=None)
+    try:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    return avant, os.path.getsize(db_file)
+
+
+def status(db_file=None):
+    """{table: [(mois, fichiers, octets)]} de l'archive, et pages libres de la base."""
+    conn = sqlite3.connect(db_file or database.DB_FILE)
+    try:
+        resultat = {}
+        for table in TABLES:
+            resultat[table] = [
+                (mois, n, sum(os.path.getsize(part_path(table, mois, p, db_file)) for p in range(1, n + 1)))
+                for mois, n in sorted(archived_months(conn, table).items())]
+        resultat["pages_libres"] = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return resultat
+    finally:
+        conn.close()
+
+
+# -------- Exécution directe --------
+if __name__ == "__main__":
+    commande = sys.argv[1] if len(sys.argv) > 1 else "compact"
+    database.init_db()
+    if commande == "compact":
+        print(compact())
+    elif commande == "vacuum":
+        print("🧹 VACUUM complet de la base (la surveillance doit être arrêtée)…")
+        avant, apres = vacuum()
+        print(f"Base : {avant / 1e6:.1f} Mo → {apres / 1e6:.1f} Mo, auto_vacuum incrémental")
+    else:
+        etat = status()
+        for table in TABLES:
+            for mois, n, octets in etat[table]:
+                print(f"{table} {mois} : {n} fichier(s), {octets / 1e6:.1f} Mo")
+        print(f"Pages libres dans la base : {etat['pages_libres']}")
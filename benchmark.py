@@ -0,0 +1,594 @@
+# benchmark.py
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import database
+from config import SCAN_CLASS_DEFAULT
+
+
+def _legacy_scan(db_file, rows):
+    """Ancien chemin : une connexion + un commit par appel (update, log_event, acquit_alarme)."""
+    for var_id, value, vmin, vmax in rows:
+        conn = sqlite3.connect(db_file)
+        conn.execute(database.SQL_UPDATE_VARIABLE,
+                     (value, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), 0, var_id))
+        conn.commit()
+        conn.close()
+
+        conn = sqlite3.connect(db_file)
+        if value < vmin or value > vmax:
+            conn.execute(database.SQL_INSERT_EVENT,
+                         (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), int(time.time()), var_id, "max", 1))
+        else:
+            conn.execute(database.SQL_ACQUIT_VARIABLE, (var_id,))
+            conn.execute(database.SQL_ACQUIT_EVENTS, (var_id,))
+        conn.commit()
+        conn.close()
+
+
+def _batched_scan(rows):
+    """Nouveau chemin : connexion partagée + flush_scan (une transaction par scan)."""
+    updates, events, acquits = [], [], []
+    for var_id, value, vmin, vmax in rows:
+        updates.append((var_id, value, 0))
+        if value < vmin or value > vmax:
+            events.append((var_id, "max", 1))
+        else:
+            acquits.append(var_id)
+    database.flush_scan(updates, events, acquits)
+
+
+def _prepare_db(db_file, n_tags, endpoints=(None,)):
+    """Base de n_tags variables ; `endpoints` : serveurs OPC UA, chacun reçoit un bloc contigu de variables."""
+    conn = sqlite3.connect(db_file)
+    database._create_tables(conn.cursor())
+    database.migrate(conn.cursor())
+    conn.executemany("""
+        INSERT INTO variables (nom_variable, adresse_opc, type, min, max, endpoint)
+        VALUES (?, ?, 'reel', 0, 100, ?)
+    """, [(f"Tag{i}", f"ns=2;s=Bench.Tag{i}", endpoints[i * len(endpoints) // n_tags]) for i in range(n_tags)])
+    conn.commit()
+    conn.close()
+
+
+def bench_database(n_tags=2000, scans=3, alarm_ratio=0.05):
+    """
+    Débit d'écriture d'un scan (variables/s) avant et après la couche de connexion partagée.
+    Retourne {"legacy": tags/s, "batched": tags/s}.
+    """
+    tmpdir = tempfile.mkdtemp(prefix="bench_db_")
+    legacy_file = os.path.join(tmpdir, "legacy.db")
+    batched_file = os.path.join(tmpdir, "batched.db")
+    _prepare_db(legacy_file, n_tags)
+    _prepare_db(batched_file, n_tags)
+
+    ancien_db_file = database.DB_FILE
+    database.close_shared_connection()
+    database.DB_FILE = batched_file
+    try:
+        rng = random.Random(42)
+        rows = [(i + 1, rng.uniform(0, 100 / (1 - alarm_ratio)), 0, 100) for i in range(n_tags)]
+
+        resultats = {}
+        for nom, scan in (("legacy", lambda: _legacy_scan(legacy_file, rows)),
+                          ("batched", lambda: _batched_scan(rows))):
+            debut = time.perf_counter()
+            for _ in range(scans):
+                scan()
+            resultats[nom] = n_tags * scans / (time.perf_counter() - debut)
+        return resultats
+    finally:
+        database.close_shared_connection()
+        database.DB_FILE = ancien_db_file
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def bench_history(n_tags=1000, jours=30, minutes_brutes=10):
+    """
+    Historique : ingestion brute à 1 Hz, calcul des agrégats, puis lecture
+    d'un mois pour toutes les variables (résolution automatique → agrégats 1 h).
+    Les agrégats du mois sont générés directement : un mois brut pour 1000
+    variables représenterait 2,6 milliards de lignes.
+    """
+    import history
+
+    tmpdir = tempfile.mkdtemp(prefix="bench_hist_")
+    db_file = os.path.join(tmpdir, "history.db")
+    _prepare_db(db_file, n_tags)
+
+    ancien_db_file = database.DB_FILE
+    database.close_shared_connection()
+    database.DB_FILE = db_file
+    try:
+        database.init_db()
+        rng = random.Random(42)
+        fin = int(time.time()) // 3600 * 3600
+        debut_brut = fin - minutes_brutes * 60
+        resultats = {}
+
+        debut = time.perf_counter()
+        for ts in range(debut_brut, fin):
+            with database.transaction() as c:
+                database.append_history(c, ts, [(i + 1, rng.uniform(0, 100), 0) for i in range(n_tags)])
+        resultats["ingestion_samples_per_s"] = n_tags * (fin - debut_brut) / (time.perf_counter() - debut)
+
+        debut = time.perf_counter()
+        history.rollup(fin)
+        resultats["rollup_s"] = time.perf_counter() - debut
+
+        with database.transaction() as c:
+            c.executemany(
+                "INSERT OR REPLACE INTO historique_1h (variable_id, ts, vmin, vmax, vavg, n) VALUES (?, ?, ?, ?, ?, 3600)",
+                ((i + 1, ts, 0.0, 100.0, 50.0) for i in range(n_tags)
+                 for ts in range(fin - jours * 86400, fin, 3600)))
+
+        ids = list(range(1, n_tags + 1))
+        debut = time.perf_counter()
+        history.query_history(ids[n_tags // 2], fin - jours * 86400, fin)
+        resultats["query_month_one_tag_s"] = time.perf_counter() - debut
+
+        debut = time.perf_counter()
+        rows = history.query_history(ids, fin - jours * 86400, fin)
+        resultats["query_month_all_tags_s"] = time.perf_counter() - debut
+        resultats["query_month_rows"] = len(rows)
+
+        debut = time.perf_counter()
+        history.query_history(ids[n_tags // 2], debut_brut, fin, resolution="raw")
+        resultats["query_raw_one_tag_s"] = time.perf_counter() - debut
+        return resultats
+    finally:
+        database.close_shared_connection()
+        database.DB_FILE = ancien_db_file
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def bench_analytics(n_tags=1000, n_episodes=1_000_000, jours=365, seed=42):
+    """
+    Analyse des alarmes sur un an d'historique synthétique :
+    n_episodes apparitions + retours à la normale répartis sur n_tags variables.
+    Mesure séparément le chargement depuis SQLite et les calculs vectorisés.
+    """
+    import numpy as np
+    import analytics
+
+    rng = np.random.default_rng(seed)
+    fin = int(time.time())
+    debut = rng.integers(fin - jours * 86400, fin, n_episodes)
+    duree = rng.exponential(600, n_episodes).astype(np.int64) + 1
+    var = rng.integers(1, n_tags + 1, n_episodes)
+
+    tmpdir = tempfile.mkdtemp(prefix="bench_analytics_")
+    db_file = os.path.join(tmpdir, "analytics.db")
+    _prepare_db(db_file, n_tags)
+    try:
+        conn = sqlite3.connect(db_file)
+        conn.executemany(
+            "INSERT INTO evenements (date_heure, ts, variable_id, evenement, alarme) VALUES ('', ?, ?, ?, 0)",
+            ((int(t), int(v), ev) for t, v, ev in zip(
+                np.r_[debut, debut + duree], np.r_[var, var],
+                ["max"] * n_episodes + [database.EVENT_RETOUR_NORMAL] * n_episodes)))
+        conn.commit()
+        conn.close()
+
+        resultats = {"events": 2 * n_episodes}
+        t0 = time.perf_counter()
+        ev = analytics.load_events(db_file=db_file)
+        resultats["load_s"] = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        stats = analytics.alarm_statistics(ev, now=fin)
+        analytics.flood_windows(ev)
+        resultats["compute_s"] = time.perf_counter() - t0
+        resultats["variables"] = len(stats)
+        return resultats
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def bench_thresholds(n_tags=100_000, scans=50, seed=42):
+    """Contrôle des seuils (machine d'états vectorisée) de n_tags variables : durée moyenne par scan."""
+    import numpy as np
+    from alarm_state import AlarmStateMachine
+
+    rng = np.random.default_rng(seed)
+    pos = np.arange(n_tags)
+    vmin, vmax = np.zeros(n_tags), np.full(n_tags, 100.0)
+    etats = AlarmStateMachine(size=n_tags)
+    lots = [rng.normal(50, 15, n_tags) for _ in range(scans)]   # ~0,5 % des variables en alarme
+    debut = time.perf_counter()
+    for i, valeurs in enumerate(lots):
+        etats.update(pos, valeurs, vmin, vmax, float(i))
+    return {"tags": n_tags, "eval_s": (time.perf_counter() - debut) / scans}
+
+
+def bench_simulator(n_tags=100_000, pas=60, seed=42):
+    """
+    Génération d'un pas pour n_tags variables (objectif : usine de 100 000 variables à 1 Hz)
+    et reproductibilité : deux simulateurs de même graine donnent les mêmes valeurs.
+    """
+    import numpy as np
+    from simulator import PlantSimulator
+
+    t0 = time.perf_counter()
+    sim = PlantSimulator.synthetic(n_tags, seed=seed)
+    resultats = {"setup_s": time.perf_counter() - t0}
+
+    t0 = time.perf_counter()
+    for _ in range(pas):
+        valeurs = sim.step()
+    resultats["step_s"] = (time.perf_counter() - t0) / pas
+    resultats["alarmes"] = int(np.count_nonzero((valeurs < 0) | (valeurs > 100)))
+
+    autre = PlantSimulator.synthetic(n_tags, seed=seed)
+    for _ in range(pas):
+        autre.step()
+    resultats["reproductible"] = bool(np.array_equal(valeurs, autre.values))
+    return resultats
+
+
+# -------- Chaîne complète : acquisition → seuils → base --------
+PIPELINE_SIZES = (100, 1_000, 10_000, 100_000)
+PIPELINE_RESULTS = "benchmark_results.json"
+# Métriques comparées d'une version à l'autre : +1 = plus grand est pire, -1 = plus petit est pire
+PIPELINE_METRICS = {
+    "scan_p50_s": 1, "scan_p95_s": 1, "scan_max_s": 1,
+    "db_rows_per_s": -1, "alarm_latency_p95_s": 1, "peak_rss_mb": 1,
+}
+
+
+class HeadlessAlarmManager:
+    """Remplace AlarmManager (pas de Tk ni de synthèse vocale) : enregistre l'instant de chaque alarme."""
+
+    def __init__(self):
+        self.raised = []            # (perf_counter, variable_id)
+        self.on_acknowledge = None
+        self.stats = {"raised": 0}
+
+    def trigger_alarm(self, message, variable_id=None):
+        self.raised.append((time.perf_counter(), variable_id))
+        self.stats["raised"] += 1
+        return True
+
+
+def _percentile(valeurs, q):
+    import numpy as np
+    return float(np.percentile(valeurs, q)) if len(valeurs) else None
+
+
+def bench_pipeline(n_tags, scans=10, seed=42):
+    """
+    Scans complets de Surveillance (scan_once : lecture simulée, machine d'états,
+    flush_scan + historique) sur n_tags variables, sans interface.
+    Le simulateur avance d'un pas par scan (indépendant de l'horloge) ; les
+    probabilités de défaut sont relevées pour produire des alarmes à toutes les tailles.
+    - durée d'un scan : p50 / p95 / max
+    - lignes écrites par seconde (variables + historique + événements)
+    - latence d'alarme : début du scan → remise à l'AlarmManager
+    - pic de mémoire résidente du processus
+    """
+    from opc_client import OPCClient
+    from simulator import PlantSimulator
+    from surveillance import Surveillance
+
+    tmpdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    db_file = os.path.join(tmpdir, "pipeline.db")
+    _prepare_db(db_file, n_tags)
+
+    ancien_db_file = database.DB_FILE
+    database.close_shared_connection()
+    database.DB_FILE = db_file
+    try:
+        alarmes = HeadlessAlarmManager()
+        surveillance = Surveillance(interval=float("inf"), alarm_manager=alarmes)
+        surveillance.open_writer()
+        opc = OPCClient(simulation="always")
+        opc.simulator = PlantSimulator(seed=seed, p_step=0.005, p_spike=0.005, realtime=False)
+        surveillance.sessions[(opc.server_url, "ns=2", SCAN_CLASS_DEFAULT)] = opc
+
+        async def executer():
+            semaphore = asyncio.Semaphore(1)
+            durees, latences = [], []
+            for _ in range(scans):
+                opc.simulator.step()
+                deja = len(alarmes.raised)
+                debut = time.perf_counter()
+                durees.append(await surveillance.scan_once(semaphore))
+                latences.extend(t - debut for t, _ in alarmes.raised[deja:])
+            return durees, latences
+
+        durees, latences = asyncio.run(executer())
+        # Écriture différée : le débit compte aussi l'attente des derniers lots
+        debut = time.perf_counter()
+        surveillance.writer.flush()
+        attente_ecriture = time.perf_counter() - debut
+
+        with database.transaction() as c:
+            c.execute("SELECT COUNT(*) FROM evenements")
+            lignes = c.fetchone()[0]
+            for partition in database.list_history_partitions(c):
+                c.execute(f"SELECT COUNT(*) FROM {partition}")
+                lignes += c.fetchone()[0]
+        lignes += n_tags * scans   # mises à jour de la table variables
+
+        return {
+            "tags": n_tags,
+            "scans": scans,
+            "scan_p50_s": _percentile(durees, 50),
+            "scan_p95_s": _percentile(durees, 95),
+            "scan_max_s": max(durees),
+            "db_rows_per_s": lignes / (sum(durees) + attente_ecriture),
+            "alarms": len(latences),
+            "alarm_latency_p50_s": _percentile(latences, 50),
+            "alarm_latency_p95_s": _percentile(latences, 95),
+            # ru_maxrss : kilo-octets sous Linux, octets sous macOS
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                           / (1024 * 1024 if sys.platform == "darwin" else 1024),
+        }
+    finally:
+        database.close_shared_connection()
+        database.DB_FILE = ancien_db_file
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def run_pipeline_suite(sizes=PIPELINE_SIZES, scans=10):
+    """Une taille par processus neuf : le pic de mémoire mesuré est celui de cette taille seule."""
+    resultats = {}
+    contexte = multiprocessing.get_context("spawn")
+    for n in sizes:
+        with ProcessPoolExecutor(max_workers=1, mp_context=contexte) as pool:
+            resultats[str(n)] = pool.submit(bench_pipeline, n, scans).result()
+    return resultats
+
+
+# -------- Acquisition répartie sur plusieurs processus --------
+def _serve_tags(url, adresses, pret, arret):
+    """Serveur OPC UA de banc d'essai (processus dédié) : une variable par adresse, valeurs fixes."""
+    from opc_server import LocalOPCServer
+    server = LocalOPCServer(url)
+    server.add_variables([(adresse, adresse.split("=")[-1], 50.0 + i % 40, "reel")
+                          for i, adresse in enumerate(adresses)])
+    with server:
+        pret.set()
+        arret.wait()
+
+
+def bench_sharded(n_tags=20_000, servers=4, workers=(1, 2, 4), scans=5, port=48400):
+    """
+    Acquisition répartie (AcquisitionPool) : n_tags variables sur `servers` serveurs
+    OPC UA locaux (un processus chacun), lues par 1, 2, 4… processus d'acquisition.
+    Retourne {processus: {"scan_p50_s", "tags_per_s", "speedup"}}. Le gain ne suit
+    le nombre de processus que si la machine a assez de cœurs pour les serveurs et
+    les processus d'acquisition (os.cpu_count() est joint aux résultats).
+    """
+    from acquisition import AcquisitionPool
+    from tag_registry import TagRegistry
+
+    urls = [f"opc.tcp://127.0.0.1:{port + i}" for i in range(servers)]
+    tmpdir = tempfile.mkdtemp(prefix="bench_sharded_")
+    db_file = os.path.join(tmpdir, "sharded.db")
+    _prepare_db(db_file, n_tags, urls)
+
+    contexte = multiprocessing.get_context("spawn")
+    arret = contexte.Event()
+    serveurs = []
+    for i, url in enumerate(urls):
+        pret = contexte.Event()
+        adresses = [f"ns=2;s=Bench.Tag{t}" for t in range(n_tags) if t * servers // n_tags == i]
+        process = contexte.Process(target=_serve_tags, args=(url, adresses, pret, arret), daemon=True)
+        process.start()
+        serveurs.append((process, pret))
+
+    ancien_db_file = database.DB_FILE
+    database.close_shared_connection()
+    database.DB_FILE = db_file
+    resultats = {"cpu_count": os.cpu_count()}
+    try:
+        for _, pret in serveurs:
+            pret.wait(timeout=600)
+        registry = TagRegistry()
+        registry.load()
+        for w in workers:
+            pool = AcquisitionPool(w, simulation="never", timeout=600)
+            try:
+                pool.assign(registry)
+                pool.scan()             # connexion et résolution des nœuds
+                durees = []
+                for _ in range(scans):
+                    debut = time.perf_counter()
+                    _, qualites = pool.scan()
+                    durees.append(time.perf_counter() - debut)
+            finally:
+                pool.close()
+            p50 = _percentile(durees, 50)
+            resultats[str(w)] = {"scan_p50_s": p50, "tags_per_s": n_tags / p50,
+                                 "bad": int((qualites != 0).sum())}
+        reference = resultats[str(workers[0])]["tags_per_s"]
+        for w in workers:
+            resultats[str(w)]["speedup"] = resultats[str(w)]["tags_per_s"] / reference
+        return resultats
+    finally:
+        arret.set()
+        for process, _ in serveurs:
+            process.join(timeout=10)
+        database.close_shared_connection()
+        database.DB_FILE = ancien_db_file
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+# -------- Démarrage du service sans interface --------
+def bench_startup(n_tags=10_000, runs=5):
+    """
+    Temps entre le lancement de `python main.py --once` et la fin du premier scan
+    (imports, migrations, chargement du registre, premier scan simulé), mesuré par le
+    processus lui-même et vu de l'extérieur (démarrage de l'interpréteur compris).
+    Vérifie aussi qu'aucun module graphique / audio / PDF / pandas n'est chargé.
+    """
+    from config import STARTUP_TARGET
+
+    tmpdir = tempfile.mkdtemp(prefix="bench_startup_")
+    db_file = os.path.join(tmpdir, "startup.db")
+    _prepare_db(db_file, n_tags)
+    main_py = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    try:
+        internes, externes, lourds = [], [], set()
+        for _ in range(runs):
+            debut = time.perf_counter()
+            sortie = subprocess.run(
+                [sys.executable, main_py, "--once", "--db", db_file, "--simulation", "always"],
+                capture_output=True, text=True, timeout=600, check=True, cwd=tmpdir).stdout
+            externes.append(time.perf_counter() - debut)
+            mesure = json.loads(sortie.strip().splitlines()[-1])
+            internes.append(mesure["time_to_first_scan_s"])
+            lourds.update(mesure["heavy_modules"])
+        return {
+            "tags": n_tags,
+            "first_scan_p50_s": _percentile(internes, 50),
+            "first_scan_max_s": max(internes),
+            "process_p50_s": _percentile(externes, 50),
+            "target_s": STARTUP_TARGET,
+            "heavy_modules": sorted(lourds),
+        }
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(resultats, path=PIPELINE_RESULTS):
+    document = {
+        "commit": _git_commit(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": resultats,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+    return document
+
+
+def compare_results(reference, courant, tolerance=0.2):
+    """
+    Compare deux fichiers de résultats (dictionnaires chargés) ; retourne la liste
+    des régressions de plus de `tolerance` (20 % par défaut) sur PIPELINE_METRICS.
+    """
+    regressions = []
+    for taille, res in courant["results"].items():
+        ref = reference["results"].get(taille)
+        if ref is None:
+            continue
+        for metrique, sens in PIPELINE_METRICS.items():
+            avant, apres = ref.get(metrique), res.get(metrique)
+            if not avant or apres is None:
+                continue
+            ecart = (apres - avant) / avant * sens
+            if ecart > tolerance:
+                regressions.append(f"{taille} variables : {metrique} {avant:.4g} → {apres:.4g} "
+                                   f"({ecart * 100:+.0f} %)")
+    return regressions
+
+
+def _micro_benchmarks():
+    for n in (100, 1000, 5000):
+        res = bench_database(n)
+        print(f"{n:>6} variables : avant {res['legacy']:>10.0f} var/s | "
+              f"après {res['batched']:>10.0f} var/s | x{res['batched'] / res['legacy']:.1f}")
+
+    res = bench_history()
+    print(f"Historique : ingestion {res['ingestion_samples_per_s']:.0f} valeurs/s | "
+          f"agrégats {res['rollup_s']:.2f}s | "
+          f"1 mois × 1 variable {res['query_month_one_tag_s'] * 1000:.1f} ms | "
+          f"1 mois × 1000 variables {res['query_month_all_tags_s'] * 1000:.0f} ms ({res['query_month_rows']} lignes) | "
+          f"brut 1 variable {res['query_raw_one_tag_s'] * 1000:.1f} ms")
+
+    res = bench_analytics()
+    print(f"Analyse des alarmes : {res['events']} événements sur 1 an | "
+          f"chargement {res['load_s']:.2f}s | calculs {res['compute_s']:.2f}s")
+
+    res = bench_thresholds()
+    print(f"Contrôle des seuils : {res['tags']} variables en {res['eval_s'] * 1000:.2f} ms par scan")
+
+    res = bench_simulator()
+    print(f"Simulateur : 100 000 variables | {res['step_s'] * 1000:.1f} ms par pas | "
+          f"{res['alarmes']} hors seuils au dernier pas | reproductible : {res['reproductible']}")
+
+
+# -------- Exécution directe --------
+# python benchmark.py                               → mesures unitaires (base, historique, analyse, simulateur)
+# python benchmark.py pipeline [--sizes 100 1000] [--baseline ancien.json]
+#                                                   → chaîne complète, résultats dans benchmark_results.json
+# python benchmark.py sharded [--tags 20000] [--servers 4] [--workers 1 2 4]
+#                                                   → acquisition répartie sur plusieurs processus
+# python benchmark.py startup [--tags 10000] [--scans 5]
+#                                                   → temps jusqu'au premier scan du service (main.py),
+#                                                     code de sortie 1 au-delà de STARTUP_TARGET
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mesures de performance de la surveillance")
+    parser.add_argument("suite", nargs="?", choices=("micro", "pipeline", "sharded", "startup"),
+                        default="micro")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(PIPELINE_SIZES))
+    parser.add_argument("--scans", type=int, default=10)
+    parser.add_argument("--output", default=PIPELINE_RESULTS)
+    parser.add_argument("--baseline", help="résultats d'une version précédente à comparer")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="écart toléré avant régression (0.2 = 20 %%)")
+    parser.add_argument("--tags", type=int, default=20_000)
+    parser.add_argument("--servers", type=int, default=4)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    if args.suite == "micro":
+        _micro_benchmarks()
+        sys.exit(0)
+
+    if args.suite == "sharded":
+        res = bench_sharded(args.tags, args.servers, args.workers, args.scans)
+        print(f"{args.tags} variables sur {args.servers} serveurs ({res.pop('cpu_count')} cœurs) :")
+        for w, r in res.items():
+            print(f"  {w:>3} processus : scan p50 {r['scan_p50_s'] * 1000:8.1f} ms | "
+                  f"{r['tags_per_s']:>9.0f} variables/s | x{r['speedup']:.2f} | {r['bad']} en échec")
+        sys.exit(0)
+
+    if args.suite == "startup":
+        res = bench_startup(args.tags, args.scans)
+        print(f"Démarrage du service ({res['tags']} variables) : premier scan p50 {res['first_scan_p50_s']:.2f}s | "
+              f"max {res['first_scan_max_s']:.2f}s | processus complet p50 {res['process_p50_s']:.2f}s | "
+              f"objectif {res['target_s']:g}s")
+        if res["heavy_modules"]:
+            print(f"⚠️ Modules lourds chargés par le service : {', '.join(res['heavy_modules'])}")
+        sys.exit(1 if res["first_scan_p50_s"] > res["target_s"] or res["heavy_modules"] else 0)
+
+    document = write_results(run_pipeline_suite(args.sizes, args.scans), args.output)
+    for taille, res in document["results"].items():
+        latence = res["alarm_latency_p95_s"]
+        print(f"{int(taille):>7} variables : scan p50 {res['scan_p50_s'] * 1000:8.1f} ms | "
+              f"p95 {res['scan_p95_s'] * 1000:8.1f} ms | {res['db_rows_per_s']:>9.0f} lignes/s | "
+              f"{res['alarms']:>5} alarmes, latence p95 "
+              f"{'-' if latence is None else f'{latence * 1000:.1f} ms'} | RSS max {res['peak_rss_mb']:.0f} Mo")
+    print(f"Résultats écrits dans {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare_results(json.load(f), document, args.tolerance)
+        for ligne in regressions:
+            print(f"⚠️ Régression : {ligne}")
+        sys.exit(1 if regressions else 0)
@@ -8,3 +8,182 @@ OPC_SERVER_URL = "opc.tcp://127.0.0.1:4840"
 
 # Intervalle de surveillance (en secondes)
 SURVEILLANCE_INTERVAL = 10
+
+# Classes de scrutation (colonne variables.scan_class) : période (s) de chaque classe,
+# None = intervalle de la surveillance. Chaque classe a ses propres sessions OPC UA :
+# un contact d'urgence en "fast" n'attend pas les milliers de mesures lentes.
+SCAN_CLASSES = {"fast": 0.5, "normal": None, "slow": 60}
+SCAN_CLASS_DEFAULT = "normal"
+
+# Bande morte d'écriture en base (colonnes variables.deadband / deadband_pct) :
+# une valeur n'est réécrite (variables + historique) que si elle s'écarte de la dernière
+# valeur écrite de plus que max(deadband, deadband_pct % de la plage min–max).
+# Valeurs par défaut pour les variables sans réglage (0 = toute variation est écrite).
+DEADBAND_DEFAULT = 0.0
+DEADBAND_PCT_DEFAULT = 0.0
+
+# Nombre maximal de nœuds par appel Read groupé (OPCClient.read_many)
+OPC_READ_CHUNK_SIZE = 500
+
+# Mode d'acquisition : "polling" (lecture cyclique) ou "subscription" (push OPC UA)
+ACQUISITION_MODE = "polling"
+
+# Paramètres d'abonnement par défaut (mode subscription)
+#   sampling_ms : intervalle d'échantillonnage côté serveur
+#   deadband    : variation absolue minimale pour notifier (0 = toute variation)
+#   queue_size  : nombre de valeurs gardées côté serveur entre deux publications
+SUBSCRIPTION_DEFAULTS = {"sampling_ms": 1000, "deadband": 0.0, "queue_size": 1}
+
+# Surcharges par variable (clé = adresse_opc)
+SUBSCRIPTION_OVERRIDES = {
+    "ns=2;s=Urgence.Contact": {"sampling_ms": 100, "queue_size": 10},
+    "ns=2;s=Fours.Four1.Temp": {"deadband": 0.5},
+}
+
+# Moteur de scrutation asyncio : lectures groupées simultanées et timeout par lecture (s)
+SCAN_MAX_CONCURRENT_READS = 8
+OPC_READ_TIMEOUT = 5
+
+# Import en masse des variables (tag_import.py) : lignes par transaction
+IMPORT_BATCH_SIZE = 5000
+
+# Rechargement à chaud : période de lecture du journal des changements de configuration (s)
+# et durée de conservation du journal (jours)
+CONFIG_RELOAD_INTERVAL = 5
+CONFIG_CHANGES_RETENTION_DAYS = 1
+
+# Acquisition multi-serveurs
+#   OPC_ENDPOINTS       : nom de passerelle → URL (colonne variables.endpoint : nom ou URL,
+#                         vide = OPC_SERVER_URL)
+#   ACQUISITION_WORKERS : 0 = lectures dans le processus de surveillance (asyncio),
+#                         N = lectures réparties sur N processus (voir acquisition.py)
+OPC_ENDPOINTS = {}
+ACQUISITION_WORKERS = 0
+
+# Connexion OPC UA : reconnexion avec backoff exponentiel et disjoncteur par serveur
+#   OPC_SIMULATION       : "auto" (simulation tant que le serveur n'a jamais répondu),
+#                          "always" (toujours simulé) ou "never" (jamais de valeurs simulées)
+#   OPC_BREAKER_FAILURES : échecs consécutifs avant ouverture du disjoncteur
+#   OPC_RECONNECT_BASE / OPC_RECONNECT_MAX : délai entre deux tentatives (s), doublé à chaque échec
+OPC_SIMULATION = "auto"
+OPC_BREAKER_FAILURES = 3
+OPC_RECONNECT_BASE = 1
+OPC_RECONNECT_MAX = 60
+
+# Historique des valeurs : durée de conservation (jours, None = illimitée)
+HISTORY_RAW_RETENTION_DAYS = 35
+HISTORY_1M_RETENTION_DAYS = 400
+HISTORY_1H_RETENTION_DAYS = None
+# Période de calcul des agrégats et de la rétention (secondes)
+HISTORY_MAINTENANCE_INTERVAL = 60
+
+# Archivage Parquet (archive.py, nécessite pyarrow) : mois terminés des événements et des
+# partitions brutes de l'historique déplacés hors de la base, puis lus avec elle
+#   ARCHIVE_ENABLED        : False → aucun archivage (la rétention brute supprime les partitions)
+#   ARCHIVE_DIR            : dossier des fichiers Parquet (None → <DB_FILE>.archive)
+#   ARCHIVE_AFTER_DAYS     : un mois est archivé ce nombre de jours après sa fin ; avec l'archivage
+#                            actif, les partitions brutes sont archivées au lieu d'être supprimées
+#   ARCHIVE_RETENTION_DAYS : conservation des fichiers archivés (None = illimitée)
+#   ARCHIVE_INTERVAL       : période (s) entre deux passages d'archivage
+#   ARCHIVE_ROW_GROUP      : lignes par groupe Parquet (granularité du filtrage à la lecture)
+#   ARCHIVE_VACUUM_PAGES   : pages libérées par pas de PRAGMA incremental_vacuum
+ARCHIVE_ENABLED = True
+ARCHIVE_DIR = None
+ARCHIVE_AFTER_DAYS = 7
+ARCHIVE_RETENTION_DAYS = None
+ARCHIVE_INTERVAL = 3600
+ARCHIVE_COMPRESSION = "zstd"
+ARCHIVE_ROW_GROUP = 100_000
+ARCHIVE_VACUUM_PAGES = 2000
+
+# Registre des variables : lots de scan gardés en mémoire en attente d'écriture en base
+# (au-delà, les lots vont dans le journal disque)
+REGISTRY_WRITEBACK_QUEUE = 8
+
+# Écriture différée avec stockage et retransmission (base verrouillée, disque lent, arrêt brutal)
+#   WRITEBACK_JOURNAL        : journal disque en ajout seul des lots non encore écrits en base
+#                              (None → <DB_FILE>.journal, à côté de la base de destination)
+#   WRITEBACK_JOURNAL_ALL    : False (défaut) → seuls les lots en débordement (file mémoire
+#                              pleine) et ceux contenant des événements d'alarme sont journalisés ;
+#                              les autres sont perdus si le processus est tué avant leur écriture
+#                              en base. True → tous les lots passent par le journal (une écriture
+#                              disque par scan)
+#   WRITEBACK_JOURNAL_MAX_MB : au-delà, le scan attend (contre-pression)
+#   WRITEBACK_RETRY_MAX      : délai maximal entre deux essais d'écriture en base (s)
+WRITEBACK_JOURNAL = None
+WRITEBACK_JOURNAL_ALL = False
+WRITEBACK_JOURNAL_MAX_MB = 1024
+WRITEBACK_RETRY_MAX = 5
+# Attente maximale des écritures en cours à l'arrêt de la surveillance (s)
+WRITEBACK_FLUSH_TIMEOUT = 10
+
+# Alarmes : taille de la file, pop-ups max par minute, file de synthèse vocale
+ALARM_QUEUE_SIZE = 1000
+ALARM_RATE_LIMIT = 10
+ALARM_TTS_QUEUE_SIZE = 5
+# Sorties d'alarme (alarm.py) : "popup" (fenêtre Tk), "voice" (synthèse vocale), "console", "log"
+#   ALARM_SINKS : interface graphique ; ALARM_SINKS_HEADLESS : service sans interface (main.py)
+ALARM_SINKS = ("voice", "popup")
+ALARM_SINKS_HEADLESS = ("console",)
+
+# Service sans interface (main.py) : objectif de temps entre le lancement du processus
+# et la fin du premier scan (s), cible : Raspberry Pi 4 (voir python benchmark.py startup)
+STARTUP_TARGET = 5.0
+
+# Machine d'états des alarmes
+#   hystérésis : bande (en % de max - min) à franchir pour considérer le retour à la normale
+#   temporisations (s) avant apparition / disparition d'une alarme
+ALARM_HYSTERESIS_PCT = 2.0
+ALARM_ON_DELAY = 0
+ALARM_OFF_DELAY = 5
+
+# Rapport PDF : taille des paquets lus en base, liste détaillée optionnelle et plafonnée
+REPORT_CHUNK_SIZE = 5000
+REPORT_INCLUDE_EVENTS = True
+REPORT_MAX_EVENTS = 20000
+
+# Dashboard : durée (s) pendant laquelle les données en cache sont servies sans vérification
+DASHBOARD_CACHE_TTL = 5
+
+# Analyse des alarmes (ISA-18.2)
+#   avalanche : plus de ANALYTICS_FLOOD_THRESHOLD alarmes en ANALYTICS_FLOOD_WINDOW secondes
+#   battement : ANALYTICS_CHATTER_COUNT apparitions de la même alarme en ANALYTICS_CHATTER_WINDOW secondes
+#   fugitive  : alarme revenue à la normale en moins de ANALYTICS_FLEETING_SECONDS
+#   permanente: alarme active depuis plus de ANALYTICS_STANDING_SECONDS
+ANALYTICS_FLOOD_THRESHOLD = 10
+ANALYTICS_FLOOD_WINDOW = 600
+ANALYTICS_CHATTER_COUNT = 3
+ANALYTICS_CHATTER_WINDOW = 60
+ANALYTICS_FLEETING_SECONDS = 10
+ANALYTICS_STANDING_SECONDS = 24 * 3600
+# Dashboard : fréquence de recalcul des indicateurs d'alarmes (s)
+ANALYTICS_CACHE_TTL = 300
+
+# Simulateur d'usine (mode simulation et serveur OPC UA local)
+#   graine : même graine + même adresse OPC → même série de valeurs
+#   probabilités par pas et par variable des défauts : échelon, pic isolé, valeur figée
+#   durée d'un défaut (en pas) ; nombre max de pas rattrapés après une pause
+SIMULATOR_SEED = 42
+SIMULATOR_STEP = 1.0
+SIMULATOR_P_STEP = 0.0005
+SIMULATOR_P_SPIKE = 0.001
+SIMULATOR_P_STUCK = 0.0005
+SIMULATOR_FAULT_DURATION = 30
+SIMULATOR_MAX_CATCHUP = 10
+
+# Instrumentation (metrics.py) : durées de phase, compteurs, jauges
+#   METRICS_PORT : point d'accès Prometheus http://METRICS_HOST:METRICS_PORT/metrics (None = pas de serveur HTTP)
+#   désactivée, le coût sur le scan est négligeable
+METRICS_ENABLED = False
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108
+
+# Flux en direct (live_feed.py) : valeurs et alarmes poussées par la surveillance (Server-Sent Events)
+#   LIVE_FEED_PORT : http://LIVE_FEED_HOST:LIVE_FEED_PORT/events (None = pas de flux, l'UI relit la base)
+#   LIVE_FEED_BACKLOG : changements gardés pour la reprise d'un client reconnecté (au-delà : instantané complet)
+#   LIVE_FEED_HEARTBEAT : intervalle (s) des messages de maintien de connexion
+LIVE_FEED_HOST = "127.0.0.1"
+LIVE_FEED_PORT = 9109
+LIVE_FEED_BACKLOG = 256
+LIVE_FEED_HEARTBEAT = 15
+LIVE_FEED_URL = f"http://{LIVE_FEED_HOST}:{LIVE_FEED_PORT}/events" if LIVE_FEED_PORT else None
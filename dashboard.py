@@ -2,19 +2,27 @@
 import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
-import sqlite3
-from config import DB_FILE
+from dashboard_data import DashboardData, live_variables
+from live_feed import FeedClient
 
-# Connexion DB
-def get_data(query):
-    conn = sqlite3.connect(DB_FILE)
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    return df
-
-# ---------------- Interface Streamlit ----------------
+# Première commande Streamlit du script (avant tout chargement de données)
 st.set_page_config(page_title="Dashboard Surveillance", layout="wide")
 
+# Couche de requêtes partagée par toutes les sessions et conservée entre les reruns
+@st.cache_resource
+def get_data_layer():
+    return DashboardData()
+
+# Flux en direct de la surveillance : un seul abonnement pour toutes les sessions
+@st.cache_resource
+def get_live_feed():
+    return FeedClient().start()
+
+data = get_data_layer()
+data.refresh()
+feed = get_live_feed()
+
+# ---------------- Interface Streamlit ----------------
 st.title("📊 Tableau de Bord - Application de Surveillance Industrielle")
 
 # Onglets
@@ -22,28 +30,27 @@ tab1, tab2, tab3 = st.tabs(["📜 Historique", "📌 Variables", "📈 Statistiq
 
 with tab1:
     st.subheader("Historique des événements")
-    df = get_data("SELECT * FROM evenements ORDER BY date_heure DESC LIMIT 50")
-    st.dataframe(df)
+    st.dataframe(data.recent_events(50))
 
 with tab2:
     st.subheader("Liste des variables surveillées")
-    df = get_data("SELECT * FROM variables")
-    st.dataframe(df)
+    if feed.connected:
+        # Valeurs poussées par la surveillance : aucune lecture de la base
+        st.caption(f"🟢 Valeurs en direct (séquence {feed.seq})")
+        st.dataframe(live_variables(feed.snapshot))
+    else:
+        st.dataframe(data.variables())
 
 with tab3:
     st.subheader("Statistiques sur les alarmes")
 
-    alarms = get_data("SELECT * FROM evenements WHERE alarme=1")
+    # Agrégats tenus à jour par la couche de cache (pas de relecture de la table)
+    alarms_by_hour = data.alarms_by_hour()
+    alarms_by_variable = data.alarms_by_variable()
 
-    if alarms.empty:
+    if alarms_by_hour.empty:
         st.warning("⚠️ Aucune alarme détectée pour l’instant.")
     else:
-        alarms["date_heure"] = pd.to_datetime(alarms["date_heure"])
-        alarms["hour"] = alarms["date_heure"].dt.hour
-
-        alarms_by_hour = alarms.groupby("hour").size()
-        alarms_by_variable = alarms.groupby("variable_id").size()
-
         # ➡️ Organisation côte à côte
         col1, col2 = st.columns(2)
 
@@ -61,3 +68,13 @@ with tab3:
             alarms_by_variable.plot(kind="pie", ax=ax2, autopct="%1.1f%%")
             ax2.set_ylabel("")  # enlève le label inutile sur l’axe Y
             st.pyplot(fig2)
+
+    # Indicateurs ISA-18.2 calculés sur tout l'historique (analytics.py)
+    st.markdown("### 🧮 Indicateurs par variable (MTBF, MTTR, battements, alarmes permanentes)")
+    indicateurs = data.alarm_analytics()
+    st.dataframe(indicateurs["par_variable"])
+    avalanches = indicateurs["avalanches"]
+    if not avalanches.empty:
+        avalanches = avalanches.assign(debut=pd.to_datetime(avalanches["debut"], unit="s"))
+        st.markdown(f"### 🌊 Avalanches d'alarmes : {len(avalanches)} fenêtres de 10 min")
+        st.dataframe(avalanches)
@@ -0,0 +1,137 @@
+# dashboard_data.py
+import sqlite3
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+import pandas as pd
+
+import archive
+import database
+from config import DASHBOARD_CACHE_TTL, ANALYTICS_CACHE_TTL
+from live_feed import ROW_COLUMNS
+
+
+class DashboardData:
+    """
+    Couche de requêtes du dashboard, partagée entre les sessions Streamlit :
+    - une seule connexion en lecture seule
+    - contrôle de fraîcheur au plus une fois par `ttl` secondes
+    - filigrane (id max des événements, nombre d'alarmes actives) : tant qu'il
+      ne change pas, tout est servi depuis le cache
+    - les agrégats par heure / par variable sont mis à jour avec les seuls
+      événements plus récents que le filigrane ; recalcul SQL complet (index
+      partiel des alarmes) uniquement si des alarmes ont été acquittées
+    """
+
+    def __init__(self, db_file=None, ttl=DASHBOARD_CACHE_TTL):
+        # Base lue à la création (défaut : database.DB_FILE, modifiable par main.py --db)
+        self.db_file = db_file = db_file or database.DB_FILE
+        self.conn = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.ttl = ttl
+        self.checked_at = float("-inf")
+        self.watermark = 0          # id max déjà intégré
+        self.active_alarms = 0      # nombre de lignes alarme = 1 correspondant aux agrégats
+        self.by_hour = Counter()
+        self.by_variable = Counter()
+        self.cache = {}             # résultats invalidés à chaque changement de filigrane
+        self.analytics_cache = None # (instant, résultat) : analyse complète, recalculée par TTL
+
+    # -------- Fraîcheur --------
+    def refresh(self):
+        with self.lock:
+            now = time.monotonic()
+            if now - self.checked_at < self.ttl:
+                return
+            self.checked_at = now
+
+            c = self.conn.cursor()
+            c.execute("SELECT COALESCE(MAX(id), 0) FROM evenements")
+            max_id = c.fetchone()[0]
+            c.execute("SELECT COUNT(*) FROM evenements WHERE alarme = 1")
+            actives = c.fetchone()[0]
+            if (max_id, actives) == (self.watermark, self.active_alarms):
+                return
+
+            # Seuls les événements plus récents que le filigrane sont lus
+            c.execute("SELECT ts, variable_id FROM evenements WHERE id > ? AND alarme = 1",
+                      (self.watermark,))
+            nouveaux = c.fetchall()
+            if self.active_alarms + len(nouveaux) == actives:
+                for ts, var_id in nouveaux:
+                    self.by_hour[datetime.fromtimestamp(ts).hour] += 1
+                    self.by_variable[var_id] += 1
+            else:
+                self._recompute(c)
+
+            self.watermark, self.active_alarms = max_id, actives
+            self.cache.clear()
+
+    def _recompute(self, c):
+        c.execute("""
+            SELECT CAST(strftime('%H', ts, 'unixepoch', 'localtime') AS INTEGER) AS heure, COUNT(*)
+            FROM evenements WHERE alarme = 1 GROUP BY heure
+        """)
+        self.by_hour = Counter(dict(c.fetchall()))
+        c.execute("SELECT variable_id, COUNT(*) FROM evenements WHERE alarme = 1 GROUP BY variable_id")
+        self.by_variable = Counter(dict(c.fetchall()))
+
+    def _cached(self, cle, fonction, ttl=None):
+        """Résultat mis en cache jusqu'au prochain changement de filigrane (ou expiration de ttl)."""
+        with self.lock:
+            entree = self.cache.get(cle)
+            if entree is None or (ttl is not None and time.monotonic() - entree[0] >= ttl):
+                entree = self.cache[cle] = (time.monotonic(), fonction())
+            return entree[1]
+
+    # -------- Données affichées --------
+    def recent_events(self, limit=50):
+        return self._cached(("recent", limit), lambda: self._recent_events(limit))
+
+    def _recent_events(self, limit):
+        df = pd.read_sql_query("SELECT * FROM evenements ORDER BY ts DESC LIMIT ?", self.conn, params=(limit,))
+        if len(df) < limit:
+            # Base presque vide après archivage : complété par les mois archivés les plus récents
+            froid = archive.latest_events(self.conn, limit - len(df), db_file=self.db_file)
+            if len(froid["ts"]):
+                df = pd.concat([df, pd.DataFrame(froid)], ignore_index=True)
+        return df
+
+    def variables(self):
+        # Les valeurs courantes changent sans nouvel événement → expiration par TTL
+        return self._cached("variables", lambda: pd.read_sql_query("SELECT * FROM variables", self.conn),
+                            ttl=self.ttl)
+
+    def variable_names(self):
+        return self._cached("noms", lambda: dict(
+            self.conn.execute("SELECT id, nom_variable FROM variables").fetchall()), ttl=self.ttl)
+
+    def alarms_by_hour(self):
+        with self.lock:
+            return pd.Series(dict(sorted(self.by_hour.items())), dtype="int64")
+
+    def alarms_by_variable(self):
+        noms = self.variable_names()
+        with self.lock:
+            comptes = dict(self.by_variable)
+        return pd.Series({noms.get(var_id, var_id): n for var_id, n in comptes.items()}, dtype="int64")
+
+    def alarm_analytics(self):
+        """Indicateurs ISA-18.2 (analytics.py), recalculés au plus une fois par ANALYTICS_CACHE_TTL."""
+        import analytics
+
+        entree = self.analytics_cache
+        if entree is None or time.monotonic() - entree[0] >= ANALYTICS_CACHE_TTL:
+            resultat = analytics.analyse(db_file=self.db_file)
+            noms = self.variable_names()
+            resultat["par_variable"].index = [noms.get(i, i) for i in resultat["par_variable"].index]
+            entree = self.analytics_cache = (time.monotonic(), resultat)
+        return entree[1]
+
+
+def live_variables(snapshot):
+    """Variables et dernières valeurs d'un Snapshot (flux en direct), triées par id."""
+    _, rows = snapshot.full()
+    return pd.DataFrame(rows, columns=list(ROW_COLUMNS)).sort_values("id", ignore_index=True)
@@ -1,16 +1,96 @@
 # database.py
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from config import DB_FILE
+from config import DB_FILE, CONFIG_CHANGES_RETENTION_DAYS, SCAN_CLASS_DEFAULT
+from migrations import migrate
 
 # -------- Connexion --------
 def get_connection():
     return sqlite3.connect(DB_FILE)
 
+# Connexion partagée longue durée (une seule par processus, protégée par un verrou).
+# Le cache de requêtes préparées de sqlite3 est réutilisé d'un appel à l'autre.
+_lock = threading.RLock()
+_shared_conn = None
+
+
+def get_shared_connection():
+    global _shared_conn
+    with _lock:
+        if _shared_conn is None:
+            _shared_conn = sqlite3.connect(DB_FILE, check_same_thread=False, cached_statements=256)
+            # Sans effet sur une base existante (voir python archive.py vacuum) ; une base neuve
+            # rend ainsi l'espace libéré par l'archivage sans VACUUM complet
+            _shared_conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            _shared_conn.execute("PRAGMA journal_mode=WAL")
+            _shared_conn.execute("PRAGMA synchronous=NORMAL")
+        return _shared_conn
+
+
+def close_shared_connection():
+    global _shared_conn
+    with _lock:
+        if _shared_conn is not None:
+            _shared_conn.close()
+            _shared_conn = None
+        _history_partitions.clear()
+
+
+@contextmanager
+def transaction():
+    """Curseur sur la connexion partagée ; commit à la sortie, rollback en cas d'erreur."""
+    with _lock:
+        conn = get_shared_connection()
+        try:
+            yield conn.cursor()
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+def now_str():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+def day_bounds(jour):
+    """Bornes epoch [début, fin) d'un jour local (datetime.date)."""
+    debut = datetime(jour.year, jour.month, jour.day)
+    return int(debut.timestamp()), int((debut + timedelta(days=1)).timestamp())
+
+# -------- Requêtes (texte constant → réutilisées par le cache de requêtes préparées) --------
+SQL_UPDATE_VARIABLE = "UPDATE variables SET last_value=?, last_update=?, qualite=? WHERE id=?"
+# Lecture en échec : la dernière valeur est gardée, seule la qualité change
+SQL_UPDATE_QUALITY = "UPDATE variables SET qualite=? WHERE id=?"
+# Dernier lot d'écriture différée enregistré (rejeu du journal sans doublon)
+SQL_SET_WRITEBACK_SEQ = "INSERT OR REPLACE INTO historique_meta (cle, valeur) VALUES ('writeback_seq', ?)"
+SQL_CONFIG_CHANGES = "SELECT seq, variable_id FROM variables_changes WHERE seq > ? ORDER BY seq"
+SQL_INSERT_EVENT = """
+    INSERT INTO evenements (date_heure, ts, variable_id, evenement, alarme)
+    VALUES (?, ?, ?, ?, ?)
+"""
+# Événement écrit au retour à la normale d'une alarme (alarme = 0)
+EVENT_RETOUR_NORMAL = "normal"
+SQL_ACQUIT_VARIABLE = "UPDATE variables SET alarme_min = 0, alarme_max = 0 WHERE id = ?"
+# Acquittement : seul le drapeau change, le côté du dépassement (evenement = min / max) reste
+# pour les comptes par variable du rapport et l'analyse des alarmes
+SQL_ACQUIT_EVENTS = """
+    UPDATE evenements
+    SET alarme = 0
+    WHERE variable_id = ? AND alarme = 1
+"""
+
 # -------- Initialisation des tables --------
 def init_db():
-    conn = get_connection()
-    c = conn.cursor()
+    with transaction() as c:
+        _create_tables(c)
+        migrate(c)
+
+
+def _create_tables(c):
+    """Schéma de base ; les évolutions suivantes sont dans migrations.py."""
     c.execute("""
     CREATE TABLE IF NOT EXISTS variables (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -43,110 +123,347 @@ def init_db():
         FOREIGN KEY(variable_id) REFERENCES variables(id)
     )
     """)
-    conn.commit()
-    conn.close()
+    # Historique : agrégats 1 min / 1 h (les valeurs brutes sont dans des partitions mensuelles)
+    for table in ("historique_1m", "historique_1h"):
+        c.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            variable_id INTEGER,
+            ts INTEGER,
+            vmin REAL,
+            vmax REAL,
+            vavg REAL,
+            n INTEGER,
+            PRIMARY KEY (variable_id, ts)
+        ) WITHOUT ROWID
+        """)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS historique_meta (
+        cle TEXT PRIMARY KEY,
+        valeur INTEGER
+    )
+    """)
+
+# -------- Historique brut (partitions mensuelles) --------
+# Une table par mois (historique_AAAAMM), regroupée physiquement par (variable_id, ts) :
+# - une requête sur une variable et une plage de temps lit des pages contiguës
+# - la rétention supprime un mois entier avec DROP TABLE, sans DELETE ligne à ligne
+HISTORY_PREFIX = "historique_"
+_history_partitions = set()
+
+
+def history_partition(ts):
+    """Nom de la partition brute contenant l'horodatage epoch `ts` (UTC)."""
+    return HISTORY_PREFIX + time.strftime("%Y%m", time.gmtime(ts))
+
+
+def ensure_history_partition(c, ts):
+    table = history_partition(ts)
+    if table not in _history_partitions:
+        c.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            variable_id INTEGER,
+            ts INTEGER,
+            valeur REAL,
+            qualite INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (variable_id, ts)
+        ) WITHOUT ROWID
+        """)
+        _history_partitions.add(table)
+    return table
+
+
+def list_history_partitions(c):
+    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name GLOB 'historique_[0-9][0-9][0-9][0-9][0-9][0-9]' ORDER BY name")
+    return [row[0] for row in c.fetchall()]
+
+
+def drop_history_partition(c, table):
+    """Supprime une partition brute (rétention, archivage) ; recréée si un échantillon y arrive encore."""
+    c.execute(f"DROP TABLE IF EXISTS {table}")
+    _history_partitions.discard(table)
+
+
+# Échantillons écrits sous le filigrane des agrégats 1 min (lot différé, rejeu du journal) :
+# le plus ancien est noté, history.rollup recalcule les agrégats à partir de lui
+SQL_MARK_LATE_HISTORY = """
+    INSERT INTO historique_meta (cle, valeur)
+    SELECT 'rollup_retard', ? WHERE ? < (SELECT valeur FROM historique_meta WHERE cle = 'rollup_1m')
+    ON CONFLICT(cle) DO UPDATE SET valeur = MIN(valeur, excluded.valeur)
+"""
+
+
+def append_history(c, ts, samples):
+    """Ajoute des échantillons [(var_id, valeur, qualité), ...] horodatés `ts` (epoch s)."""
+    table = ensure_history_partition(c, ts)
+    c.executemany(f"INSERT OR REPLACE INTO {table} (variable_id, ts, valeur, qualite) VALUES (?, ?, ?, ?)",
+                  [(var_id, ts, float(value), qualite) for var_id, value, qualite in samples])
+    c.execute(SQL_MARK_LATE_HISTORY, (ts, ts))
 
 # -------- Données d’exemple --------
-def ensure_example_data():
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+def ensure_example_data(force=False):
+    """Données d'exemple si la table des variables est vide (force=True : remplace tout)."""
+    with transaction() as c:
+        if not force:
+            c.execute("SELECT 1 FROM variables LIMIT 1")
+            if c.fetchone():
+                return
+        _insert_example_data(c)
+
+
+def _insert_example_data(c):
     c.execute("DELETE FROM variables")
     c.execute("DELETE FROM etats")
     c.execute("DELETE FROM evenements")
 
+    etats = [("SurveillanceGlobale", 1), ("Four1", 1), ("BC2", 1), ("BK3", 1)]
+    etat_ids = {}
+    for designation, activation in etats:
+        c.execute("INSERT INTO etats (designation, activation) VALUES (?, ?)", (designation, activation))
+        etat_ids[designation] = c.lastrowid
+
     exemples = [
-        ("TempFour1", "ns=2;s=Fours.Four1.Temp", "Température palier Four 1", "reel", 40.0, 85.5, 95.0, 0, 1),
-        ("EtatConvoyeur1", "ns=2;s=Convoyeur1.Run", "État de marche du Convoyeur 1", "bool", 1, 1, 0, 1, 0)
+        ("TempFour1", "ns=2;s=Fours.Four1.Temp", "Température palier Four 1", "reel", 40.0, 85.5, 95.0, 0, 1, "Four1", "normal"),
+        ("EtatConvoyeur1", "ns=2;s=Convoyeur1.Run", "État de marche du Convoyeur 1", "bool", 1, 1, 0, 1, 0, "SurveillanceGlobale", "fast")
     ]
 
     now = datetime.now()
-    for i, (nom, adresse, desc_, vtype, vmin, vmax, val, a_min, a_max) in enumerate(exemples):
+    for i, (nom, adresse, desc_, vtype, vmin, vmax, val, a_min, a_max, etat, classe) in enumerate(exemples):
         c.execute("""
             INSERT INTO variables
-            (nom_variable, adresse_opc, description, type, min, max, last_value, last_update, alarme_min, alarme_max)
-            VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now'), ?, ?)
-        """, (nom, adresse, desc_, vtype, vmin, vmax, val, a_min, a_max))
+            (nom_variable, adresse_opc, description, type, min, max, last_value, last_update, alarme_min, alarme_max, etat_id,
+             scan_class)
+            VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now'), ?, ?, ?, ?)
+        """, (nom, adresse, desc_, vtype, vmin, vmax, val, a_min, a_max, etat_ids[etat], classe))
         var_id = c.lastrowid
         if val < vmin or val > vmax:
-            event_time = (now - timedelta(hours=i)).strftime("%Y-%m-%d %H:%M:%S")
+            event_time = now - timedelta(hours=i)
             c.execute("""
-                INSERT INTO evenements (date_heure, variable_id, evenement, alarme)
-                VALUES (?, ?, 'Alarme simulée', 1)
-            """, (event_time, var_id))
-
-    etats = [("SurveillanceGlobale", 1), ("Four1", 1), ("BC2", 1), ("BK3", 1)]
-    for designation, activation in etats:
-        c.execute("INSERT INTO etats (designation, activation) VALUES (?, ?)", (designation, activation))
-
-    conn.commit()
-    conn.close()
+                INSERT INTO evenements (date_heure, ts, variable_id, evenement, alarme)
+                VALUES (?, ?, ?, 'Alarme simulée', 1)
+            """, (event_time.strftime("%Y-%m-%d %H:%M:%S"), int(event_time.timestamp()), var_id))
 
 # -------- Fonctions utilitaires --------
+# Colonnes lues par la surveillance (ordre attendu par les déballages de tuples)
+VARIABLE_COLUMNS = """
+    id, nom_variable, adresse_opc, description, type, min, max,
+    last_value, last_update, alarme_min, alarme_max, endpoint,
+    scan_class, deadband, deadband_pct
+"""
+
 def get_active_variables():
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute("SELECT * FROM variables")
-    rows = c.fetchall()
-    conn.close()
-    return rows
-
-def update_variable(var_id, value):
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute("""
-        UPDATE variables
-        SET last_value=?, last_update=?
-        WHERE id=?
-    """, (value, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), var_id))
-    conn.commit()
-    conn.close()
+    with transaction() as c:
+        c.execute(f"SELECT {VARIABLE_COLUMNS} FROM variables")
+        return c.fetchall()
+
+def get_variables(ids):
+    """Lignes (VARIABLE_COLUMNS) des variables `ids` encore présentes en base."""
+    ids = list(ids)
+    lignes = []
+    with transaction() as c:
+        for i in range(0, len(ids), 500):
+            paquet = ids[i:i + 500]
+            c.execute(f"SELECT {VARIABLE_COLUMNS} FROM variables WHERE id IN ({','.join('?' * len(paquet))})",
+                      paquet)
+            lignes.extend(c.fetchall())
+    return lignes
+
+def get_writeback_seq():
+    """Numéro du dernier lot d'écriture différée enregistré en base (0 si aucun)."""
+    with transaction() as c:
+        c.execute("SELECT valeur FROM historique_meta WHERE cle = 'writeback_seq'")
+        ligne = c.fetchone()
+        return int(ligne[0]) if ligne else 0
+
+# -------- Journal des changements de configuration (rechargement à chaud) --------
+def last_config_change():
+    """Dernier numéro attribué dans variables_changes (0 si aucun)."""
+    with transaction() as c:
+        c.execute("SELECT seq FROM sqlite_sequence WHERE name = 'variables_changes'")
+        ligne = c.fetchone()
+        return ligne[0] if ligne else 0
+
+def get_config_changes(since):
+    """
+    Variables ajoutées, supprimées ou modifiées depuis le numéro `since`.
+    Retourne (dernier numéro, {ids}), ou None si le journal a été purgé au-delà
+    de `since` (rechargement complet nécessaire).
+    """
+    with transaction() as c:
+        c.execute("SELECT MIN(seq) FROM variables_changes")
+        premier = c.fetchone()[0]
+        if premier is not None and premier > since + 1:
+            # Numéros attribués sans trou (AUTOINCREMENT) : since + 1 manque → purgé
+            return None
+        c.execute(SQL_CONFIG_CHANGES, (since,))
+        lignes = c.fetchall()
+    if not lignes:
+        return since, set()
+    return lignes[-1][0], {var_id for _, var_id in lignes}
+
+def prune_config_changes(jours=CONFIG_CHANGES_RETENTION_DAYS):
+    with transaction() as c:
+        c.execute("DELETE FROM variables_changes WHERE ts < ?", (int(time.time()) - jours * 86400,))
+
+def get_equipements():
+    with transaction() as c:
+        c.execute("SELECT id, designation FROM etats ORDER BY designation")
+        return c.fetchall()
+
+# -------- Vue paginée --------
+# Même expression que l'index partiel idx_variables_hors_seuils (migration 8) : SQLite ne
+# l'utilise que si le filtre reprend exactement sa clause WHERE
+ALARM_EXPR = "(last_value < min OR last_value > max)"
+# Dans les seuils, ou sans valeur lue (affiché "OK" par l'interface) : complément exact de l'index
+OK_EXPR = f"NOT IFNULL({ALARM_EXPR}, 0)"
+# Colonnes triables → index qui fournit l'ordre (parcours arrêté par LIMIT). Pas de tri sur
+# last_value : un index sur la valeur serait réécrit à chaque scan (coût d'écriture doublé)
+SORTABLE_COLUMNS = {
+    "nom_variable": "idx_variables_nom",
+    "adresse_opc": "idx_variables_adresse",
+    "min": "idx_variables_min",
+    "max": "idx_variables_max",
+}
+
+def _where(conditions):
+    return ("WHERE " + " AND ".join(conditions)) if conditions else ""
+
+def variables_page_sql(prefix=None, etat_id=None, alarme=None, order_by="nom_variable", desc=False):
+    """
+    Requêtes de la vue paginée : (comptage, paramètres du comptage, page, paramètres de la page,
+    à compléter par LIMIT / OFFSET). Voir query_variables.
+    """
+    if order_by not in SORTABLE_COLUMNS:
+        raise ValueError(f"Tri impossible sur {order_by}")
+
+    conditions, params = [], []
+    if prefix:
+        conditions.append("nom_variable >= ? AND nom_variable < ?")
+        params += [prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)]
+    if etat_id is not None:
+        conditions.append("etat_id = ?")
+        params.append(etat_id)
+    sens = "DESC" if desc else "ASC"
+    # Filtre servi par une recherche d'index (préfixe, équipement, index partiel des alarmes) :
+    # ses lignes sont triées à part ("+" écarte l'index de tri, qui serait parcouru en entier).
+    # Sans filtre, ou "dans les seuils" seul : parcours ordonné de l'index de tri, arrêté par
+    # LIMIT après au plus offset + limit + (variables hors seuils) entrées.
+    filtre = prefix or etat_id is not None or alarme
+    tri = f"+{order_by}" if filtre and order_by != "nom_variable" else order_by
+
+    if alarme is False:
+        # Comptage par l'index partiel : dans les seuils = toutes − hors seuils
+        comptage = (f"SELECT (SELECT COUNT(*) FROM variables {_where(conditions)}) - "
+                    f"(SELECT COUNT(*) FROM variables {_where(conditions + [ALARM_EXPR])})")
+        params_comptage = params + params
+        conditions = conditions + [OK_EXPR]
+    else:
+        if alarme:
+            conditions = conditions + [ALARM_EXPR]
+        comptage, params_comptage = f"SELECT COUNT(*) FROM variables {_where(conditions)}", params
+    page = f"""
+        SELECT id, nom_variable, adresse_opc, last_value, min, max
+        FROM variables {_where(conditions)}
+        ORDER BY {tri} {sens}, id {sens}
+        LIMIT ? OFFSET ?
+    """
+    return comptage, params_comptage, page, params
+
+def query_variables(prefix=None, etat_id=None, alarme=None, order_by="nom_variable",
+                    desc=False, limit=50, offset=0):
+    """
+    Une page de variables filtrée et triée par SQLite (seule la fenêtre visible est lue).
+    - prefix  : début du nom (recherche par plage sur idx_variables_nom)
+    - etat_id : équipement (etats.id)
+    - alarme  : True → hors seuils (index partiel idx_variables_hors_seuils),
+                False → dans les seuils ou sans valeur, None → toutes
+    Retourne (nombre total de lignes filtrées, [(id, nom, adresse, valeur, min, max), ...]).
+    """
+    comptage, params_comptage, page, params = variables_page_sql(prefix, etat_id, alarme, order_by, desc)
+    with transaction() as c:
+        c.execute(comptage, params_comptage)
+        total = c.fetchone()[0]
+        c.execute(page, params + [limit, offset])
+        return total, c.fetchall()
+
+def delete_variables(c, ids):
+    """
+    Supprime des variables avec leurs événements et leur historique en base (pas de cascade
+    sur les clés étrangères) ; l'historique déjà archivé en Parquet est conservé.
+    """
+    ids = list(ids)
+    tables = ["evenements", "historique_1m", "historique_1h", *list_history_partitions(c)]
+    for i in range(0, len(ids), 500):
+        paquet = ids[i:i + 500]
+        marques = ",".join("?" * len(paquet))
+        for table in tables:
+            c.execute(f"DELETE FROM {table} WHERE variable_id IN ({marques})", paquet)
+        c.execute(f"DELETE FROM variables WHERE id IN ({marques})", paquet)
+
+def update_variable(var_id, value, qualite=0):
+    with transaction() as c:
+        c.execute(SQL_UPDATE_VARIABLE, (value, now_str(), qualite, var_id))
 
 def log_event(var_id, evenement, alarme):
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute("""
-        INSERT INTO evenements (date_heure, variable_id, evenement, alarme)
-        VALUES (?, ?, ?, ?)
-    """, (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), var_id, evenement, alarme))
-    conn.commit()
-    conn.close()
+    with transaction() as c:
+        c.execute(SQL_INSERT_EVENT, (now_str(), int(time.time()), var_id, evenement, alarme))
 
 def reset_alarm(event_id: int):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("UPDATE evenements SET alarme = 0 WHERE id = ?", (event_id,))
-    conn.commit()
-    conn.close()
+    with transaction() as c:
+        c.execute("UPDATE evenements SET alarme = 0 WHERE id = ?", (event_id,))
 
 def acquit_alarme(var_id: int):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("UPDATE variables SET alarme_min = 0, alarme_max = 0 WHERE id = ?", (var_id,))
-    c.execute("""
-        UPDATE evenements
-        SET alarme = 0, evenement = 'Alarme acquittée'
-        WHERE variable_id = ? AND alarme = 1
-    """, (var_id,))
-    conn.commit()
-    conn.close()
+    with transaction() as c:
+        c.execute(SQL_ACQUIT_VARIABLE, (var_id,))
+        c.execute(SQL_ACQUIT_EVENTS, (var_id,))
+
+def flush_scan(updates, events=(), acquits=(), bad=(), ts=None, seq=None):
+    """
+    Écrit le résultat d'un scan en une seule transaction (un seul fsync) :
+    - updates : [(var_id, valeur, qualité), ...]   (qualité : voir opc_client.QUALITIES)
+    - events  : [(var_id, evenement, alarme), ...]
+    - acquits : [var_id, ...] revenus dans la plage normale
+    - bad     : [(var_id, qualité), ...] lectures en échec (dernière valeur conservée)
+    - ts      : instant du scan (epoch s, défaut : maintenant) — un lot écrit en retard
+                garde son horodatage
+    - seq     : numéro du lot d'écriture différée, enregistré dans la même transaction
+    Les valeurs sont aussi ajoutées à l'historique (voir history.py).
+    """
+    ts = int(time.time() if ts is None else ts)
+    now = datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S")
+    with transaction() as c:
+        if seq is not None:
+            c.execute(SQL_SET_WRITEBACK_SEQ, (seq,))
+        c.executemany(SQL_UPDATE_VARIABLE, [(value, now, qualite, var_id) for var_id, value, qualite in updates])
+        if updates:
+            append_history(c, ts, updates)
+        if bad:
+            c.executemany(SQL_UPDATE_QUALITY, [(qualite, var_id) for var_id, qualite in bad])
+        if events:
+            c.executemany(SQL_INSERT_EVENT, [(now, ts, var_id, ev, alarme) for var_id, ev, alarme in events])
+        if acquits:
+            c.executemany(SQL_ACQUIT_VARIABLE, [(var_id,) for var_id in acquits])
+            c.executemany(SQL_ACQUIT_EVENTS, [(var_id,) for var_id in acquits])
 
 # -------- Nouvelle fonction --------
-def insert_variable(nom, adresse, description, vtype, vmin, vmax, valeur_init, a_min=0, a_max=0):
-    """Ajoute une nouvelle variable dans la base et retourne son id."""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute("""
-        INSERT INTO variables
-        (nom_variable, adresse_opc, description, type, min, max, last_value, last_update, alarme_min, alarme_max)
-        VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now'), ?, ?)
-    """, (nom, adresse, description, vtype, vmin, vmax, valeur_init, a_min, a_max))
-    conn.commit()
-    var_id = c.lastrowid
-    conn.close()
-    return var_id
+def insert_variable(nom, adresse, description, vtype, vmin, vmax, valeur_init, a_min=0, a_max=0, etat_id=None,
+                    endpoint=None, scan_class=None, deadband=None, deadband_pct=None):
+    """
+    Ajoute une nouvelle variable dans la base et retourne son id (endpoint : serveur OPC UA,
+    vide = défaut ; scan_class : classe de scrutation, vide = SCAN_CLASS_DEFAULT ;
+    deadband / deadband_pct : bande morte d'écriture, vide = valeurs par défaut).
+    """
+    with transaction() as c:
+        c.execute("""
+            INSERT INTO variables
+            (nom_variable, adresse_opc, description, type, min, max, last_value, last_update, alarme_min, alarme_max,
+             etat_id, endpoint, scan_class, deadband, deadband_pct)
+            VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now'), ?, ?, ?, ?, ?, ?, ?)
+        """, (nom, adresse, description, vtype, vmin, vmax, valeur_init, a_min, a_max, etat_id, endpoint,
+              scan_class or SCAN_CLASS_DEFAULT, deadband, deadband_pct))
+        return c.lastrowid
 
 # -------- Exécution directe --------
 if __name__ == "__main__":
     init_db()
-    ensure_example_data()
+    ensure_example_data(force=True)
     print("✅ Base de données initialisée + exemples forcés avec alarmes")
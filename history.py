@@ -0,0 +1,176 @@
+# history.py
+import time
+
+import archive
+from database import (
+    transaction, history_partition, list_history_partitions, drop_history_partition, HISTORY_PREFIX,
+)
+from config import (
+    HISTORY_RAW_RETENTION_DAYS, HISTORY_1M_RETENTION_DAYS, HISTORY_1H_RETENTION_DAYS,
+)
+
+# Résolutions disponibles : (nom, pas en secondes, table)
+RESOLUTIONS = {
+    "1m": (60, "historique_1m"),
+    "1h": (3600, "historique_1h"),
+}
+
+# Choix automatique de la résolution selon la durée demandée
+AUTO_RAW_MAX = 6 * 3600          # ≤ 6 h   → valeurs brutes
+AUTO_1M_MAX = 7 * 24 * 3600      # ≤ 7 j   → agrégats 1 min, au-delà → 1 h
+
+# Sous-requête utilisée pour parcourir les tables (variable_id, ts) par leur clé primaire :
+# SQLite fait une recherche par plage pour chaque variable au lieu d'un parcours complet.
+# (agrégats seulement : la rétention supprime par le temps, variables supprimées comprises)
+_ALL_IDS = "variable_id IN (SELECT id FROM variables)"
+
+
+def _get_meta(c, cle, defaut=0):
+    c.execute("SELECT valeur FROM historique_meta WHERE cle = ?", (cle,))
+    row = c.fetchone()
+    return row[0] if row else defaut
+
+
+def _set_meta(c, cle, valeur):
+    c.execute("INSERT OR REPLACE INTO historique_meta (cle, valeur) VALUES (?, ?)", (cle, valeur))
+
+
+def _partitions_between(c, debut, fin):
+    """Partitions brutes existantes qui recouvrent [debut, fin)."""
+    premiere, derniere = history_partition(debut), history_partition(max(debut, fin - 1))
+    return [t for t in list_history_partitions(c) if premiere <= t <= derniere]
+
+
+# -------- Agrégats --------
+def rollup(now=None):
+    """
+    Calcule les agrégats min/max/moyenne des minutes et heures terminées
+    depuis le dernier passage (filigrane stocké dans historique_meta). Les minutes et heures
+    qui ont reçu des échantillons en retard (database.append_history) sont recalculées.
+    """
+    now = int(now or time.time())
+    with transaction() as c:
+        retard = _get_meta(c, "rollup_retard", None)
+        if retard is not None:
+            c.execute("DELETE FROM historique_meta WHERE cle = 'rollup_retard'")
+
+        # Brut → 1 min
+        debut = _get_meta(c, "rollup_1m")
+        if retard is not None:
+            debut = min(debut, retard - retard % 60)
+        fin = now - now % 60
+        if fin > debut:
+            for table in _partitions_between(c, debut, fin):
+                c.execute(f"""
+                    INSERT OR REPLACE INTO historique_1m (variable_id, ts, vmin, vmax, vavg, n)
+                    SELECT variable_id, ts - ts % 60, MIN(valeur), MAX(valeur), AVG(valeur), COUNT(*)
+                    FROM {table}
+                    WHERE {_ALL_IDS} AND ts >= ? AND ts < ?
+                    GROUP BY variable_id, ts - ts % 60
+                """, (debut, fin))
+            _set_meta(c, "rollup_1m", fin)
+
+        # 1 min → 1 h (moyenne pondérée par le nombre d'échantillons)
+        debut = _get_meta(c, "rollup_1h")
+        if retard is not None:
+            debut = min(debut, retard - retard % 3600)
+        fin = now - now % 3600
+        if fin > debut:
+            c.execute(f"""
+                INSERT OR REPLACE INTO historique_1h (variable_id, ts, vmin, vmax, vavg, n)
+                SELECT variable_id, ts - ts % 3600, MIN(vmin), MAX(vmax), SUM(vavg * n) / SUM(n), SUM(n)
+                FROM historique_1m
+                WHERE {_ALL_IDS} AND ts >= ? AND ts < ?
+                GROUP BY variable_id, ts - ts % 3600
+            """, (debut, fin))
+            _set_meta(c, "rollup_1h", fin)
+
+
+# -------- Rétention --------
+def apply_retention(now=None):
+    """
+    Supprime l'historique trop ancien :
+    - partitions brutes entièrement plus vieilles que HISTORY_RAW_RETENTION_DAYS → DROP TABLE,
+      sauf si l'archivage est actif (archive.py les déplace alors vers Parquet)
+    - agrégats 1 min / 1 h selon leur propre durée (None = conservation illimitée), par le
+      temps seul (index sur ts) : l'historique des variables supprimées part aussi
+    """
+    now = int(now or time.time())
+    with transaction() as c:
+        if not archive.enabled():
+            limite_brute = history_partition(now - HISTORY_RAW_RETENTION_DAYS * 86400)
+            for table in list_history_partitions(c):
+                if table < limite_brute:
+                    drop_history_partition(c, table)
+
+        for table, jours in (("historique_1m", HISTORY_1M_RETENTION_DAYS),
+                             ("historique_1h", HISTORY_1H_RETENTION_DAYS)):
+            if jours is not None:
+                c.execute(f"DELETE FROM {table} WHERE ts < ?", (now - jours * 86400,))
+
+
+def maintenance(now=None):
+    """Agrégats puis rétention ; appelé par le thread de maintenance de la surveillance."""
+    rollup(now)
+    apply_retention(now)
+
+
+# -------- Lecture --------
+def choose_resolution(debut, fin):
+    duree = fin - debut
+    if duree <= AUTO_RAW_MAX:
+        return "raw"
+    if duree <= AUTO_1M_MAX:
+        return "1m"
+    return "1h"
+
+
+def query_history(var_ids, debut, fin, resolution="auto"):
+    """
+    Historique de une ou plusieurs variables sur [debut, fin) (epoch s).
+    resolution : "raw", "1m", "1h" ou "auto" (selon la durée demandée).
+    Retourne [(variable_id, ts, vmin, vmax, vavg), ...] trié par variable puis par temps ;
+    en brut, vmin = vmax = vavg = valeur (mois archivés lus dans les fichiers Parquet).
+    """
+    if isinstance(var_ids, int):
+        var_ids = [var_ids]
+    if not var_ids:
+        return []
+    if resolution == "auto":
+        resolution = choose_resolution(debut, fin)
+
+    marques = ",".join("?" * len(var_ids))
+    if resolution == "raw":
+        rows = []
+        with transaction() as c:
+            for table in _partitions_between(c, debut, fin):
+                c.execute(f"""
+                    SELECT variable_id, ts, valeur, valeur, valeur FROM {table}
+                    WHERE variable_id IN ({marques}) AND ts >= ? AND ts < ?
+                """, (*var_ids, debut, fin))
+                rows.extend(c.fetchall())
+            fichiers = archive.cold_files(c, "historique", debut, fin) if archive.ARROW_AVAILABLE else []
+        # Fichiers Parquet lus hors du verrou de la base : l'écriture des scans continue
+        froid = archive.read_files("historique", fichiers, debut, fin, var_ids, ("variable_id", "ts", "valeur"))
+        valeurs = froid["valeur"].tolist()
+        rows.extend(zip(froid["variable_id"].tolist(), froid["ts"].tolist(), valeurs, valeurs, valeurs))
+        rows.sort(key=lambda row: (row[0], row[1]))
+        return rows
+
+    with transaction() as c:
+        _, table = RESOLUTIONS[resolution]
+        c.execute(f"""
+            SELECT variable_id, ts, vmin, vmax, vavg FROM {table}
+            WHERE variable_id IN ({marques}) AND ts >= ? AND ts < ?
+            ORDER BY variable_id, ts
+        """, (*var_ids, debut, fin))
+        return c.fetchall()
+
+
+# -------- Exécution directe --------
+if __name__ == "__main__":
+    maintenance()
+    with transaction() as c:
+        for table in list_history_partitions(c):
+            c.execute(f"SELECT COUNT(*) FROM {table}")
+            print(f"{table[len(HISTORY_PREFIX):]} : {c.fetchone()[0]} valeurs brutes")
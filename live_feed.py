@@ -0,0 +1,359 @@
+# live_feed.py
+"""
+Flux en direct des valeurs et alarmes, poussé par la surveillance (Server-Sent Events) :
+- Snapshot : dernières valeurs publiées par le moteur, chaque changement numéroté
+  (séquence) et gardé dans un historique borné (LIVE_FEED_BACKLOG)
+- FeedServer : GET /events sur localhost ; à la connexion un instantané complet,
+  puis les changements (valeurs, événements d'alarme, variables supprimées).
+  Chaque changement est encodé une seule fois puis envoyé tel quel à tous les
+  clients : 20 écrans coûtent comme un seul, sans aucune lecture SQLite.
+  Un client reconnecté (en-tête Last-Event-ID) ne reçoit que ce qu'il a manqué,
+  ou un nouvel instantané si l'historique ne remonte plus jusque-là.
+- FeedClient : abonné (UI Tk, dashboard) qui tient à jour un Snapshot local,
+  avec la même interface que celui de la surveillance (changes_since, full)
+"""
+import http.client
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from config import (
+    LIVE_FEED_HOST, LIVE_FEED_PORT, LIVE_FEED_BACKLOG, LIVE_FEED_HEARTBEAT, LIVE_FEED_URL,
+)
+
+# Colonnes d'une ligne publiée (voir TagRegistry.row)
+ROW_COLUMNS = ("id", "nom_variable", "adresse_opc", "last_value", "min", "max")
+
+
+class Snapshot:
+    """
+    Dernières valeurs publiées par la surveillance (flux de changements pour l'UI).
+    Chaque variable porte le numéro de version de son dernier changement :
+    changes_since(v) ne renvoie que les lignes modifiées depuis la version v.
+    Les derniers changements [(version, ts, lignes, événements, supprimées)] sont
+    gardés pour le flux en direct (deltas_since).
+    """
+
+    def __init__(self, backlog=LIVE_FEED_BACKLOG):
+        self.lock = threading.Condition()
+        self.version = 0
+        self.rows = {}  # var_id → (version, (var_id, nom, adresse, valeur, min, max))
+        self.deltas = deque(maxlen=backlog)
+
+    def publish(self, rows, events=(), removed=()):
+        """
+        Lignes (seules celles qui ont changé sont retenues), événements d'alarme
+        [(var_id, type, alarme)] et variables supprimées [var_id].
+        """
+        with self.lock:
+            rows = [row for row in rows if (ancien := self.rows.get(row[0])) is None or ancien[1] != row]
+            removed = [var_id for var_id in removed if var_id in self.rows]
+            if not (rows or events or removed):
+                return
+            self.version += 1
+            for var_id in removed:
+                del self.rows[var_id]
+            for row in rows:
+                self.rows[row[0]] = (self.version, row)
+            self.deltas.append((self.version, time.time(), rows, list(events), removed))
+            self.lock.notify_all()
+
+    def replace(self, rows):
+        """Remplace tout le contenu (rechargement de la configuration, instantané reçu du flux)."""
+        with self.lock:
+            ids = {row[0] for row in rows}
+            self.publish(rows, removed=[var_id for var_id in self.rows if var_id not in ids])
+
+    def changes_since(self, version):
+        """Retourne (version courante, [lignes modifiées depuis `version`])."""
+        with self.lock:
+            return self.version, [row for v, row in self.rows.values() if v > version]
+
+    def lookup(self, ids):
+        """{var_id: ligne} des variables `ids` connues."""
+        with self.lock:
+            return {var_id: self.rows[var_id][1] for var_id in ids if var_id in self.rows}
+
+    def full(self):
+        """(version courante, toutes les lignes)."""
+        with self.lock:
+            return self.version, [row for _, row in self.rows.values()]
+
+    def deltas_since(self, version, timeout=None):
+        """
+        Attend (au plus `timeout` s) un changement postérieur à `version`.
+        Retourne (version courante, [changements]) ; None à la place de la liste si
+        l'historique ne remonte plus jusqu'à `version`.
+        """
+        with self.lock:
+            self.lock.wait_for(lambda: self.version > version, timeout)
+            if self.version <= version:
+                return self.version, []
+            if not self.deltas or self.deltas[0][0] > version + 1:
+                return self.version, None
+            return self.version, [delta for delta in self.deltas if delta[0] > version]
+
+
+def _message(event, ident, document):
+    data = json.dumps(document, separators=(",", ":"))
+    return f"id: {ident}\nevent: {event}\ndata: {data}\n\n".encode()
+
+
+# -------- Serveur --------
+class FeedServer:
+    """
+    Diffusion d'un Snapshot en Server-Sent Events.
+    Un thread de diffusion encode chaque changement une fois ; les threads des
+    clients n'envoient que des octets déjà prêts. Les identifiants d'événement
+    sont "<instance>-<version>" : après un redémarrage de la surveillance, un
+    client qui reprend avec un ancien identifiant reçoit un instantané complet.
+    """
+
+    def __init__(self, snapshot, host=LIVE_FEED_HOST, port=LIVE_FEED_PORT, heartbeat=LIVE_FEED_HEARTBEAT):
+        self.snapshot = snapshot
+        self.heartbeat = heartbeat
+        self.instance = uuid.uuid4().hex[:8]
+        self.cond = threading.Condition()
+        self.messages = deque(maxlen=snapshot.deltas.maxlen)   # (version, octets)
+        self.version = snapshot.version
+        self.running = True
+        self._snapshot_cache = (None, b"")
+        self.stats = {"clients": 0, "connections": 0, "messages": 0, "resyncs": 0, "bytes_sent": 0}
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.feed = self
+        threading.Thread(target=self._broadcast, name="live-feed", daemon=True).start()
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    @property
+    def port(self):
+        return self.httpd.server_port
+
+    def _broadcast(self):
+        while self.running:
+            version, deltas = self.snapshot.deltas_since(self.version, timeout=1.0)
+            if version == self.version:
+                continue
+            with self.cond:
+                if deltas is None:
+                    # Diffusion en retard sur l'historique : les clients repartent d'un instantané
+                    self.messages.clear()
+                else:
+                    for v, ts, rows, events, removed in deltas:
+                        self.messages.append((v, _message("delta", f"{self.instance}-{v}", {
+                            "seq": v, "ts": ts, "rows": rows, "events": events, "removed": removed})))
+                    self.stats["messages"] += len(deltas)
+                self.version = version
+                self.cond.notify_all()
+
+    def snapshot_message(self):
+        """(version, instantané complet encodé) ; un seul encodage par version."""
+        version, data = self._snapshot_cache
+        if version != self.snapshot.version:
+            version, rows = self.snapshot.full()
+            data = _message("snapshot", f"{self.instance}-{version}",
+                            {"seq": version, "columns": ROW_COLUMNS, "rows": rows})
+            self._snapshot_cache = (version, data)
+        return version, data
+
+    def next_messages(self, last):
+        """
+        Attend les changements postérieurs à `last` (au plus `heartbeat` s).
+        Retourne (version, octets à envoyer) — octets vides : rien de nouveau —
+        ou None si le client doit repartir d'un instantané.
+        """
+        with self.cond:
+            self.cond.wait_for(lambda: self.version > last or not self.running, self.heartbeat)
+            if self.version <= last:
+                return last, b""
+            if not self.messages or self.messages[0][0] > last + 1:
+                return None
+            return self.version, b"".join(data for v, data in self.messages if v > last)
+
+    def resume_version(self, last_event_id):
+        """Version de reprise d'après l'en-tête Last-Event-ID, ou None (instantané nécessaire)."""
+        instance, _, version = (last_event_id or "").partition("-")
+        if instance != self.instance or not version.isdigit() or int(version) > self.snapshot.version:
+            return None
+        return int(version)
+
+    def serve(self, wfile, last):
+        """Boucle d'un client : instantané si nécessaire, puis changements ; retourne à la déconnexion."""
+        with self.cond:
+            self.stats["clients"] += 1
+            self.stats["connections"] += 1
+        try:
+            while self.running:
+                if last is None:
+                    last, data = self.snapshot_message()
+                else:
+                    suite = self.next_messages(last)
+                    if suite is None:
+                        self.stats["resyncs"] += 1
+                        last = None
+                        continue
+                    last, data = suite
+                wfile.write(data or b": ping\n\n")
+                wfile.flush()
+                self.stats["bytes_sent"] += len(data)
+        except (OSError, ValueError):
+            pass            # client parti
+        finally:
+            with self.cond:
+                self.stats["clients"] -= 1
+
+    def close(self):
+        self.running = False
+        with self.cond:
+            self.cond.notify_all()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        feed = self.server.feed
+        chemin = self.path.split("?", 1)[0]
+        if chemin == "/snapshot":
+            version, rows = feed.snapshot.full()
+            corps = json.dumps({"seq": version, "columns": ROW_COLUMNS, "rows": rows}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(corps)))
+            self.end_headers()
+            self.wfile.write(corps)
+            return
+        if chemin != "/events":
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        feed.serve(self.wfile, feed.resume_version(self.headers.get("Last-Event-ID")))
+
+    def log_message(self, *args):
+        pass
+
+
+_server = None
+
+
+def start_server(snapshot, port=LIVE_FEED_PORT, host=LIVE_FEED_HOST):
+    """Démarre (une seule fois) le flux /events dans des threads ; retourne le serveur, ou None si le port est pris."""
+    global _server
+    if _server is None:
+        try:
+            _server = FeedServer(snapshot, host, port)
+        except OSError as e:
+            print(f"⚠️ Flux en direct indisponible sur {host}:{port} : {e}")
+            return None
+        print(f"📡 Flux en direct sur http://{host}:{_server.port}/events")
+    return _server
+
+
+def stop_server():
+    global _server
+    if _server is not None:
+        _server.close()
+        _server = None
+
+
+# -------- Client --------
+class FeedClient:
+    """
+    Abonné au flux d'une surveillance (éventuellement dans un autre processus) :
+    self.snapshot reflète l'état publié, self.connected indique si le flux est reçu.
+    Reconnexion automatique avec reprise (Last-Event-ID) et backoff.
+    """
+
+    def __init__(self, url=LIVE_FEED_URL, heartbeat=LIVE_FEED_HEARTBEAT):
+        self.url = url
+        self.heartbeat = heartbeat
+        self.snapshot = Snapshot()
+        self.connected = False
+        self.running = False
+        self.seq = 0                # dernière version reçue du serveur
+        self.last_id = None
+        self.events = deque(maxlen=200)   # derniers événements d'alarme reçus (ts, var_id, type, alarme)
+        self.stats = {"connections": 0, "messages": 0, "snapshots": 0, "errors": 0}
+
+    def start(self):
+        if not self.running and self.url:
+            self.running = True
+            threading.Thread(target=self._run, name="live-feed-client", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.running = False
+
+    def _run(self):
+        echecs = 0
+        while self.running:
+            try:
+                self._listen()
+                echecs = 0
+            except (OSError, http.client.HTTPException, ValueError):
+                echecs += 1
+                self.stats["errors"] += 1
+            if self.connected:
+                print("📡 Flux en direct interrompu, reconnexion…")
+            self.connected = False
+            time.sleep(min(30, 2 ** min(echecs, 5)) if echecs else 1)
+
+    def _listen(self):
+        url = urlsplit(self.url)
+        conn = http.client.HTTPConnection(url.hostname, url.port, timeout=2 * self.heartbeat + 5)
+        try:
+            entetes = {"Accept": "text/event-stream"}
+            if self.last_id:
+                entetes["Last-Event-ID"] = self.last_id
+            conn.request("GET", url.path or "/events", headers=entetes)
+            reponse = conn.getresponse()
+            if reponse.status != 200:
+                raise http.client.HTTPException(f"statut {reponse.status}")
+            self.stats["connections"] += 1
+
+            event, ident, data = "message", None, []
+            while self.running:
+                ligne = reponse.readline()
+                if not ligne:
+                    return                  # fin du flux (serveur arrêté)
+                ligne = ligne.decode("utf-8").rstrip("\r\n")
+                if not ligne:
+                    if data:
+                        self._dispatch(event, ident, "\n".join(data))
+                    event, ident, data = "message", None, []
+                elif not ligne.startswith(":"):
+                    champ, _, valeur = ligne.partition(":")
+                    valeur = valeur.removeprefix(" ")
+                    if champ == "event":
+                        event = valeur
+                    elif champ == "id":
+                        ident = valeur
+                    elif champ == "data":
+                        data.append(valeur)
+        finally:
+            conn.close()
+
+    def _dispatch(self, event, ident, data):
+        document = json.loads(data)
+        rows = [tuple(row) for row in document.get("rows", ())]
+        if event == "snapshot":
+            self.snapshot.replace(rows)
+            self.stats["snapshots"] += 1
+            if not self.connected:
+                print(f"📡 Flux en direct connecté ({self.url}, {len(rows)} variables)")
+        elif event == "delta":
+            events = [tuple(e) for e in document.get("events", ())]
+            self.snapshot.publish(rows, events, document.get("removed", ()))
+            self.events.extend((document["ts"], *e) for e in events)
+            self.stats["messages"] += 1
+        else:
+            return
+        self.connected = True
+        self.seq = document["seq"]
+        self.last_id = ident
@@ -0,0 +1,95 @@
+# main.py
+"""
+Service de surveillance sans interface (serveur, Raspberry Pi…) :
+- aucun import graphique, audio, PDF ou pandas : les alarmes partent vers les sorties
+  ALARM_SINKS_HEADLESS (console par défaut, voir alarm.py)
+- arrêt propre sur Ctrl+C / SIGTERM (écritures en attente vidées ou journalisées)
+- temps entre le lancement du processus et la fin du premier scan affiché,
+  comparé à STARTUP_TARGET
+
+    python main.py [--interval 10] [--mode polling|subscription] [--workers 0]
+                   [--simulation auto|always|never] [--sinks console,log] [--db surveillance.db] [--once]
+"""
+import time
+
+DEBUT = time.monotonic()    # avant les imports : le temps de démarrage les inclut
+
+import argparse
+import json
+import signal
+import sys
+import threading
+
+from config import (
+    SURVEILLANCE_INTERVAL, ACQUISITION_MODE, ACQUISITION_WORKERS, OPC_SIMULATION,
+    ALARM_SINKS_HEADLESS, STARTUP_TARGET,
+)
+
+# Modules qui ne doivent pas être chargés par le service (vérifié avec --once)
+HEAVY_MODULES = ("tkinter", "pyttsx3", "fpdf", "pandas", "pyarrow", "matplotlib", "streamlit")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Service de surveillance OPC UA sans interface")
+    parser.add_argument("--interval", type=float, default=SURVEILLANCE_INTERVAL,
+                        help="période (s) de la classe de scrutation normal")
+    parser.add_argument("--mode", choices=("polling", "subscription"), default=ACQUISITION_MODE)
+    parser.add_argument("--workers", type=int, default=ACQUISITION_WORKERS,
+                        help="processus d'acquisition (0 = lecture dans le processus principal)")
+    parser.add_argument("--simulation", choices=("auto", "always", "never"), default=OPC_SIMULATION)
+    parser.add_argument("--sinks", default=",".join(ALARM_SINKS_HEADLESS),
+                        help="sorties d'alarme séparées par des virgules (console, log, voice, popup)")
+    parser.add_argument("--db", help="fichier SQLite (défaut : DB_FILE)")
+    parser.add_argument("--once", action="store_true",
+                        help="s'arrête après le premier scan et affiche les mesures de démarrage (JSON)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    import database
+    if args.db:
+        database.DB_FILE = args.db
+    from alarm import AlarmManager
+    from surveillance import Surveillance
+
+    database.init_db()
+    database.ensure_example_data()
+    surveillance = Surveillance(
+        interval=args.interval, mode=args.mode, workers=args.workers, simulation=args.simulation,
+        alarm_manager=AlarmManager(sinks=[nom.strip() for nom in args.sinks.split(",") if nom.strip()]),
+    )
+
+    arret = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: arret.set())
+
+    surveillance.start()
+    # Attente par petits pas : les signaux sont traités entre deux attentes
+    while not arret.is_set() and not surveillance.first_scan.wait(0.2):
+        pass
+    if surveillance.first_scan.is_set():
+        demarrage = time.monotonic() - DEBUT
+        if args.once:
+            print(json.dumps({
+                "time_to_first_scan_s": demarrage,
+                "engine_first_scan_s": surveillance.stats["time_to_first_scan"],
+                "variables": len(surveillance.registry),
+                "heavy_modules": [m for m in HEAVY_MODULES if m in sys.modules],
+            }))
+            arret.set()
+        elif demarrage > STARTUP_TARGET:
+            print(f"⚠️ Premier scan {demarrage:.2f}s après le lancement (objectif {STARTUP_TARGET:g}s)")
+        else:
+            print(f"⏱️ Premier scan {demarrage:.2f}s après le lancement ({len(surveillance.registry)} variables)")
+
+    while not arret.wait(0.5):
+        pass
+    print("🛑 Arrêt de la surveillance…", file=sys.stderr if args.once else sys.stdout)
+    surveillance.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
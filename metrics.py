@@ -0,0 +1,221 @@
+# metrics.py
+"""
+Instrumentation de la surveillance :
+- timer("phase") : durée des phases d'un scan (lecture OPC, seuils, écriture base, alarmes)
+- collecteurs : compteurs / jauges lus à la demande dans les dictionnaires `stats`
+  existants (Surveillance, OPCClient, AlarmManager) et tailles de files
+- exposition au format texte Prometheus (GET /metrics) et journal structuré (JSON)
+  d'un résumé par scan via `logging`
+Désactivée (METRICS_ENABLED = False), timer() retourne un gestionnaire de
+contexte vide partagé : le coût sur le chemin chaud est un test de booléen.
+"""
+import contextlib
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import METRICS_ENABLED, METRICS_HOST, METRICS_PORT
+
+PREFIX = "surveillance"
+# Bornes (s) des histogrammes de durée de phase
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+
+logger = logging.getLogger("surveillance.metrics")
+
+_enabled = METRICS_ENABLED
+_lock = threading.Lock()
+_phases = {}        # phase → [nombre, somme, max, comptes par borne]
+_collectors = {}    # nom → (type "counter" | "gauge", aide, fonction → nombre ou {étiquette: nombre})
+_last_totals = {}   # cumul des phases au dernier log_scan (pour journaliser la part de chaque scan)
+_NULL = contextlib.nullcontext()
+
+
+def enable(actif=True):
+    global _enabled
+    _enabled = actif
+
+
+def enabled():
+    return _enabled
+
+
+# -------- Durées de phase --------
+class _Timer:
+    __slots__ = ("phase", "debut")
+
+    def __init__(self, phase):
+        self.phase = phase
+
+    def __enter__(self):
+        self.debut = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.phase, time.perf_counter() - self.debut)
+
+
+def timer(phase):
+    """with timer("opc_read"): ... → durée ajoutée à l'histogramme de la phase (si activé)."""
+    return _Timer(phase) if _enabled else _NULL
+
+
+def observe(phase, secondes):
+    with _lock:
+        h = _phases.get(phase)
+        if h is None:
+            h = _phases[phase] = [0, 0.0, 0.0, [0] * len(BUCKETS)]
+        h[0] += 1
+        h[1] += secondes
+        h[2] = max(h[2], secondes)
+        for i, borne in enumerate(BUCKETS):
+            if secondes <= borne:
+                h[3][i] += 1
+                break
+
+
+def phase_totals():
+    """{phase: (nombre, somme_s, max_s)} depuis le démarrage."""
+    with _lock:
+        return {phase: (h[0], h[1], h[2]) for phase, h in _phases.items()}
+
+
+# -------- Compteurs et jauges --------
+def register(kind, nom, aide, fonction):
+    """
+    Enregistre une métrique lue à la demande (aucun coût pendant le scan).
+    fonction() retourne un nombre, ou un dictionnaire {valeur d'étiquette: nombre}.
+    Un nouvel enregistrement sous le même nom remplace le précédent.
+    """
+    _collectors[nom] = (kind, aide, fonction)
+
+
+def register_stats(stats, prefix, gauges=()):
+    """Expose chaque clé d'un dictionnaire `stats` existant (compteur, ou jauge si listée dans gauges)."""
+    for cle in list(stats):
+        kind = "gauge" if cle in gauges else "counter"
+        register(kind, f"{prefix}_{cle}", f"{prefix} : {cle}", lambda cle=cle: stats.get(cle, 0))
+
+
+def collect():
+    """{nom: valeur ou {étiquette: valeur}} pour toutes les métriques enregistrées."""
+    valeurs = {}
+    for nom, (kind, aide, fonction) in list(_collectors.items()):
+        try:
+            valeurs[nom] = fonction()
+        except Exception:
+            continue
+    return valeurs
+
+
+# -------- Exposition Prometheus --------
+def _format(valeur):
+    return repr(float(valeur))
+
+
+def render():
+    lignes = []
+    valeurs = collect()
+    for nom, (kind, aide, _) in list(_collectors.items()):
+        if nom not in valeurs:
+            continue
+        complet = f"{PREFIX}_{nom}" + ("_total" if kind == "counter" else "")
+        lignes.append(f"# HELP {complet} {aide}")
+        lignes.append(f"# TYPE {complet} {kind}")
+        valeur = valeurs[nom]
+        if isinstance(valeur, dict):
+            for etiquette, v in valeur.items():
+                lignes.append(f'{complet}{{key="{etiquette}"}} {_format(v)}')
+        else:
+            lignes.append(f"{complet} {_format(valeur)}")
+
+    with _lock:
+        phases = {phase: (h[0], h[1], list(h[3])) for phase, h in _phases.items()}
+    if phases:
+        nom = f"{PREFIX}_phase_seconds"
+        lignes.append(f"# HELP {nom} Durée des phases d'un scan")
+        lignes.append(f"# TYPE {nom} histogram")
+        for phase, (nombre, somme, comptes) in sorted(phases.items()):
+            cumul = 0
+            for borne, n in zip(BUCKETS, comptes):
+                cumul += n
+                lignes.append(f'{nom}_bucket{{phase="{phase}",le="{borne}"}} {cumul}')
+            lignes.append(f'{nom}_bucket{{phase="{phase}",le="+Inf"}} {nombre}')
+            lignes.append(f'{nom}_sum{{phase="{phase}"}} {_format(somme)}')
+            lignes.append(f'{nom}_count{{phase="{phase}"}} {nombre}')
+    return "\n".join(lignes) + "\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        corps = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(corps)))
+        self.end_headers()
+        self.wfile.write(corps)
+
+    def log_message(self, *args):
+        pass
+
+
+_server = None
+
+
+def start_server(port=METRICS_PORT, host=METRICS_HOST):
+    """Démarre (une seule fois) le point d'accès HTTP /metrics dans un thread ; retourne le serveur."""
+    global _server
+    if _server is None:
+        _server = ThreadingHTTPServer((host, port), _Handler)
+        threading.Thread(target=_server.serve_forever, daemon=True).start()
+        print(f"📈 Métriques disponibles sur http://{host}:{_server.server_port}/metrics")
+    return _server
+
+
+def stop_server():
+    global _server
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+        _server = None
+
+
+# -------- Journal structuré --------
+class JsonFormatter(logging.Formatter):
+    """Une ligne JSON par enregistrement ; les champs passés dans extra={"fields": {...}} sont inclus."""
+
+    def format(self, record):
+        document = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        document.update(getattr(record, "fields", {}))
+        return json.dumps(document, ensure_ascii=False, default=str)
+
+
+def setup_logging(level=logging.INFO):
+    """Journal JSON sur la sortie d'erreur pour le logger "surveillance" (si aucun gestionnaire n'est configuré)."""
+    racine = logging.getLogger("surveillance")
+    if not racine.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(JsonFormatter())
+        racine.addHandler(handler)
+    racine.setLevel(level)
+
+
+def log_scan(duree, variables):
+    """Résumé d'un scan en une ligne : durée, variables, temps passé dans chaque phase, métriques."""
+    if not _enabled or not logger.isEnabledFor(logging.INFO):
+        return
+    champs = {"scan_s": round(duree, 6), "variables": variables}
+    for phase, (_, somme, _) in phase_totals().items():
+        champs[f"{phase}_s"] = round(somme - _last_totals.get(phase, 0.0), 6)
+        _last_totals[phase] = somme
+    champs.update(collect())
+    logger.info("scan", extra={"fields": champs})
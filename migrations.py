@@ -0,0 +1,323 @@
+# migrations.py
+"""
+Migrations versionnées du schéma SQLite.
+La version appliquée est stockée dans PRAGMA user_version ; chaque migration
+est appliquée une seule fois, dans sa propre transaction, par ordre de version.
+"""
+
+from itertools import product
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    def enregistrer(fonction):
+        MIGRATIONS.append((version, description, fonction))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fonction
+    return enregistrer
+
+
+def _columns(c, table):
+    c.execute(f"PRAGMA table_info({table})")
+    return [col[1] for col in c.fetchall()]
+
+
+def schema_version(c):
+    c.execute("PRAGMA user_version")
+    return c.fetchone()[0]
+
+
+def migrate(c):
+    """Applique les migrations manquantes ; retourne la version finale du schéma."""
+    conn = c.connection
+    version = schema_version(c)
+    for numero, description, fonction in MIGRATIONS:
+        if numero <= version:
+            continue
+        if not conn.in_transaction:
+            c.execute("BEGIN")
+        try:
+            fonction(c)
+            c.execute(f"PRAGMA user_version = {numero}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"🛠️ Migration {numero} appliquée : {description}")
+        version = numero
+    return version
+
+
+# -------- Migrations --------
+@migration(1, "équipement des variables et index de la vue paginée")
+def _m1_variables_equipement(c):
+    if "etat_id" not in _columns(c, "variables"):
+        c.execute("ALTER TABLE variables ADD COLUMN etat_id INTEGER REFERENCES etats(id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_variables_nom ON variables(nom_variable)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_variables_etat_nom ON variables(etat_id, nom_variable)")
+
+
+def _tables_variable_id(c):
+    """Tables qui référencent une variable (colonne variable_id)."""
+    c.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name")
+    return [table for (table,) in c.fetchall() if "variable_id" in _columns(c, table)]
+
+
+@migration(2, "adresse OPC unique")
+def _m2_adresse_unique(c):
+    # Adresses en double : la variable de plus petit id est conservée ; les événements et
+    # l'historique des autres lui sont rattachés (même instant : l'échantillon conservé gagne)
+    c.execute("""
+        SELECT adresse_opc, MIN(id), GROUP_CONCAT(id) FROM variables
+        WHERE adresse_opc IS NOT NULL
+        GROUP BY adresse_opc HAVING COUNT(*) > 1
+    """)
+    doublons = c.fetchall()
+    tables = _tables_variable_id(c) if doublons else []
+    for adresse, garde, ids in doublons:
+        fusionnees = sorted(int(i) for i in ids.split(",") if int(i) != garde)
+        marques = ",".join("?" * len(fusionnees))
+        for table in tables:
+            c.execute(f"UPDATE OR IGNORE {table} SET variable_id = ? WHERE variable_id IN ({marques})",
+                      (garde, *fusionnees))
+            c.execute(f"DELETE FROM {table} WHERE variable_id IN ({marques})", fusionnees)
+        c.execute(f"DELETE FROM variables WHERE id IN ({marques})", fusionnees)
+        print(f"⚠️ Adresse OPC {adresse} en double : variable(s) {fusionnees} fusionnée(s) dans {garde}")
+    c.execute("DROP INDEX IF EXISTS idx_variables_adresse")
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_variables_adresse ON variables(adresse_opc)")
+
+
+@migration(3, "horodatage epoch des événements et index")
+def _m3_evenements_ts(c):
+    if "ts" not in _columns(c, "evenements"):
+        c.execute("ALTER TABLE evenements ADD COLUMN ts INTEGER")
+    # date_heure est en heure locale → conversion en epoch UTC
+    c.execute("""
+        UPDATE evenements SET ts = CAST(strftime('%s', date_heure, 'utc') AS INTEGER)
+        WHERE ts IS NULL
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_evenements_ts ON evenements(ts)")
+    # Index partiel : seules les alarmes non acquittées y figurent (dashboard, acquittement)
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_evenements_alarmes
+        ON evenements(variable_id) WHERE alarme = 1
+    """)
+
+
+@migration(4, "qualité des valeurs (good / uncertain / bad / simulated)")
+def _m4_qualite(c):
+    from database import list_history_partitions
+    if "qualite" not in _columns(c, "variables"):
+        c.execute("ALTER TABLE variables ADD COLUMN qualite INTEGER NOT NULL DEFAULT 0")
+    for table in list_history_partitions(c):
+        if "qualite" not in _columns(c, table):
+            c.execute(f"ALTER TABLE {table} ADD COLUMN qualite INTEGER NOT NULL DEFAULT 0")
+
+
+@migration(5, "serveur OPC UA par variable (acquisition multi-serveurs)")
+def _m5_endpoint(c):
+    if "endpoint" not in _columns(c, "variables"):
+        c.execute("ALTER TABLE variables ADD COLUMN endpoint TEXT")
+
+
+@migration(6, "journal des changements de configuration des variables (rechargement à chaud)")
+def _m6_variables_changes(c):
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS variables_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            variable_id INTEGER NOT NULL,
+            ts INTEGER NOT NULL
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_variables_changes_ts ON variables_changes(ts)")
+    # Seules les colonnes de configuration sont suivies : les écritures de scan
+    # (last_value, last_update, qualite) et les acquittements ne sont pas journalisés
+    journal = "INSERT INTO variables_changes (variable_id, ts) VALUES ({}.id, CAST(strftime('%s', 'now') AS INTEGER))"
+    c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_variables_insert AFTER INSERT ON variables
+        BEGIN {journal.format("NEW")}; END
+    """)
+    c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_variables_delete AFTER DELETE ON variables
+        BEGIN {journal.format("OLD")}; END
+    """)
+    c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_variables_update
+        AFTER UPDATE OF nom_variable, adresse_opc, type, min, max, endpoint ON variables
+        WHEN OLD.nom_variable IS NOT NEW.nom_variable OR OLD.adresse_opc IS NOT NEW.adresse_opc
+          OR OLD.type IS NOT NEW.type OR OLD.min IS NOT NEW.min OR OLD.max IS NOT NEW.max
+          OR OLD.endpoint IS NOT NEW.endpoint
+        BEGIN {journal.format("NEW")}; END
+    """)
+
+
+@migration(7, "classes de scrutation et bandes mortes par variable")
+def _m7_scan_class_deadband(c):
+    colonnes = _columns(c, "variables")
+    if "scan_class" not in colonnes:
+        c.execute("ALTER TABLE variables ADD COLUMN scan_class TEXT NOT NULL DEFAULT 'normal'")
+    if "deadband" not in colonnes:
+        c.execute("ALTER TABLE variables ADD COLUMN deadband REAL")
+    if "deadband_pct" not in colonnes:
+        c.execute("ALTER TABLE variables ADD COLUMN deadband_pct REAL")
+    # Les nouvelles colonnes font partie de la configuration suivie (rechargement à chaud)
+    c.execute("DROP TRIGGER IF EXISTS trg_variables_update")
+    c.execute("""
+        CREATE TRIGGER trg_variables_update
+        AFTER UPDATE OF nom_variable, adresse_opc, type, min, max, endpoint, scan_class, deadband, deadband_pct
+        ON variables
+        WHEN OLD.nom_variable IS NOT NEW.nom_variable OR OLD.adresse_opc IS NOT NEW.adresse_opc
+          OR OLD.type IS NOT NEW.type OR OLD.min IS NOT NEW.min OR OLD.max IS NOT NEW.max
+          OR OLD.endpoint IS NOT NEW.endpoint OR OLD.scan_class IS NOT NEW.scan_class
+          OR OLD.deadband IS NOT NEW.deadband OR OLD.deadband_pct IS NOT NEW.deadband_pct
+        BEGIN
+            INSERT INTO variables_changes (variable_id, ts) VALUES (NEW.id, CAST(strftime('%s', 'now') AS INTEGER));
+        END
+    """)
+
+
+@migration(8, "index partiel des variables hors seuils (filtre d'alarme de la vue paginée)")
+def _m8_variables_hors_seuils(c):
+    # Clause WHERE identique à database.ALARM_EXPR ; seules les variables en alarme y figurent
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_variables_hors_seuils
+        ON variables(nom_variable) WHERE (last_value < min OR last_value > max)
+    """)
+
+
+@migration(9, "index temporels des agrégats de l'historique (rétention)")
+def _m9_historique_ts(c):
+    for table in ("historique_1m", "historique_1h"):
+        c.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_ts ON {table}(ts)")
+
+
+@migration(10, "index de tri des seuils (vue paginée)")
+def _m10_variables_seuils(c):
+    # Seuils modifiés seulement par la configuration : index sans coût pour les scans
+    c.execute("CREATE INDEX IF NOT EXISTS idx_variables_min ON variables(min)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_variables_max ON variables(max)")
+
+
+@migration(11, "index des événements par variable (suppression de variables)")
+def _m11_evenements_variable(c):
+    c.execute("CREATE INDEX IF NOT EXISTS idx_evenements_variable ON evenements(variable_id)")
+
+
+# -------- Contrôle des plans de requêtes --------
+def hot_queries():
+    """Requêtes fréquentes qui ne doivent jamais parcourir une table entière."""
+    from database import (SQL_UPDATE_VARIABLE, SQL_UPDATE_QUALITY, SQL_ACQUIT_VARIABLE, SQL_ACQUIT_EVENTS,
+                          SQL_CONFIG_CHANGES)
+    from report import SQL_EVENTS_RANGE
+    from archive import SQL_ARCHIVE_EVENTS
+    return {
+        "update_variable": (SQL_UPDATE_VARIABLE, (0.0, "", 0, 1)),
+        "update_qualite": (SQL_UPDATE_QUALITY, (2, 1)),
+        "changements_configuration": (SQL_CONFIG_CHANGES, (0,)),
+        "acquit_variable": (SQL_ACQUIT_VARIABLE, (1,)),
+        "acquit_evenements": (SQL_ACQUIT_EVENTS, (1,)),
+        "rapport_journalier": (SQL_EVENTS_RANGE, (0, 86400)),
+        "archivage_evenements": (SQL_ARCHIVE_EVENTS, (0, 86400)),
+        "dashboard_alarmes": ("SELECT * FROM evenements WHERE alarme = 1", ()),
+        "dashboard_historique": ("SELECT * FROM evenements ORDER BY ts DESC LIMIT 50", ()),
+        "variable_par_adresse": ("SELECT id FROM variables WHERE adresse_opc = ?", ("ns=2;s=X",)),
+        "suppression_evenements": ("DELETE FROM evenements WHERE variable_id IN (?)", (1,)),
+        "retention_1m": ("DELETE FROM historique_1m WHERE ts < ?", (0,)),
+        "retention_1h": ("DELETE FROM historique_1h WHERE ts < ?", (0,)),
+        **{nom: (sql, params) for nom, (sql, params, _) in page_queries().items()},
+    }
+
+
+# Vue paginée : filtres contrôlés (valeurs d'essai), combinés à chaque filtre d'alarme
+PAGE_FILTERS = {
+    "": {},
+    "_prefixe": {"prefix": "Temp"},
+    "_equipement": {"etat_id": 1},
+    "_prefixe_equipement": {"prefix": "Temp", "etat_id": 1},
+}
+ALARM_FILTERS = {"": None, "_ok": False, "_alarmes": True}
+HORS_SEUILS = "idx_variables_hors_seuils"
+
+
+def page_queries():
+    """
+    Requêtes de la vue paginée, construites par database.variables_page_sql pour chaque
+    combinaison de filtres, chaque colonne triable et chaque sens :
+    {nom: (sql, paramètres, index dont le parcours est admis ou None)}.
+    """
+    from database import SORTABLE_COLUMNS, variables_page_sql
+    requetes = {}
+    for (suffixe, filtres), (suffixe_alarme, alarme) in product(PAGE_FILTERS.items(), ALARM_FILTERS.items()):
+        nom = f"vue{suffixe}{suffixe_alarme}"
+        for colonne, index_tri in SORTABLE_COLUMNS.items():
+            for desc in (False, True):
+                comptage, params_comptage, page, params = variables_page_sql(
+                    alarme=alarme, order_by=colonne, desc=desc, **filtres)
+                # Alarmes : index partiel ; préfixe / équipement : recherche d'index seulement ;
+                # sinon parcours ordonné de l'index de tri, arrêté par LIMIT
+                admis = HORS_SEUILS if alarme else (None if filtres else index_tri)
+                requetes[f"{nom}_tri_{colonne}{'_desc' if desc else ''}"] = (page, (*params, 50, 0), admis)
+        # Le comptage de toutes les variables (sans filtre) parcourt forcément un index entier
+        if filtres or alarme:
+            requetes[f"{nom}_nombre"] = (comptage, tuple(params_comptage), HORS_SEUILS if alarme else None)
+    return requetes
+
+
+# Seuls parcours (SCAN) admis, requête par requête : l'index nommé est parcouru, pas la table
+ALLOWED_SCANS = {
+    # index partiels : ne contiennent que les alarmes non acquittées / les variables hors seuils
+    "dashboard_alarmes": "idx_evenements_alarmes",
+    # parcours de l'index par la fin, arrêté par LIMIT 50
+    "dashboard_historique": "idx_evenements_ts",
+}
+
+# Index partiels (peu de lignes) : un tri en B-tree temporaire après leur parcours est admis
+PARTIAL_INDEXES = ("idx_evenements_alarmes", HORS_SEUILS)
+
+
+def allowed_scans():
+    """ALLOWED_SCANS complété des requêtes de la vue paginée (voir page_queries)."""
+    return {**ALLOWED_SCANS, **{nom: index for nom, (_, _, index) in page_queries().items() if index}}
+
+
+def _scan(detail):
+    return detail.startswith("SCAN") and detail != "SCAN CONSTANT ROW"
+
+
+def full_scans(c):
+    """
+    Retourne {nom_requête: [détail du plan]} pour les requêtes qui parcourent une table,
+    directement ou par un index complet, hors parcours admis (allowed_scans), ou qui trient
+    en B-tree temporaire le résultat d'un parcours autre qu'un index partiel.
+    """
+    resultat = {}
+    admis_par_requete = allowed_scans()
+    partiels = tuple(f"INDEX {index}" for index in PARTIAL_INDEXES)
+    for nom, (sql, params) in hot_queries().items():
+        c.execute("EXPLAIN QUERY PLAN " + sql, params)
+        plan = [row[3] for row in c.fetchall()]
+        admis = admis_par_requete.get(nom)
+        scans = [d for d in plan if _scan(d) and not (admis and d.endswith(f"INDEX {admis}"))]
+        if any(_scan(d) and not d.endswith(partiels) for d in plan):
+            scans += [d for d in plan if d.startswith("USE TEMP B-TREE")]
+        if scans:
+            resultat[nom] = scans
+    return resultat
+
+
+def check_query_plans(c):
+    """Lève RuntimeError si une requête fréquente parcourt une table (voir full_scans)."""
+    scans = full_scans(c)
+    if scans:
+        raise RuntimeError(f"Parcours complets de table détectés : {scans}")
+
+
+# -------- Exécution directe --------
+if __name__ == "__main__":
+    from database import init_db, transaction
+    init_db()
+    with transaction() as c:
+        print(f"Version du schéma : {schema_version(c)}")
+        check_query_plans(c)
+    print("✅ Aucune requête fréquente ne parcourt une table entière")
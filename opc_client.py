@@ -1,93 +1,408 @@
 # opc_client.py
 import random
-import math
+import re
+import threading
 import time
+from collections import namedtuple
 from datetime import datetime
 
 try:
-    from opcua import Client
+    from opcua import Client, ua
     OPCUA_AVAILABLE = True
 except ImportError:
     OPCUA_AVAILABLE = False
 
-from config import OPC_SERVER_URL
+from config import (
+    OPC_SERVER_URL, OPC_ENDPOINTS, OPC_READ_CHUNK_SIZE, OPC_READ_TIMEOUT,
+    SUBSCRIPTION_DEFAULTS, SUBSCRIPTION_OVERRIDES,
+    OPC_SIMULATION, OPC_BREAKER_FAILURES, OPC_RECONNECT_BASE, OPC_RECONNECT_MAX,
+)
+from simulator import PlantSimulator
+
+# Qualité d'une valeur (code stocké en base avec la valeur, colonne qualite)
+QUALITY_GOOD, QUALITY_UNCERTAIN, QUALITY_BAD, QUALITY_SIMULATED = range(4)
+QUALITIES = ("good", "uncertain", "bad", "simulated")
+
+# Résultat d'une lecture groupée : valeur, code de statut OPC UA, horodatage source et qualité
+ReadResult = namedtuple("ReadResult", ["value", "status", "timestamp", "quality"])
+
+
+def endpoint_url(endpoint):
+    """URL du serveur d'une variable (colonne endpoint : nom de passerelle, URL, ou vide)."""
+    if not endpoint:
+        return OPC_SERVER_URL
+    return OPC_ENDPOINTS.get(endpoint, endpoint)
+
+
+def quality_of(status):
+    """Qualité à partir du nom du code de statut OPC UA (Good…, Uncertain…, Bad…)."""
+    if status.startswith("Good"):
+        return QUALITY_GOOD
+    if status.startswith("Uncertain"):
+        return QUALITY_UNCERTAIN
+    return QUALITY_BAD
+
+
+# Syntaxe d'un NodeId, contrôlée sans la bibliothèque opcua : [ns=<n>; | nsu=<uri>;]<i|s|g|b>=<id>
+NODE_ID = re.compile(r"(?:(?:ns=\d+|nsu=[^;]+);)?(?:i=\d+|s=[^;]*|g=[0-9A-Fa-f-]+|b=[^;]+)")
+
+
+def valid_address(adresse_opc):
+    """True si adresse_opc est un NodeId OPC UA (ex : "ns=2;s=Fours.Four1.Temp")."""
+    if not OPCUA_AVAILABLE:
+        return NODE_ID.fullmatch(adresse_opc) is not None
+    try:
+        ua.NodeId.from_string(adresse_opc)
+        return True
+    except Exception:
+        return False
+
+
+class CircuitBreaker:
+    """
+    Santé d'un point d'accès OPC UA (partagée par toutes les sessions vers la même URL) :
+    - fermé : les appels passent ; OPC_BREAKER_FAILURES échecs consécutifs → ouvert
+    - ouvert : les appels sont refusés immédiatement (pas de timeout réseau) jusqu'à
+      la prochaine tentative, après un délai qui double à chaque échec
+      (OPC_RECONNECT_BASE → OPC_RECONNECT_MAX, avec une part aléatoire)
+    - semi-ouvert : une seule tentative ; succès → fermé, échec → ouvert
+    """
+
+    def __init__(self, failures=OPC_BREAKER_FAILURES, base=OPC_RECONNECT_BASE, max_delay=OPC_RECONNECT_MAX):
+        self.threshold = failures
+        self.base = base
+        self.max_delay = max_delay
+        self.lock = threading.Lock()
+        self.state = "closed"
+        self.failures = 0
+        self.delay = base
+        self.retry_at = 0.0
+        self.stats = {"opened": 0, "rejected": 0}
+
+    def allow(self):
+        with self.lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() >= self.retry_at:
+                self.state = "half_open"
+                return True
+            self.stats["rejected"] += 1
+            return False
+
+    def success(self):
+        with self.lock:
+            self.state, self.failures, self.delay = "closed", 0, self.base
+
+    def failure(self):
+        """Enregistre un échec ; retourne True si le disjoncteur vient de s'ouvrir."""
+        with self.lock:
+            self.failures += 1
+            if self.state != "half_open" and self.failures < self.threshold:
+                return False
+            ouverture = self.state != "open"
+            self.state = "open"
+            self.retry_at = time.monotonic() + self.delay * random.uniform(1.0, 1.5)
+            self.delay = min(self.delay * 2, self.max_delay)
+            if ouverture:
+                self.stats["opened"] += 1
+            return ouverture
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def endpoint_breaker(server_url):
+    """Disjoncteur associé à une URL de serveur (créé au premier appel)."""
+    with _breakers_lock:
+        breaker = _breakers.get(server_url)
+        if breaker is None:
+            breaker = _breakers[server_url] = CircuitBreaker()
+        return breaker
+
+
+def subscription_params(adresse_opc):
+    """Paramètres d'abonnement (sampling_ms, deadband, queue_size) d'une variable."""
+    params = dict(SUBSCRIPTION_DEFAULTS)
+    params.update(SUBSCRIPTION_OVERRIDES.get(adresse_opc, {}))
+    return params
+
+
+def monitored_item_request(nodeid, handle, sampling_ms, queue_size, deadband=0):
+    """
+    Requête de création d'un élément surveillé (valeur du nœud), pour
+    Subscription.create_monitored_items : `handle` doit être unique dans la souscription.
+    deadband > 0 → notification seulement si la valeur varie de plus de `deadband` (absolu).
+    """
+    rv = ua.ReadValueId()
+    rv.NodeId = nodeid
+    rv.AttributeId = ua.AttributeIds.Value
+    mparams = ua.MonitoringParameters()
+    mparams.ClientHandle = handle
+    mparams.SamplingInterval = sampling_ms
+    mparams.QueueSize = queue_size
+    mparams.DiscardOldest = True
+    if deadband:
+        mfilter = ua.DataChangeFilter()
+        mfilter.Trigger = ua.DataChangeTrigger.StatusValue
+        mfilter.DeadbandType = ua.DeadbandType.Absolute
+        mfilter.DeadbandValue = float(deadband)
+        mparams.Filter = mfilter
+    mir = ua.MonitoredItemCreateRequest()
+    mir.ItemToMonitor = rv
+    mir.MonitoringMode = ua.MonitoringMode.Reporting
+    mir.RequestedParameters = mparams
+    return mir
+
+
+class _SubscriptionHandler:
+    """Relaie les notifications OPC UA vers le callback (adresse_opc, ReadResult)."""
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.adresses = {}  # NodeId → adresse_opc
+
+    def datachange_notification(self, node, val, data):
+        dv = data.monitored_item.Value
+        adresse = self.adresses.get(node.nodeid, node.nodeid.to_string())
+        status = dv.StatusCode.name
+        self.callback(adresse, ReadResult(val, status, dv.SourceTimestamp, quality_of(status)))
 
 
 class OPCClient:
     """
-    Client OPC UA simulé ou réel.
-    - Si le serveur OPC UA est accessible → lecture réelle
-    - Sinon → simulation avec données aléatoires réalistes
+    Client OPC UA avec reconnexion automatique.
+    - Connexion perdue ou refusée → nouvelles tentatives espacées (backoff exponentiel,
+      disjoncteur par point d'accès) ; entre deux tentatives les lectures échouent
+      immédiatement avec la qualité "bad"
+    - simulation (OPC_SIMULATION) : "auto" → valeurs simulées (qualité "simulated")
+      tant que le serveur n'a jamais répondu, "always" → jamais de serveur réel,
+      "never" → jamais de valeurs simulées
     """
 
-    def __init__(self, server_url=OPC_SERVER_URL):
+    def __init__(self, server_url=OPC_SERVER_URL, chunk_size=OPC_READ_CHUNK_SIZE, simulation=OPC_SIMULATION):
         self.server_url = server_url
+        self.chunk_size = chunk_size
+        self.simulation = simulation
         self.client = None
-        self.simulation_mode = False
-        self.t0 = time.time()
+        self.connected = False
+        self.ever_connected = False
+        self.simulation_mode = simulation == "always"
+        self.simulator = PlantSimulator()
+        self.breaker = endpoint_breaker(server_url)
+        # Cache adresse_opc → Node (résolu une seule fois par session)
+        self._nodes = {}
+        self._subscriptions = []
+        self.stats = {"reads": 0, "read_errors": 0, "simulation_fallbacks": 0,
+                      "reconnects": 0, "fast_failures": 0}
 
     def connect(self):
-        if OPCUA_AVAILABLE:
-            try:
-                self.client = Client(self.server_url)
-                self.client.connect()
-                print(f"✅ Connecté au serveur OPC UA : {self.server_url}")
-                self.simulation_mode = False
-                return
-            except Exception as e:
+        """Tente une connexion si le disjoncteur le permet ; retourne True si connecté."""
+        if self.connected or self.simulation == "always":
+            return self.connected
+        if not OPCUA_AVAILABLE:
+            if not self.simulation_mode:
+                print("⚠️ Bibliothèque opcua non installée → passage en mode simulation.")
+                self._fallback()
+            return False
+        if not self.breaker.allow():
+            return False
+
+        try:
+            client = Client(self.server_url, timeout=OPC_READ_TIMEOUT)
+            client.connect()
+        except Exception as e:
+            ouverture = self.breaker.failure()
+            if not self.ever_connected and not self.simulation_mode and self.simulation == "auto":
                 print(f"⚠️ Impossible de se connecter au serveur OPC UA ({e}), passage en mode simulation.")
+                self._fallback()
+            elif ouverture:
+                print(f"⚠️ Serveur OPC UA injoignable ({self.server_url}) : {e} — "
+                      f"nouvelle tentative dans {self.breaker.retry_at - time.monotonic():.0f}s")
+            return False
+
+        self.client = client
+        self.connected = True
+        self.simulation_mode = False
+        self.breaker.success()
+        if self.ever_connected:
+            self.stats["reconnects"] += 1
+            print(f"✅ Reconnecté au serveur OPC UA : {self.server_url}")
         else:
-            print("⚠️ Bibliothèque opcua non installée → passage en mode simulation.")
+            print(f"✅ Connecté au serveur OPC UA : {self.server_url}")
+        self.ever_connected = True
+        return True
 
-        self.simulation_mode = True
+    def _fallback(self):
+        if self.simulation != "never":
+            self.simulation_mode = True
+            self.stats["simulation_fallbacks"] += 1
 
-    def disconnect(self):
-        if self.client:
+    def _connection_lost(self, erreur):
+        """Lecture en échec : la session est abandonnée, la reconnexion passera par le disjoncteur."""
+        self.stats["read_errors"] += 1
+        if self.breaker.failure():
+            print(f"⚠️ Connexion OPC UA perdue ({self.server_url}) : {erreur}")
+        self._drop_client()
+
+    def _drop_client(self):
+        self.unsubscribe_all()
+        self._nodes.clear()
+        client, self.client, self.connected = self.client, None, False
+        if client:
             try:
-                self.client.disconnect()
-                print("🔌 Déconnecté du serveur OPC UA")
-            except Exception as e:
-                print(f"Erreur lors de la déconnexion : {e}")
+                client.disconnect()
+            except Exception:
+                pass
+        return client
+
+    def disconnect(self):
+        if self._drop_client():
+            print("🔌 Déconnecté du serveur OPC UA")
+
+    def available(self):
+        """Connecté (ou reconnecté si le disjoncteur autorise une tentative)."""
+        return self.connected or self.connect()
 
     def read_variable(self, adresse_opc, nom_variable, vtype="reel"):
+        """Lit une variable ; retourne la valeur, ou None si la lecture a échoué."""
+        return self.read_many([(adresse_opc, nom_variable, vtype)])[0].value
+
+    def read_many(self, variables, chunk_size=None):
         """
-        Lit une variable OPC UA ou retourne une valeur simulée.
+        Lecture groupée d'une liste de (adresse_opc, nom_variable, type).
+        - Les nœuds sont résolus une seule fois puis gardés en cache ; une adresse qui n'est
+          pas un NodeId valide n'est jamais envoyée (qualité "bad" pour elle seule)
+        - Un seul appel au service Read par paquet de `chunk_size` nœuds
+        - Serveur indisponible → échec immédiat (qualité "bad"), ou valeurs simulées
+          (qualité "simulated") en mode simulation
+        Retourne une liste de ReadResult dans le même ordre que `variables`.
         """
-        if self.simulation_mode or not self.client:
-            return self._simulate_value(nom_variable, vtype)
+        variables = list(variables)
+        if not self.available():
+            return self.unavailable_results(variables)
 
-        try:
-            node = self.client.get_node(adresse_opc)
-            value = node.get_value()
-            return value
-        except Exception as e:
-            print(f"⚠️ Erreur de lecture sur {nom_variable} ({adresse_opc}): {e}")
-            return self._simulate_value(nom_variable, vtype)
+        chunk_size = chunk_size or self.chunk_size
+        results = []
+        for start in range(0, len(variables), chunk_size):
+            chunk = variables[start:start + chunk_size]
+            if not self.connected:
+                results.extend(self.unavailable_results(chunk))
+                continue
+            self.stats["reads"] += len(chunk)
+            try:
+                results.extend(self._read_chunk(chunk))
+            except Exception as e:
+                # Erreur de transport ou de session (les adresses invalides n'en lèvent pas)
+                self._connection_lost(e)
+                results.extend(self.unavailable_results(chunk))
+        return results
 
-    def _simulate_value(self, nom_variable, vtype="reel"):
+    def unavailable_results(self, variables):
+        """Résultats sans serveur : simulés en mode simulation, sinon "bad" sans valeur."""
+        now = datetime.now()
+        if self.simulation_mode:
+            self.stats["reads"] += len(variables)
+            return [ReadResult(value, "Simulated", now, QUALITY_SIMULATED)
+                    for value in self._simulate_values(variables)]
+        self.stats["fast_failures"] += len(variables)
+        return [ReadResult(None, "BadNotConnected", now, QUALITY_BAD)] * len(variables)
+
+    def _read_chunk(self, chunk):
+        """Un appel Read multi-nœuds pour les variables du paquet dont l'adresse est valide."""
+        params = ua.ReadParameters()
+        results = [None] * len(chunk)
+        lues = []
+        for i, (adresse_opc, _, _) in enumerate(chunk):
+            node = self._get_node(adresse_opc)
+            if node is None:
+                results[i] = ReadResult(None, "BadNodeIdInvalid", datetime.now(), QUALITY_BAD)
+                continue
+            rv = ua.ReadValueId()
+            rv.NodeId = node.nodeid
+            rv.AttributeId = ua.AttributeIds.Value
+            params.NodesToRead.append(rv)
+            lues.append(i)
+
+        data_values = self.client.uaclient.read(params) if lues else []
+        for i, dv in zip(lues, data_values):
+            status = dv.StatusCode.name
+            quality = quality_of(status)
+            value = dv.Value.Value if dv.Value is not None and quality != QUALITY_BAD else None
+            results[i] = ReadResult(value, status, dv.SourceTimestamp, quality)
+        return results
+
+    def subscribe(self, variables, callback):
         """
-        Génère une valeur simulée :
-        - TempFour1 → sinus autour de 60°C
-        - PressionBC2 → valeurs normales autour de 3.0
-        - VibrationBK3 → valeurs faibles, pics parfois
-        - Booléens → alternance aléatoire
+        Abonnement (mode push) à une liste de (adresse_opc, nom_variable, type).
+        - Une souscription OPC UA par intervalle d'échantillonnage
+        - Deadband absolu et taille de file par variable (voir subscription_params)
+        - callback(adresse_opc, ReadResult) est appelé à chaque changement de valeur
+        Retourne False si l'abonnement est impossible (simulation) → rester en polling.
         """
-        elapsed = time.time() - self.t0
+        if not self.available():
+            return False
 
-        if vtype == "bool":
-            return random.choice([0, 1])
+        handler = _SubscriptionHandler(callback)
+        groupes = {}
+        for adresse_opc, _, vtype in variables:
+            params = subscription_params(adresse_opc)
+            groupes.setdefault(params["sampling_ms"], []).append((adresse_opc, vtype, params))
 
-        if "TempFour" in nom_variable:
-            return 60 + 10 * math.sin(elapsed / 10) + random.uniform(-2, 2)
+        try:
+            for sampling_ms, items in groupes.items():
+                sub = self.client.create_subscription(sampling_ms, handler)
+                self._subscriptions.append(sub)
+                requests = []
+                for handle, (adresse_opc, vtype, params) in enumerate(items, 1):
+                    node = self._get_node(adresse_opc)
+                    if node is None:
+                        print(f"⚠️ Adresse OPC UA invalide, non abonnée : {adresse_opc}")
+                        continue
+                    handler.adresses[node.nodeid] = adresse_opc
+                    deadband = params["deadband"] if vtype != "bool" else 0
+                    requests.append(monitored_item_request(
+                        node.nodeid, handle, sampling_ms, params["queue_size"], deadband))
+                for mir, result in zip(requests, sub.create_monitored_items(requests)):
+                    if isinstance(result, ua.StatusCode):
+                        print(f"⚠️ Abonnement refusé pour {mir.ItemToMonitor.NodeId.to_string()} : {result.name}")
+        except Exception as e:
+            print(f"⚠️ Impossible de créer les abonnements OPC UA ({e}), retour au polling.")
+            self.unsubscribe_all()
+            return False
 
-        if "Pression" in nom_variable:
-            return 3.0 + random.uniform(-0.5, 0.5)
+        print(f"📡 {len(variables)} variables abonnées ({len(groupes)} souscriptions)")
+        return True
 
-        if "Vibration" in nom_variable:
-            return random.choice([0.2, 0.3, 0.5, 1.1, 1.3])
+    def unsubscribe_all(self):
+        for sub in self._subscriptions:
+            try:
+                sub.delete()
+            except Exception:
+                pass
+        self._subscriptions = []
 
-        # Valeur générique pour tout autre cas
-        return random.uniform(0, 10)
+    def _get_node(self, adresse_opc):
+        """Nœud d'une adresse (cache de session) ; None si l'adresse n'est pas un NodeId valide."""
+        if adresse_opc in self._nodes:
+            return self._nodes[adresse_opc]
+        try:
+            node = self.client.get_node(adresse_opc)        # analyse locale, sans appel réseau
+        except Exception:
+            node = None
+        self._nodes[adresse_opc] = node
+        return node
+
+    def _simulate_values(self, variables):
+        """
+        Valeurs simulées pour une liste de (adresse_opc, nom_variable, type[, min, max]) :
+        les variables inconnues sont ajoutées au simulateur (profil selon le nom,
+        ou centré dans [min, max] si les seuils sont fournis), puis toutes sont lues
+        en un seul accès vectorisé. Booléens → 0 / 1.
+        """
+        self.simulator.add_tags(variables)
+        values = self.simulator.read([var[0] for var in variables]).tolist()
+        return [int(v) if var[2] == "bool" else v for var, v in zip(variables, values)]
 
 
 # -------- Test en exécution directe --------
@@ -102,4 +417,13 @@ if __name__ == "__main__":
         print("ContactUrgence =", client.read_variable("ns=2;s=Urgence.Contact", "ContactUrgence", "bool"))
         time.sleep(1)
 
+    variables = [
+        ("ns=2;s=Fours.Four1.Temp", "TempFour1", "reel"),
+        ("ns=2;s=BC2.Pression", "PressionBC2", "reel"),
+        ("ns=2;s=BK3.Vibration", "VibrationBK3", "reel"),
+        ("ns=2;s=Urgence.Contact", "ContactUrgence", "bool"),
+    ]
+    for (_, nom, _), res in zip(variables, client.read_many(variables)):
+        print(f"{nom} = {res.value} [{res.status}] @ {res.timestamp}")
+
     client.disconnect()
@@ -0,0 +1,179 @@
+# opc_server.py
+import sys
+import time
+from datetime import datetime
+
+from opcua import Server, ua
+
+from config import OPC_SERVER_URL, SIMULATOR_STEP
+from simulator import PlantSimulator
+
+
+class LocalOPCServer:
+    """
+    Serveur OPC UA local (dans le même processus) qui remplace l'automate.
+    Sert pour les essais de OPCClient sans matériel réel :
+    - chaque variable est exposée sous son adresse_opc (ex: ns=2;s=Fours.Four1.Temp)
+    - add_variables() crée les nœuds en masse (un appel AddNodes) : ~0,4 ms par variable,
+      soit ~40 s pour l'usine synthétique de 100 000 variables
+    - set_value() permet de faire évoluer les valeurs depuis le script d'essai
+    - serve_simulation() rejoue un PlantSimulator (toutes les variables à chaque pas)
+    """
+
+    NAMESPACE = "urn:lafargeholcim:surveillance"
+    # Variables par dossier : l'espace d'adresses python-opcua parcourt toutes les références
+    # du parent à chaque ajout → dossiers bornés pour une création linéaire (100 000 variables)
+    FOLDER_SIZE = 100
+
+    def __init__(self, endpoint=OPC_SERVER_URL):
+        self.endpoint = endpoint
+        self.server = Server()
+        self.server.set_endpoint(endpoint)
+        self.server.set_server_name("Surveillance - Serveur local")
+        self.ns = self.server.register_namespace(self.NAMESPACE)
+        self.nodes = {}
+        self.types = {}
+        self._folder = None
+        self._folders = 0
+        self._folder_size = 0
+
+    def add_variable(self, adresse_opc, nom_variable, valeur=0.0, vtype="reel"):
+        """Crée un nœud variable à l'adresse donnée et le retourne."""
+        return self.add_variables([(adresse_opc, nom_variable, valeur, vtype)])[0]
+
+    def add_variables(self, variables):
+        """
+        Création en masse de nœuds variables [(adresse_opc, nom_variable, valeur, type), ...] :
+        un seul appel AddNodes pour tout le lot. Retourne les nœuds, dans l'ordre.
+        """
+        items = []
+        for adresse_opc, nom_variable, valeur, vtype in variables:
+            if vtype == "bool":
+                variant = ua.Variant(bool(valeur), ua.VariantType.Boolean)
+            else:
+                variant = ua.Variant(float(valeur), ua.VariantType.Double)
+            items.append(self._variable_item(self._next_folder(), ua.NodeId.from_string(adresse_opc),
+                                             ua.QualifiedName(nom_variable, self.ns), variant))
+
+        objects = self.server.get_objects_node()
+        nodes = []
+        for (adresse_opc, _, _, vtype), result in zip(variables, objects.server.add_nodes(items)):
+            result.StatusCode.check()
+            node = self.nodes[adresse_opc] = self.server.get_node(result.AddedNodeId)
+            self.types[adresse_opc] = vtype
+            nodes.append(node)
+        return nodes
+
+    def _next_folder(self):
+        """Dossier (NodeId) qui reçoit la prochaine variable ; nouveau dossier tous les FOLDER_SIZE nœuds."""
+        if self._folder is None or self._folder_size >= self.FOLDER_SIZE:
+            self._folders += 1
+            self._folder = self.server.get_objects_node().add_folder(self.ns, f"Variables{self._folders}").nodeid
+            self._folder_size = 0
+        self._folder_size += 1
+        return self._folder
+
+    @staticmethod
+    def _variable_item(parent, nodeid, qname, variant):
+        """AddNodesItem d'une variable scalaire en lecture seule (comme Node.add_variable)."""
+        item = ua.AddNodesItem()
+        item.RequestedNewNodeId = nodeid
+        item.BrowseName = qname
+        item.NodeClass = ua.NodeClass.Variable
+        item.ParentNodeId = parent
+        item.ReferenceTypeId = ua.NodeId(ua.ObjectIds.HasComponent)
+        item.TypeDefinition = ua.NodeId(ua.ObjectIds.BaseDataVariableType)
+        attrs = ua.VariableAttributes()
+        attrs.Description = ua.LocalizedText(qname.Name)
+        attrs.DisplayName = ua.LocalizedText(qname.Name)
+        attrs.DataType = ua.NodeId(getattr(ua.ObjectIds, variant.VariantType.name))
+        attrs.Value = variant
+        attrs.ValueRank = ua.ValueRank.Scalar
+        attrs.WriteMask = attrs.UserWriteMask = 0
+        attrs.Historizing = False
+        attrs.AccessLevel = attrs.UserAccessLevel = ua.AccessLevel.CurrentRead.mask
+        item.NodeAttributes = attrs
+        return item
+
+    def set_value(self, adresse_opc, valeur):
+        node = self.nodes[adresse_opc]
+        dv = ua.DataValue(ua.Variant(valeur, node.get_data_type_as_variant_type()))
+        dv.SourceTimestamp = datetime.utcnow()
+        node.set_value(dv)
+
+    def set_values(self, adresses, valeurs, timestamp=None):
+        """
+        Écriture en masse : même horodatage source pour tout le lot, écriture
+        directe dans l'espace d'adresses (pas de requête Write par nœud).
+        """
+        timestamp = timestamp or datetime.utcnow()
+        for adresse_opc, valeur in zip(adresses, valeurs):
+            node = self.nodes[adresse_opc]
+            if self.types[adresse_opc] == "bool":
+                variant = ua.Variant(bool(valeur), ua.VariantType.Boolean)
+            else:
+                variant = ua.Variant(float(valeur), ua.VariantType.Double)
+            dv = ua.DataValue(variant)
+            dv.SourceTimestamp = timestamp
+            self.server.set_attribute_value(node.nodeid, dv)
+
+    def serve_simulation(self, simulateur, period=SIMULATOR_STEP, running=lambda: True):
+        """
+        Crée un nœud par variable du simulateur puis publie un pas toutes les
+        `period` secondes, tant que running() est vrai. Retourne le nombre de pas
+        en retard (durée de publication > period).
+        """
+        self.add_variables([
+            (adresse_opc, adresse_opc.split("=")[-1], valeur, "bool" if is_bool else "reel")
+            for adresse_opc, valeur, is_bool in zip(simulateur.adresses, simulateur.values, simulateur.is_bool)
+            if adresse_opc not in self.nodes])
+
+        retards = 0
+        prochain = time.monotonic()
+        while running():
+            self.set_values(simulateur.adresses, simulateur.step().tolist())
+            prochain += period
+            attente = prochain - time.monotonic()
+            if attente > 0:
+                time.sleep(attente)
+            else:
+                retards += 1
+                prochain = time.monotonic()
+        return retards
+
+    def start(self):
+        self.server.start()
+        print(f"✅ Serveur OPC UA local démarré : {self.endpoint}")
+
+    def stop(self):
+        self.server.stop()
+        print("🔌 Serveur OPC UA local arrêté")
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# -------- Exécution directe --------
+# python opc_server.py          → variables de démonstration
+# python opc_server.py 100000   → usine synthétique de 100 000 variables
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        simulateur = PlantSimulator.synthetic(int(sys.argv[1]))
+    else:
+        simulateur = PlantSimulator()
+        simulateur.add_tags([
+            ("ns=2;s=Fours.Four1.Temp", "TempFour1", "reel"),
+            ("ns=2;s=BC2.Pression", "PressionBC2", "reel"),
+            ("ns=2;s=BK3.Vibration", "VibrationBK3", "reel"),
+            ("ns=2;s=Urgence.Contact", "ContactUrgence", "bool"),
+        ])
+
+    with LocalOPCServer() as server:
+        try:
+            server.serve_simulation(simulateur)
+        except KeyboardInterrupt:
+            pass
@@ -1,41 +1,201 @@
 # report.py
+import heapq
+import itertools
 import sqlite3
+import threading
+import time
+from collections import Counter
+import numpy as np
 from fpdf import FPDF
 from datetime import datetime
-from config import DB_FILE
-
-def generate_daily_report():
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-
-    today = datetime.now().strftime("%Y-%m-%d")
-    c.execute("""
-        SELECT e.date_heure, v.nom_variable, e.evenement, e.alarme
-        FROM evenements e
-        JOIN variables v ON e.variable_id = v.id
-        WHERE date_heure LIKE ?
-    """, (today + "%",))
-    rows = c.fetchall()
-    conn.close()
-
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", "B", 16)
-    pdf.cell(0, 10, f"Rapport Journalier - {today}", ln=True, align="C")
-
-    pdf.set_font("Arial", size=12)
-    pdf.ln(10)
-    pdf.cell(0, 10, "Liste des événements :", ln=True)
-
-    if rows:
-        for row in rows:
-            date, variable, evenement, alarme = row
-            statut = "🚨 ALARME" if alarme == 1 else "OK"
-            texte = f"[{date}] {variable} - {evenement} - {statut}"
-            pdf.multi_cell(0, 10, texte)  # ✅ utilise multi_cell pour gérer le retour à la ligne
-    else:
-        pdf.cell(0, 10, "Aucun événement aujourd’hui.", ln=True)
+import archive
+import database
+from config import REPORT_CHUNK_SIZE, REPORT_INCLUDE_EVENTS, REPORT_MAX_EVENTS
+from database import day_bounds
 
+# Plage [début, fin) en epoch → utilise idx_evenements_ts
+SQL_EVENTS_RANGE = """
+    SELECT e.ts, e.date_heure, v.nom_variable, e.evenement, e.alarme
+    FROM evenements e
+    JOIN variables v ON e.variable_id = v.id
+    WHERE e.ts >= ? AND e.ts < ?
+    ORDER BY e.ts
+"""
+
+# -------- Synthèse (calculée par SQLite, sans charger les événements) --------
+SQL_SUMMARY = """
+    SELECT COUNT(*), COALESCE(SUM(alarme = 1), 0)
+    FROM evenements WHERE ts >= ? AND ts < ?
+"""
+# Heure locale (comme date_heure) : un jour de changement d'heure compte 23 ou 25 heures
+SQL_PER_HOUR = """
+    SELECT CAST(strftime('%H', ts, 'unixepoch', 'localtime') AS INTEGER) AS heure, COUNT(*)
+    FROM evenements WHERE ts >= ? AND ts < ?
+    GROUP BY heure ORDER BY heure
+"""
+SQL_PER_VARIABLE = """
+    SELECT e.variable_id, v.nom_variable, COUNT(*) AS n, SUM(e.evenement = 'min'), SUM(e.evenement = 'max')
+    FROM evenements e
+    JOIN variables v ON e.variable_id = v.id
+    WHERE e.ts >= ? AND e.ts < ?
+    GROUP BY e.variable_id ORDER BY n DESC
+"""
+
+
+def local_hours(ts, debut, fin):
+    """Heure locale (0-23) de chaque horodatage `ts` (tableau NumPy) du jour [debut, fin)."""
+    heures = np.array([time.localtime(pas).tm_hour for pas in range(debut, fin, 3600)])
+    return heures[(ts - debut) // 3600]
+
+
+def daily_summary(c, debut, fin, top=10, froid=None):
+    """
+    Nombre d'événements, répartition par heure et variables les plus en alarme.
+    froid : événements archivés du jour (archive.read_cold), ajoutés aux comptes de la base.
+    """
+    c.execute(SQL_SUMMARY, (debut, fin))
+    total, alarmes = c.fetchone()
+    c.execute(SQL_PER_HOUR, (debut, fin))
+    par_heure = c.fetchall()
+    c.execute(SQL_PER_VARIABLE, (debut, fin))
+    comptes = {var_id: row for var_id, *row in c.fetchall()}
+    par_variable = [tuple(row) for row in comptes.values()]
+
+    if froid is not None and len(froid["ts"]):
+        total += len(froid["ts"])
+        alarmes += int((froid["alarme"] == 1).sum())
+        heures = Counter(dict(par_heure))
+        heures.update(local_hours(froid["ts"], debut, fin).tolist())
+        par_heure = sorted(heures.items())
+
+        noms = dict(c.execute("SELECT id, nom_variable FROM variables").fetchall())
+        for var_id, evenement in zip(froid["variable_id"].tolist(), froid["evenement"].tolist()):
+            if var_id in noms:
+                compte = comptes.setdefault(var_id, [noms[var_id], 0, 0, 0])
+                compte[1] += 1
+                compte[2] += evenement == "min"
+                compte[3] += evenement == "max"
+        par_variable = sorted(map(tuple, comptes.values()), key=lambda row: row[1], reverse=True)
+
+    return {
+        "total": total,
+        "alarmes": alarmes,
+        "par_heure": par_heure,
+        "par_variable": par_variable,
+        "top": par_variable[:top],
+    }
+
+
+def event_rows(c, debut, fin, froid=None):
+    """(date, variable, événement, alarme) de la base et de l'archive `froid`, dans l'ordre du temps."""
+    archives = []
+    if froid is not None and len(froid["ts"]):
+        noms = dict(c.execute("SELECT id, nom_variable FROM variables").fetchall())
+        archives = [(ts, date, noms[var_id], evenement, alarme) for ts, date, var_id, evenement, alarme in zip(
+            froid["ts"].tolist(), froid["date_heure"].tolist(), froid["variable_id"].tolist(),
+            froid["evenement"].tolist(), froid["alarme"].tolist()) if var_id in noms]
+    # Lecture de la base en dernier : le curseur ne doit plus servir avant la fin du parcours
+    c.execute(SQL_EVENTS_RANGE, (debut, fin))
+    chaud = itertools.chain.from_iterable(iter(lambda: c.fetchmany(REPORT_CHUNK_SIZE), []))
+    return (row[1:] for row in heapq.merge(archives, chaud, key=lambda row: row[0]))
+
+
+def generate_daily_report(jour=None, include_events=REPORT_INCLUDE_EVENTS,
+                          max_events=REPORT_MAX_EVENTS, progress=None, db_file=None):
+    """
+    Génère le rapport PDF d'un jour (aujourd'hui par défaut).
+    - la synthèse (par heure, par variable, pires variables) est calculée en SQL
+    - la liste détaillée est optionnelle, lue par paquets de REPORT_CHUNK_SIZE
+      et limitée à `max_events` lignes
+    - progress(fraction, message) est appelé au fil de la génération
+    - db_file : base lue (défaut : database.DB_FILE au moment de l'appel)
+    """
+    def avancer(fraction, message):
+        if progress:
+            progress(fraction, message)
+
+    jour = jour or datetime.now().date()
+    today = jour.strftime("%Y-%m-%d")
+    debut, fin = day_bounds(jour)
+
+    db_file = db_file or database.DB_FILE
+    conn = sqlite3.connect(db_file)
+    try:
+        c = conn.cursor()
+        avancer(0.0, "Calcul de la synthèse…")
+        # Jour déjà archivé (en tout ou partie) : fichiers Parquet du mois lus avec la base
+        froid = archive.read_cold(c, "evenements", debut, fin, db_file=db_file, sort="ts")
+        resume = daily_summary(c, debut, fin, froid=froid)
+
+        pdf = FPDF()
+        pdf.add_page()
+        pdf.set_font("Arial", "B", 16)
+        pdf.cell(0, 10, f"Rapport Journalier - {today}", ln=True, align="C")
+
+        pdf.set_font("Arial", size=12)
+        pdf.ln(10)
+        pdf.cell(0, 8, f"Événements : {resume['total']}   dont alarmes : {resume['alarmes']}", ln=True)
+
+        if resume["total"]:
+            pdf.ln(4)
+            pdf.set_font("Arial", "B", 12)
+            pdf.cell(0, 8, "Variables les plus en alarme :", ln=True)
+            pdf.set_font("Arial", size=11)
+            for nom, n, n_min, n_max in resume["top"]:
+                pdf.cell(0, 7, f"{nom} : {n} événements (min : {n_min}, max : {n_max})", ln=True)
+
+            pdf.ln(4)
+            pdf.set_font("Arial", "B", 12)
+            pdf.cell(0, 8, "Événements par heure :", ln=True)
+            pdf.set_font("Arial", size=11)
+            for heure, n in resume["par_heure"]:
+                pdf.cell(0, 7, f"{heure:02d}h : {n}", ln=True)
+        else:
+            pdf.cell(0, 10, f"Aucun événement le {today}.", ln=True)
+        avancer(0.1, "Synthèse terminée")
+
+        if include_events and resume["total"]:
+            pdf.ln(6)
+            pdf.set_font("Arial", size=12)
+            pdf.cell(0, 10, "Liste des événements :", ln=True)
+            pdf.set_font("Arial", size=9)
+
+            a_lister = min(resume["total"], max_events)
+            lignes = itertools.islice(event_rows(c, debut, fin, froid), a_lister)
+            for ecrits, (date, variable, evenement, alarme) in enumerate(lignes, 1):
+                if alarme == 1:
+                    statut = "ALARME"
+                else:
+                    statut = "ACQUITTÉE" if evenement in ("min", "max") else "OK"
+                pdf.cell(0, 5, f"[{date}] {variable} - {evenement} - {statut}", ln=True)
+                if ecrits % REPORT_CHUNK_SIZE == 0 or ecrits == a_lister:
+                    avancer(0.1 + 0.8 * ecrits / a_lister, f"{ecrits} / {a_lister} événements")
+
+            if resume["total"] > a_lister:
+                pdf.ln(2)
+                pdf.cell(0, 6, f"... {resume['total'] - a_lister} événements supplémentaires non listés "
+                               f"(voir le tableau de bord).", ln=True)
+    finally:
+        conn.close()
+
+    avancer(0.9, "Écriture du fichier PDF…")
     filename = f"rapport_{today}.pdf"
     pdf.output(filename)
+    avancer(1.0, "Rapport généré")
     return filename
+
+
+def generate_report_in_background(on_done, progress=None, **kwargs):
+    """
+    Lance generate_daily_report dans un thread.
+    on_done(filename, erreur) est appelé depuis ce thread à la fin.
+    """
+    def travail():
+        try:
+            on_done(generate_daily_report(progress=progress, **kwargs), None)
+        except Exception as e:
+            on_done(None, e)
+
+    thread = threading.Thread(target=travail, daemon=True)
+    thread.start()
+    return thread
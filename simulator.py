@@ -0,0 +1,232 @@
+# simulator.py
+"""
+Simulateur d'usine vectorisé et déterministe.
+Toutes les valeurs d'un scan (N variables) sont calculées en quelques opérations
+NumPy. Le bruit et les défauts sont des fonctions pures de
+(graine, adresse OPC de la variable, numéro de pas) : une même variable donne
+la même série quel que soit l'ordre d'enregistrement ou le nombre de variables.
+
+Modèles de signal :
+- "sine" : oscillation lente autour du point de fonctionnement + bruit
+- "walk" : marche aléatoire avec rappel vers le point de fonctionnement
+Défauts superposés (probabilités par pas, voir config) :
+- échelon (step)   : décalage franc pendant une durée
+- pic (spike)      : valeur aberrante sur un seul pas
+- figée (stuck)    : la valeur ne bouge plus pendant une durée
+"""
+import time
+import zlib
+
+import numpy as np
+
+from config import (
+    SIMULATOR_SEED, SIMULATOR_STEP, SIMULATOR_P_STEP, SIMULATOR_P_SPIKE,
+    SIMULATOR_P_STUCK, SIMULATOR_FAULT_DURATION, SIMULATOR_MAX_CATCHUP,
+)
+
+# Profils par défaut quand les seuils ne sont pas connus
+#   motif dans le nom → (point de fonctionnement, amplitude, modèle)
+PROFILES = {
+    "TempFour": (60.0, 10.0, "sine"),
+    "Pression": (3.0, 0.5, "walk"),
+    "Vibration": (0.6, 0.4, "walk"),
+}
+DEFAULT_PROFILE = (5.0, 5.0, "walk")
+
+_M1 = np.uint64(0xBF58476D1CE4E5B9)
+_M2 = np.uint64(0x94D049BB133111EB)
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _splitmix(x):
+    x = (x + _GOLDEN)
+    x = (x ^ (x >> np.uint64(30))) * _M1
+    x = (x ^ (x >> np.uint64(27))) * _M2
+    return x ^ (x >> np.uint64(31))
+
+
+def _uniform(cles, k, sel):
+    """Uniforme [0, 1) déterministe pour chaque clé de variable, au pas k, pour le tirage `sel`."""
+    with np.errstate(over="ignore"):
+        x = _splitmix(cles ^ _splitmix(np.uint64(k) * np.uint64(16) + np.uint64(sel)))
+    return (x >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+def _normal(cles, k, sel):
+    """Normale centrée réduite (Box-Muller) à partir de deux uniformes."""
+    u1 = np.maximum(_uniform(cles, k, sel), 1e-12)
+    u2 = _uniform(cles, k, sel + 1)
+    return np.sqrt(-2.0 * np.log(u1)) * np.cos(2.0 * np.pi * u2)
+
+
+class PlantSimulator:
+    """Génère les valeurs de toutes les variables enregistrées, un pas à la fois."""
+
+    def __init__(self, seed=SIMULATOR_SEED, dt=SIMULATOR_STEP, p_step=SIMULATOR_P_STEP,
+                 p_spike=SIMULATOR_P_SPIKE, p_stuck=SIMULATOR_P_STUCK,
+                 fault_duration=SIMULATOR_FAULT_DURATION, realtime=True):
+        self.seed = seed
+        self.dt = dt
+        self.p_step, self.p_spike, self.p_stuck = p_step, p_spike, p_stuck
+        self.fault_duration = fault_duration
+        # realtime=False : read() ne fait pas avancer le temps, l'appelant appelle step() (essais rejouables)
+        self.realtime = realtime
+        self.t0 = time.time()
+        self.k = -1                 # dernier pas calculé
+        self.index = {}             # adresse_opc → position dans les tableaux
+        self.adresses = []
+        n = 0
+        self.cles = np.empty(n, np.uint64)
+        self.offset = np.empty(n)
+        self.amplitude = np.empty(n)
+        self.period = np.empty(n)
+        self.phase = np.empty(n)
+        self.is_walk = np.empty(n, bool)
+        self.is_bool = np.empty(n, bool)
+        self.walk = np.empty(n)
+        self.step_until = np.empty(n, np.int64)
+        self.step_offset = np.empty(n)
+        self.stuck_until = np.empty(n, np.int64)
+        self.values = np.empty(n)
+
+    def __len__(self):
+        return len(self.adresses)
+
+    # -------- Enregistrement des variables --------
+    def add_tags(self, tags):
+        """
+        Ajoute des variables (adresse_opc, nom, type[, min, max]) ; les variables
+        déjà connues sont ignorées. Avec des seuils, le point de fonctionnement est
+        le milieu de [min, max] et l'amplitude reste dans la plage (hors défauts).
+        """
+        nouvelles, vues = [], set()
+        for tag in tags:
+            if tag[0] in self.index or tag[0] in vues:
+                continue
+            vues.add(tag[0])
+            nouvelles.append(tag)
+        if not nouvelles:
+            return
+
+        m = len(nouvelles)
+        cles = np.array([zlib.crc32(t[0].encode()) for t in nouvelles], np.uint64)
+        with np.errstate(over="ignore"):
+            cles = cles ^ _splitmix(np.uint64(self.seed))
+        offset, amplitude, walk_model, is_bool = np.empty(m), np.empty(m), np.empty(m, bool), np.empty(m, bool)
+        for i, tag in enumerate(nouvelles):
+            nom, vtype = tag[1], tag[2]
+            vmin, vmax = (tag[3], tag[4]) if len(tag) >= 5 else (None, None)
+            is_bool[i] = vtype == "bool"
+            if vmin is not None and vmax is not None and vmax > vmin:
+                offset[i], amplitude[i], modele = (vmin + vmax) / 2, (vmax - vmin) * 0.3, "sine"
+            else:
+                offset[i], amplitude[i], modele = next(
+                    (p for motif, p in PROFILES.items() if motif in nom), DEFAULT_PROFILE)
+            walk_model[i] = modele == "walk"
+
+        # Paramètres propres à chaque variable, dérivés de sa clé (pas de l'ordre d'ajout)
+        period = 60.0 + 540.0 * _uniform(cles, 0, 10)
+        phase = 2 * np.pi * _uniform(cles, 0, 11)
+
+        base = len(self.adresses)
+        for i, tag in enumerate(nouvelles):
+            self.index[tag[0]] = base + i
+        self.adresses.extend(t[0] for t in nouvelles)
+        self.cles = np.r_[self.cles, cles]
+        self.offset = np.r_[self.offset, offset]
+        self.amplitude = np.r_[self.amplitude, amplitude]
+        self.period = np.r_[self.period, period]
+        self.phase = np.r_[self.phase, phase]
+        self.is_walk = np.r_[self.is_walk, walk_model]
+        self.is_bool = np.r_[self.is_bool, is_bool]
+        self.walk = np.r_[self.walk, np.zeros(m)]
+        self.step_until = np.r_[self.step_until, np.full(m, -1, np.int64)]
+        self.step_offset = np.r_[self.step_offset, np.zeros(m)]
+        self.stuck_until = np.r_[self.stuck_until, np.full(m, -1, np.int64)]
+        self.values = np.r_[self.values, np.where(is_bool, 1.0, offset)]
+
+    @classmethod
+    def synthetic(cls, n_tags, seed=SIMULATOR_SEED, **kwargs):
+        """Usine fictive de n_tags variables (10 % booléennes) pour les essais de charge."""
+        sim = cls(seed=seed, **kwargs)
+        sim.add_tags([
+            (f"ns=2;s=Sim.Tag{i}", f"Tag{i}", "bool" if i % 10 == 9 else "reel",
+             1 if i % 10 == 9 else 0.0, 1 if i % 10 == 9 else 100.0)
+            for i in range(n_tags)
+        ])
+        return sim
+
+    # -------- Calcul --------
+    def step(self):
+        """Calcule le pas suivant pour toutes les variables ; retourne le tableau des valeurs."""
+        k = self.k + 1
+        cles = self.cles
+        bruit = _normal(cles, k, 0)
+
+        # Modèles de base
+        t = k * self.dt
+        sinus = self.offset + self.amplitude * np.sin(2 * np.pi * t / self.period + self.phase)
+        self.walk = 0.98 * self.walk + 0.05 * self.amplitude * bruit
+        base = np.where(self.is_walk, self.offset + self.walk, sinus + 0.05 * self.amplitude * bruit)
+
+        # Défaut échelon
+        debut_step = (_uniform(cles, k, 2) < self.p_step) & (self.step_until < k)
+        signe = np.where(_uniform(cles, k, 3) < 0.5, -1.0, 1.0)
+        self.step_until = np.where(debut_step, k + self.fault_duration, self.step_until)
+        self.step_offset = np.where(debut_step, signe * 2.0 * self.amplitude, self.step_offset)
+        valeurs = base + np.where(self.step_until >= k, self.step_offset, 0.0)
+
+        # Pic isolé
+        pic = _uniform(cles, k, 4) < self.p_spike
+        valeurs = valeurs + np.where(pic, signe * 4.0 * self.amplitude, 0.0)
+
+        # Booléens : vrai (état normal) sauf pendant un défaut
+        en_defaut = (self.step_until >= k) | pic
+        valeurs = np.where(self.is_bool, np.where(en_defaut, 0.0, 1.0), valeurs)
+
+        # Valeur figée
+        debut_stuck = (_uniform(cles, k, 5) < self.p_stuck) & (self.stuck_until < k)
+        self.stuck_until = np.where(debut_stuck, k + self.fault_duration, self.stuck_until)
+        fige = (self.stuck_until >= k) & ~debut_stuck
+        self.values = np.where(fige, self.values, valeurs)
+
+        self.k = k
+        return self.values
+
+    def current_step(self):
+        return int((time.time() - self.t0) / self.dt)
+
+    def advance_to(self, k):
+        """Rattrape jusqu'au pas k (au plus SIMULATOR_MAX_CATCHUP pas calculés, le reste est sauté)."""
+        if k <= self.k:
+            return self.values
+        if k - self.k > SIMULATOR_MAX_CATCHUP:
+            self.k = k - SIMULATOR_MAX_CATCHUP
+        while self.k < k:
+            self.step()
+        return self.values
+
+    def positions(self, adresses):
+        """Positions (tableau d'index) d'adresses enregistrées, à réutiliser avec read_at()."""
+        return np.fromiter((self.index[a] for a in adresses), np.int64, len(adresses))
+
+    def read_at(self, positions):
+        """Valeurs courantes aux positions données (voir positions())."""
+        valeurs = self.advance_to(self.current_step()) if self.realtime else self.values
+        return valeurs[positions]
+
+    def read(self, adresses):
+        """Valeurs courantes des adresses demandées, enregistrées au préalable."""
+        valeurs = self.advance_to(self.current_step()) if self.realtime else self.values
+        return valeurs[[self.index[a] for a in adresses]]
+
+
+# -------- Exécution directe --------
+if __name__ == "__main__":
+    for n in (1_000, 10_000, 100_000):
+        sim = PlantSimulator.synthetic(n)
+        debut = time.perf_counter()
+        for _ in range(20):
+            sim.step()
+        duree = (time.perf_counter() - debut) / 20
+        print(f"{n:>7} variables : {duree * 1000:6.2f} ms par pas ({n / duree / 1e6:.1f} M valeurs/s)")
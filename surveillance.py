@@ -1,73 +1,525 @@
 # surveillance.py
+import asyncio
+import queue
 import threading
 import time
-import random
-from database import get_active_variables, update_variable, log_event, acquit_alarme
-from alarm import AlarmManager
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from database import EVENT_RETOUR_NORMAL
+from alarm_state import SIDES
+from opc_client import OPCClient, QUALITY_GOOD, QUALITY_BAD, QUALITY_SIMULATED
+from tag_registry import TagRegistry, to_values
+from live_feed import Snapshot
+from writeback import WriteBehind
+import archive
+import database
+import history
+import live_feed
+import metrics
+from config import (
+    ACQUISITION_MODE, ACQUISITION_WORKERS, SCAN_MAX_CONCURRENT_READS, OPC_READ_TIMEOUT,
+    HISTORY_MAINTENANCE_INTERVAL, METRICS_PORT, CONFIG_RELOAD_INTERVAL, WRITEBACK_FLUSH_TIMEOUT,
+    LIVE_FEED_PORT, SCAN_CLASSES, OPC_SIMULATION, SURVEILLANCE_INTERVAL, ARCHIVE_INTERVAL,
+)
 
 
 class Surveillance:
-    def __init__(self, interval=10):
+    def __init__(self, interval=SURVEILLANCE_INTERVAL, mode=ACQUISITION_MODE, alarm_manager=None, workers=ACQUISITION_WORKERS,
+                 simulation=OPC_SIMULATION):
         self.interval = interval
+        self.mode = mode
+        self.workers = workers
         self.running = False
         self.thread = None
-        self.alarm_manager = AlarmManager()
+        if alarm_manager is None:
+            # Import ici : inutile quand l'appelant fournit ses propres sorties d'alarme
+            from alarm import AlarmManager
+            alarm_manager = AlarmManager()
+        self.alarm_manager = alarm_manager
+        # Valeurs courantes publiées pour l'interface (sans passer par la base),
+        # diffusées aux autres processus par le flux en direct (live_feed.py)
+        self.snapshot = Snapshot()
+        self.feed = None
+        # Variables, dernières valeurs et états d'alarme en mémoire (tableaux NumPy)
+        self.registry = TagRegistry()
+        self.alarm_manager.on_acknowledge = self.registry.acknowledge
+        # Écriture en base dans un thread dédié : le scan ne fait que déposer le lot.
+        # Ouverte par start() (open_writer) : seul le processus qui fait l'acquisition ouvre
+        # et rejoue le journal, pas une interface qui crée la surveillance sans la démarrer
+        self.writer = None
+        # Positions des variables dans le simulateur de chaque session (mode simulation)
+        self._sim_index = {}
+        self.opc = OPCClient(simulation=simulation)
+        # Une session OPC UA par (serveur, namespace) (moteur asyncio)
+        self.sessions = {}
+        # Processus d'acquisition (workers > 0), démarrés par run_polling
+        self.pool = None
+        # Thread de contrôle (moteur asyncio) : registre, contrôle des seuils, instantané et
+        # statistiques ne sont modifiés que par lui → contrôles des groupes exécutés l'un après l'autre
+        self.control = ThreadPoolExecutor(max_workers=1, thread_name_prefix="controle")
+        # Reconnexions en cours (tâches asyncio par namespace) : le scan ne les attend pas
+        self._reconnecting = {}
+        # Notifications OPC UA (mode subscription) → thread de surveillance
+        self.notifications = queue.Queue()
+        # Agrégats / rétention de l'historique et archivage Parquet : threads périodiques
+        # démarrés par start(), hors du scan (un seul calcul à la fois)
+        self.stopping = threading.Event()
+        self.maintenance_threads = []
+        self.maintenance_lock = threading.Lock()
+        # Dernière lecture du journal des changements de configuration
+        self.last_reload = 0.0
+        # Temps de démarrage : de start() (ou de la création) à la fin du premier scan
+        self.started_at = time.monotonic()
+        self.first_scan = threading.Event()
+        self.stats = {
+            "scans": 0,
+            "overruns": 0,
+            "last_scan_duration": 0.0,
+            "read_timeouts": 0,
+            "read_errors": 0,
+            "config_reloads": 0,
+            "deadband_suppressed": 0,
+            "time_to_first_scan": 0.0,
+        }
+        # Scans par classe de scrutation
+        self.class_scans = dict.fromkeys(SCAN_CLASSES, 0)
+        self.register_metrics()
+
+    def register_metrics(self):
+        """Compteurs / jauges lus à la demande par metrics.py (aucun coût pendant le scan)."""
+        metrics.register_stats(self.stats, "scan", gauges=("last_scan_duration", "time_to_first_scan"))
+        metrics.register("counter", "scan_class_scans", "Scans par classe de scrutation",
+                         lambda: dict(self.class_scans))
+        for cle in ("reads", "read_errors", "simulation_fallbacks", "reconnects", "fast_failures"):
+            metrics.register("counter", f"opc_{cle}", f"OPCClient : {cle}", lambda cle=cle: sum(
+                opc.stats[cle] for opc in (self.opc, *self.sessions.values()))
+                + (self.pool.opc_stats()[cle] if self.pool else 0))
+        if hasattr(self.alarm_manager, "stats"):
+            metrics.register_stats(self.alarm_manager.stats, "alarms")
+        if hasattr(self.alarm_manager, "queue"):
+            metrics.register("gauge", "alarm_queue_depth", "Alarmes en attente d'affichage",
+                             self.alarm_manager.queue.qsize)
+        metrics.register("gauge", "notification_queue_depth", "Notifications OPC UA en attente (mode push)",
+                         self.notifications.qsize)
+        metrics.register("gauge", "opc_connected", "Sessions OPC UA connectées", lambda: sum(
+            opc.connected for opc in (self.opc, *self.sessions.values())))
+        metrics.register("counter", "opc_breaker_opened", "Ouvertures du disjoncteur OPC UA",
+                         lambda: self.opc.breaker.stats["opened"])
+        metrics.register("gauge", "acquisition_workers", "Processus d'acquisition actifs",
+                         lambda: len(self.pool) if self.pool else 0)
+        for cle in ("late_workers", "worker_restarts", "reassigned_workers"):
+            metrics.register("counter", f"acquisition_{cle}", f"AcquisitionPool : {cle}",
+                             lambda cle=cle: self.pool.stats[cle] if self.pool else 0)
+
+    def open_writer(self):
+        """Ouvre l'écriture différée (journal rejoué s'il reste des lots) ; sans effet si déjà ouverte."""
+        if self.writer is not None:
+            return self.writer
+        self.writer = writer = WriteBehind()
+        metrics.register("gauge", "writeback_queue_depth", "Lots en mémoire en attente d'écriture en base",
+                         lambda: len(writer.memory))
+        metrics.register("gauge", "writeback_pending", "Lots en attente d'écriture en base (mémoire + journal)",
+                         writer.pending)
+        metrics.register("gauge", "writeback_journal_bytes", "Taille du journal d'écriture en attente de rejeu",
+                         writer.journal_bytes)
+        metrics.register("gauge", "writeback_lag_seconds", "Retard de l'écriture en base", writer.lag)
+        metrics.register_stats(writer.stats, "writeback")
+        return writer
 
     def start(self):
         if not self.running:
+            self.open_writer()
+            if metrics.enabled():
+                metrics.setup_logging()
+                if METRICS_PORT:
+                    metrics.start_server()
+            if LIVE_FEED_PORT and self.feed is None:
+                self.feed = live_feed.start_server(self.snapshot)
+                if self.feed is not None:
+                    metrics.register_stats(self.feed.stats, "live_feed", gauges=("clients",))
             self.running = True
+            self.stopping.clear()
+            self.started_at = time.monotonic()
             self.thread = threading.Thread(target=self.run, daemon=True)
             self.thread.start()
+            taches = [("history-maintenance", HISTORY_MAINTENANCE_INTERVAL, self.maintain_history)]
+            if archive.enabled():
+                taches.append(("archive-compaction", ARCHIVE_INTERVAL, self.compact_archive))
+            self.maintenance_threads = [
+                threading.Thread(target=self.run_periodic, args=(periode, tache), name=nom, daemon=True)
+                for nom, periode, tache in taches]
+            for thread in self.maintenance_threads:
+                thread.start()
 
     def stop(self):
         self.running = False
+        # Maintenance / archivage en cours non attendus : arrêt à la fin de leur passage
+        self.stopping.set()
         if self.thread:
             self.thread.join()
 
     def run(self):
-        while self.running:
-            variables = get_active_variables()
-            for var in variables:
-                (
-                    var_id, nom_variable, adresse_opc, description,
-                    vtype, vmin, vmax, last_value, last_update,
-                    alarme_min, alarme_max
-                ) = var
-
-                # --- GÉNÉRATION DE VALEUR ---
-                new_value = self.simulate_value(vmin, vmax)
-
-                # --- MISE À JOUR DB ---
-                update_variable(var_id, new_value)
-
-                # --- CONTRÔLE DE SEUILS ---
-                if new_value < vmin:
-                    log_event(var_id, "min", 1)
-                    self.alarm_manager.trigger_alarm(
-                        f"Alerte : {nom_variable} sous le seuil ({new_value:.2f} < {vmin}) !",
-                        variable_id=var_id
-                    )
-                elif new_value > vmax:
-                    log_event(var_id, "max", 1)
-                    self.alarm_manager.trigger_alarm(
-                        f"Alerte : {nom_variable} au-dessus du seuil ({new_value:.2f} > {vmax}) !",
-                        variable_id=var_id
-                    )
+        if self.mode == "subscription" and self.run_subscription():
+            return
+        asyncio.run(self.run_polling())
+
+    async def run_polling(self):
+        """
+        Moteur de scrutation asyncio :
+        - un groupe de tâches par namespace OPC UA, chacun avec sa propre session
+        - lectures groupées en parallèle, limitées par SCAN_MAX_CONCURRENT_READS
+        - chaque lecture a un timeout (OPC_READ_TIMEOUT) : un automate lent
+          ne bloque plus les autres variables
+        - workers > 0 : lectures dans des processus séparés (voir acquisition.py),
+          seuils et écriture en base restent ici
+        - chaque classe de scrutation (fast / normal / slow) a sa propre période : à chaque
+          échéance, seules les variables des classes dues sont lues
+        """
+        semaphore = asyncio.Semaphore(SCAN_MAX_CONCURRENT_READS)
+        prochains = {}      # classe → prochaine échéance (monotonic)
+        if self.workers:
+            from acquisition import AcquisitionPool
+            self.pool = AcquisitionPool(self.workers, simulation=self.opc.simulation)
+            self.registry.invalidate()      # répartition des variables au premier scan
+        try:
+            while self.running:
+                debut = time.monotonic()
+                periodes = self.scan_periods()
+                dues = [classe for classe in periodes if prochains.get(classe, debut) <= debut]
+                if dues:
+                    await self.scan_once(semaphore, dues)
+                    maintenant = time.monotonic()
+                    for classe in dues:
+                        prochains[classe] = max(prochains.get(classe, debut) + periodes[classe], maintenant)
+
+                # Attente par petits pas pour réagir rapidement à stop()
+                fin = min(prochains.values())
+                while self.running and time.monotonic() < fin:
+                    await asyncio.sleep(min(0.2, fin - time.monotonic()))
+        finally:
+            for opc in self.sessions.values():
+                await asyncio.to_thread(opc.disconnect)
+            self.sessions.clear()
+            if self.pool is not None:
+                await asyncio.to_thread(self.pool.close)
+                self.pool = None
+            await asyncio.to_thread(self.close_writer)
+
+    async def in_control(self, fonction, *args):
+        """Exécute fonction(*args) dans le thread de contrôle (hors boucle asyncio, un appel à la fois)."""
+        return await asyncio.get_running_loop().run_in_executor(self.control, fonction, *args)
+
+    def load_registry(self):
+        """Charge (ou recharge) la configuration des variables depuis la base."""
+        self.registry.load()
+        self.last_reload = time.monotonic()
+        self._sim_index.clear()
+        self.publish_registry()
+        if self.pool is not None:
+            self.pool.assign(self.registry)
+
+    def refresh_registry(self):
+        """
+        Rechargement à chaud, au plus une fois par CONFIG_RELOAD_INTERVAL : seules les
+        variables ajoutées, supprimées ou modifiées depuis la dernière lecture sont relues.
+        Retourne True si la configuration a changé.
+        """
+        if time.monotonic() - self.last_reload < CONFIG_RELOAD_INTERVAL:
+            return False
+        self.last_reload = time.monotonic()
+        ajoutees, supprimees, modifiees = self.registry.refresh()
+        if not (ajoutees or supprimees or modifiees):
+            return False
+
+        self.stats["config_reloads"] += 1
+        print(f"🔄 Configuration rechargée : +{ajoutees} / -{supprimees} / ~{modifiees} variables")
+        # Les positions du registre ont pu changer
+        self._sim_index.clear()
+        self.publish_registry()
+        retirees = [self.sessions.pop(key) for key in set(self.sessions) - set(self.registry.groups)]
+        if retirees:
+            # Déconnexion hors du thread de contrôle : un serveur lent ne retarde pas les contrôles
+            threading.Thread(target=self.disconnect_sessions, args=(retirees,), name="deconnexion",
+                             daemon=True).start()
+        if self.pool is not None:
+            self.pool.assign(self.registry)
+        try:
+            database.prune_config_changes()
+        except Exception as e:
+            print(f"⚠️ Purge du journal de configuration impossible : {e}")
+        return True
+
+    @staticmethod
+    def disconnect_sessions(sessions):
+        for opc in sessions:
+            try:
+                opc.disconnect()
+            except Exception as e:
+                print(f"⚠️ Déconnexion de {opc.server_url} impossible : {e}")
+
+    def publish_registry(self):
+        """Publie toutes les variables du registre (ajoutées, supprimées, seuils modifiés)."""
+        reg = self.registry
+        valeurs = [None if np.isnan(v) else v for v in reg.last_value.tolist()]
+        self.snapshot.replace([reg.row(pos, valeur) for pos, valeur in enumerate(valeurs)])
+
+    def scan_periods(self):
+        """Période (s) de chaque classe de scrutation (None dans SCAN_CLASSES = intervalle de la surveillance)."""
+        return {classe: periode or self.interval for classe, periode in SCAN_CLASSES.items()}
+
+    async def scan_once(self, semaphore, classes=None):
+        """
+        Un cycle (lecture + contrôle + écriture) des variables des classes de scrutation
+        `classes` (None = toutes) ; retourne sa durée.
+        """
+        debut = time.monotonic()
+        if not self.registry.loaded:
+            await self.in_control(self.load_registry)
+        else:
+            await self.in_control(self.refresh_registry)
+
+        if self.pool is not None:
+            await self.in_control(self.scan_pool, classes)
+        else:
+            async with asyncio.TaskGroup() as tg:
+                for key, positions in self.registry.due_groups(classes).items():
+                    tg.create_task(self.scan_group(key, positions, semaphore))
+
+        duree = time.monotonic() - debut
+        self.stats["scans"] += 1
+        self.stats["last_scan_duration"] = duree
+        self.mark_first_scan()
+        periodes = self.scan_periods()
+        for classe in classes or periodes:
+            self.class_scans[classe] = self.class_scans.get(classe, 0) + 1
+        limite = min(periodes[classe] for classe in classes) if classes else self.interval
+        if duree > limite:
+            self.stats["overruns"] += 1
+            print(f"⚠️ Dépassement du cycle de scrutation : {duree:.2f}s > {limite}s "
+                  f"({', '.join(classes or periodes)})")
+        metrics.log_scan(duree, len(self.registry.positions_of(classes)))
+        return duree
+
+    def mark_first_scan(self):
+        """Premier scan terminé (ou abonnements en place) : mesure du temps de démarrage."""
+        if not self.first_scan.is_set():
+            self.stats["time_to_first_scan"] = time.monotonic() - self.started_at
+            self.first_scan.set()
+
+    def scan_pool(self, classes=None):
+        """Lecture par les processus d'acquisition puis contrôle des seuils des classes `classes`."""
+        try:
+            with metrics.timer("opc_read"):
+                values, quality = self.pool.scan(classes)
+            positions = self.registry.positions_of(classes)
+            self.check_values(positions, values[positions], quality[positions])
+        except Exception as e:
+            self.stats["read_errors"] += 1
+            print(f"⚠️ Erreur de scrutation (processus d'acquisition) : {e}")
+
+    async def scan_group(self, key, positions, semaphore):
+        """Lecture puis contrôle des seuils pour les variables d'un groupe (serveur, namespace, classe)."""
+        try:
+            opc = self.sessions.get(key)
+            if opc is None:
+                opc = OPCClient(key[0], simulation=self.opc.simulation)
+                await asyncio.to_thread(opc.connect)
+                self.sessions[key] = opc
+            elif not opc.connected:
+                self.reconnect(key, opc)
+
+            # --- ACQUISITION ---
+            with metrics.timer("opc_read"):
+                if opc.connected:
+                    chunks = [positions[i:i + opc.chunk_size]
+                              for i in range(0, len(positions), opc.chunk_size)]
+                    results = await asyncio.gather(
+                        *(self.read_chunk(opc, chunk, semaphore) for chunk in chunks))
+                    values = to_values([res.value for chunk_results in results for res in chunk_results])
+                    quality = np.fromiter((res.quality for chunk_results in results for res in chunk_results),
+                                          np.int8, len(positions))
+                elif opc.simulation_mode:
+                    # Simulateur vectorisé, centré dans [min, max] : les défauts déclenchent les alarmes
+                    opc.stats["reads"] += len(positions)
+                    index = self._sim_index.get(key)
+                    if index is None:
+                        opc.simulator.add_tags(self.registry.simulation_specs(positions))
+                        index = self._sim_index[key] = opc.simulator.positions(
+                            [self.registry.adresses[i] for i in positions.tolist()])
+                    values = opc.simulator.read_at(index)
+                    quality = np.full(len(positions), QUALITY_SIMULATED, np.int8)
                 else:
-                    # Revenu normal → acquittement
-                    acquit_alarme(var_id)
+                    # Serveur injoignable : échec immédiat, reconnexion en arrière-plan
+                    opc.stats["fast_failures"] += len(positions)
+                    values = np.full(len(positions), np.nan)
+                    quality = np.full(len(positions), QUALITY_BAD, np.int8)
+
+            # --- CONTRÔLE DE SEUILS (thread de contrôle) ---
+            await self.in_control(self.check_values, positions, values, quality)
+        except Exception as e:
+            self.stats["read_errors"] += 1
+            print(f"⚠️ Erreur de scrutation sur {key} : {e}")
+
+    def reconnect(self, key, opc):
+        """
+        Lance une tentative de reconnexion en arrière-plan (au plus une par session) ;
+        le disjoncteur de OPCClient.connect décide si elle part vraiment ou échoue tout de suite.
+        """
+        tache = self._reconnecting.get(key)
+        if tache is None or tache.done():
+            self._reconnecting[key] = asyncio.create_task(asyncio.to_thread(opc.connect))
+
+    async def read_chunk(self, opc, chunk, semaphore):
+        """Lecture groupée d'un paquet, bornée en concurrence et en durée ; retourne des ReadResult."""
+        async with semaphore:
+            try:
+                return await asyncio.wait_for(
+                    asyncio.to_thread(opc.read_many, self.registry.read_specs(chunk)),
+                    OPC_READ_TIMEOUT,
+                )
+            except asyncio.TimeoutError:
+                self.stats["read_timeouts"] += 1
+                opc.breaker.failure()
+                print(f"⚠️ Timeout de lecture ({len(chunk)} variables sur {opc.server_url})")
+                return opc.unavailable_results(self.registry.read_specs(chunk))
+
+    def run_subscription(self):
+        """
+        Mode push : le serveur notifie les changements, le contrôle de seuils
+        est fait dès réception (latence = intervalle d'échantillonnage).
+        Retourne False si l'abonnement est impossible → repli sur le polling.
+        """
+        self.load_registry()
+        if any(url != self.opc.server_url for url, *_ in self.registry.groups):
+            print("ℹ️ Variables réparties sur plusieurs serveurs OPC UA : abonnement impossible, mode polling.")
+            return False
+        self.opc.connect()
+        notifier = lambda adresse, res: self.notifications.put((adresse, res))
+        ok = self.opc.subscribe(self.registry.read_specs(np.arange(len(self.registry))), notifier)
+        if not ok:
+            self.opc.disconnect()
+            return False
+        self.mark_first_scan()
 
-            time.sleep(self.interval)
+        try:
+            while self.running:
+                if self.refresh_registry():
+                    # Nouvelles adresses : abonnements recréés
+                    self.opc.unsubscribe_all()
+                    self.opc.subscribe(self.registry.read_specs(np.arange(len(self.registry))), notifier)
+                try:
+                    adresse, res = self.notifications.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                pos = self.registry.by_address.get(adresse)
+                if pos is not None:
+                    self.check_values(np.array([pos]), to_values([res.value]),
+                                      np.array([res.quality], np.int8))
+        finally:
+            self.opc.disconnect()
+            self.close_writer()
+        return True
 
-    def simulate_value(self, vmin, vmax):
+    def close_writer(self):
         """
-        Simulation :
-        - la plupart du temps entre 0.9*vmin et 1.1*vmax,
-        - mais ~60% du temps, on force une sortie de seuil (alarme fréquente).
+        Arrêt : attend l'écriture des lots en cours ; si la base ne suit pas, ils partent au
+        journal. Le thread d'écriture est ensuite arrêté et le journal fermé.
         """
-        if random.random() < 0.6:
-            if random.random() < 0.5:
-                return vmin * random.uniform(0.6, 0.85)  # sous le min
+        if self.writer is None:
+            return
+        if not self.writer.flush(timeout=WRITEBACK_FLUSH_TIMEOUT):
+            nombre = self.writer.spill()
+            print(f"⚠️ Base indisponible à l'arrêt : {self.writer.pending()} lots gardés dans le journal "
+                  f"({nombre} depuis la mémoire), rejoués au prochain démarrage")
+        self.writer.close()
+        self.writer = None
+
+    def check_values(self, positions, values, quality=None):
+        """
+        Contrôle des seuils pour un lot de valeurs lues (positions du registre,
+        tableau de valeurs, NaN = non lue, et qualité de chaque lecture) :
+        une comparaison vectorisée pour tout le lot.
+        Le lot (mises à jour + événements + acquittements) est confié à l'écriture
+        différée ; événements et acquittements uniquement sur changement d'état d'alarme.
+        Une lecture en échec garde la dernière valeur : seule sa qualité est écrite,
+        et seulement quand elle change.
+        Bande morte : une valeur n'est réécrite en base (variables + historique) que si elle
+        s'écarte de la dernière valeur écrite de plus que registry.deadband, si sa qualité
+        change ou si son état d'alarme change.
+        """
+        reg = self.registry
+        now = time.monotonic()
+        if quality is None:
+            quality = np.full(len(positions), QUALITY_GOOD, np.int8)
+        with metrics.timer("threshold_eval"):
+            lues = ~np.isnan(values)
+            perdues = positions[~lues]
+            perdues = perdues[reg.quality[perdues] != QUALITY_BAD]
+            reg.quality[perdues] = QUALITY_BAD
+            bad = [(var_id, QUALITY_BAD) for var_id in reg.ids[perdues].tolist()]
+
+            positions, values, quality = positions[lues], values[lues], quality[lues]
+            anciennes = reg.quality[positions]
+            reg.quality[positions] = quality
+            actives, cotes, revenues, cotes_revenues = reg.alarm_states.update(
+                positions, values, reg.vmin[positions], reg.vmax[positions], now)
+            modifiees = positions[values != reg.last_value[positions]]
+            reg.last_value[positions] = values
+
+            ecrire = ~(np.abs(values - reg.last_written[positions]) <= reg.deadband[positions])
+            ecrire |= quality != anciennes
+            if len(actives) or len(revenues):
+                ecrire |= np.isin(positions, np.concatenate((actives, revenues)))
+            ecrites = positions[ecrire]
+            reg.last_written[ecrites] = values[ecrire]
+            self.stats["deadband_suppressed"] += len(positions) - len(ecrites)
+
+        events, acquits, alarms = [], [], []
+        for pos, cote in zip(actives.tolist(), cotes.tolist()):
+            var_id, nom, value = int(reg.ids[pos]), reg.noms[pos], reg.last_value[pos]
+            events.append((var_id, SIDES[cote], 1))
+            if cote < 0:
+                alarms.append((f"Alerte : {nom} sous le seuil ({value:.2f} < {reg.vmin[pos]:g}) !", var_id))
             else:
-                return vmax * random.uniform(1.15, 1.35)  # au-dessus du max
-        return random.uniform(max(vmin * 0.9, vmin - 1), min(vmax * 1.1, vmax + 1))
+                alarms.append((f"Alerte : {nom} au-dessus du seuil ({value:.2f} > {reg.vmax[pos]:g}) !", var_id))
+        for pos in revenues.tolist():
+            # Revenu normal → acquittement (+ horodatage de fin pour l'analyse des alarmes)
+            events.append((int(reg.ids[pos]), EVENT_RETOUR_NORMAL, 0))
+            acquits.append(int(reg.ids[pos]))
+
+        # --- MISE À JOUR DB (thread d'écriture) ---
+        if len(ecrites) or events or bad:
+            with metrics.timer("db_update"):
+                self.writer.submit(reg.ids[ecrites], values[ecrire], quality[ecrire], events, acquits, bad)
+        self.snapshot.publish([reg.row(pos, reg.last_value[pos].item()) for pos in modifiees.tolist()], events)
+
+        with metrics.timer("alarm_dispatch"):
+            for message, var_id in alarms:
+                self.alarm_manager.trigger_alarm(message, variable_id=var_id)
+
+    def run_periodic(self, periode, tache):
+        """Thread de maintenance : tache() toutes les `periode` secondes jusqu'à stop()."""
+        while not self.stopping.wait(periode):
+            tache()
+
+    def maintain_history(self):
+        """Agrégats 1 min / 1 h et rétention (ignoré si un passage est déjà en cours)."""
+        if not self.maintenance_lock.acquire(blocking=False):
+            return
+        try:
+            with metrics.timer("history_maintenance"):
+                history.maintenance()
+        except Exception as e:
+            print(f"⚠️ Erreur de maintenance de l'historique : {e}")
+        finally:
+            self.maintenance_lock.release()
+
+    def compact_archive(self):
+        """Archivage Parquet des mois terminés (archive.compact), dans son propre thread."""
+        try:
+            with metrics.timer("archive_compaction"):
+                archive.compact()
+        except Exception as e:
+            print(f"⚠️ Erreur d'archivage : {e}")
@@ -0,0 +1,255 @@
+# tag_import.py
+"""
+Import / export en masse des variables (fichiers CSV ou JSON) :
+- colonnes : nom_variable, adresse_opc, description, type, min, max, last_value,
+  equipement, endpoint, scan_class, deadband, deadband_pct (alias acceptés : nom,
+  adresse, seuil_min, seuil_max, valeur_initiale, etat, classe, bande_morte,
+  bande_morte_pct)
+- chaque ligne est validée (adresse_opc : syntaxe NodeId) ; les doublons sur adresse_opc
+  (dans le fichier) sont écartés
+- insertion / mise à jour par transactions de IMPORT_BATCH_SIZE lignes
+  (une variable existante garde sa dernière valeur, sa configuration est remplacée)
+- remplacement (--replace) : refusé si une ligne est rejetée ; sinon une seule transaction,
+  les variables absentes sont supprimées avec leurs événements et leur historique
+Une surveillance en cours prend les changements en compte sans redémarrer
+(journal variables_changes, voir TagRegistry.refresh).
+"""
+import csv
+import json
+import os
+import sys
+
+from config import IMPORT_BATCH_SIZE, SCAN_CLASSES, SCAN_CLASS_DEFAULT
+from database import transaction, delete_variables
+from opc_client import valid_address
+
+COLUMNS = ("nom_variable", "adresse_opc", "description", "type", "min", "max", "last_value",
+           "equipement", "endpoint", "scan_class", "deadband", "deadband_pct")
+ALIASES = {
+    "nom": "nom_variable", "adresse": "adresse_opc", "seuil_min": "min", "seuil_max": "max",
+    "valeur_initiale": "last_value", "etat": "equipement", "classe": "scan_class",
+    "bande_morte": "deadband", "bande_morte_pct": "deadband_pct",
+}
+TYPES = ("reel", "bool")
+
+SQL_UPSERT_VARIABLE = """
+    INSERT INTO variables
+    (nom_variable, adresse_opc, description, type, min, max, last_value, last_update, etat_id, endpoint,
+     scan_class, deadband, deadband_pct)
+    VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now'), ?, ?, ?, ?, ?)
+    ON CONFLICT(adresse_opc) DO UPDATE SET
+        nom_variable = excluded.nom_variable, description = excluded.description,
+        type = excluded.type, min = excluded.min, max = excluded.max,
+        etat_id = excluded.etat_id, endpoint = excluded.endpoint, scan_class = excluded.scan_class,
+        deadband = excluded.deadband, deadband_pct = excluded.deadband_pct
+"""
+
+
+# -------- Lecture des fichiers --------
+def read_tags(path):
+    """Lignes d'un fichier CSV (séparateur , ; ou tabulation) ou JSON : [(numéro de ligne, dict)]."""
+    if path.lower().endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            document = json.load(f)
+        if isinstance(document, dict):
+            document = document.get("variables", [])
+        return list(enumerate(document, start=1))
+
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        debut = f.read(4096)
+        f.seek(0)
+        try:
+            dialecte = csv.Sniffer().sniff(debut, delimiters=",;\t")
+        except csv.Error:
+            dialecte = csv.excel
+        return list(enumerate(csv.DictReader(f, dialect=dialecte), start=2))
+
+
+def _number(valeur, colonne):
+    if valeur is None or str(valeur).strip() == "":
+        return None
+    try:
+        return float(str(valeur).strip().replace(",", "."))
+    except ValueError:
+        raise ValueError(f"{colonne} n'est pas un nombre : {valeur!r}")
+
+
+def validate(ligne):
+    """Ligne brute (dict) → dict normalisé ; ValueError si la ligne est invalide."""
+    ligne = {ALIASES.get(k.strip().lower(), k.strip().lower()): v for k, v in ligne.items() if k}
+    texte = {k: ("" if ligne.get(k) is None else str(ligne[k]).strip())
+             for k in ("nom_variable", "adresse_opc", "description", "type", "equipement", "endpoint",
+                       "scan_class")}
+
+    if not texte["nom_variable"]:
+        raise ValueError("nom_variable manquant")
+    if not texte["adresse_opc"]:
+        raise ValueError("adresse_opc manquante")
+    if not valid_address(texte["adresse_opc"]):
+        raise ValueError(f"adresse_opc n'est pas un NodeId OPC UA : {texte['adresse_opc']!r} "
+                         f"(ex : ns=2;s=Four1.Temperature)")
+    vtype = texte["type"].lower() or "reel"
+    if vtype not in TYPES:
+        raise ValueError(f"type inconnu : {texte['type']!r} (attendu : {', '.join(TYPES)})")
+    vmin, vmax = _number(ligne.get("min"), "min"), _number(ligne.get("max"), "max")
+    if vmin is not None and vmax is not None and vmin > vmax:
+        raise ValueError(f"min ({vmin:g}) > max ({vmax:g})")
+    classe = texte["scan_class"].lower() or SCAN_CLASS_DEFAULT
+    if classe not in SCAN_CLASSES:
+        raise ValueError(f"classe de scrutation inconnue : {texte['scan_class']!r} "
+                         f"(attendu : {', '.join(SCAN_CLASSES)})")
+    deadband = _number(ligne.get("deadband"), "deadband")
+    deadband_pct = _number(ligne.get("deadband_pct"), "deadband_pct")
+    if (deadband is not None and deadband < 0) or (deadband_pct is not None and deadband_pct < 0):
+        raise ValueError("bande morte négative")
+
+    return {
+        "nom_variable": texte["nom_variable"],
+        "adresse_opc": texte["adresse_opc"],
+        "description": texte["description"] or None,
+        "type": vtype,
+        "min": vmin,
+        "max": vmax,
+        "last_value": _number(ligne.get("last_value"), "last_value"),
+        "equipement": texte["equipement"] or None,
+        "endpoint": texte["endpoint"] or None,
+        "scan_class": classe,
+        "deadband": deadband,
+        "deadband_pct": deadband_pct,
+    }
+
+
+# -------- Import --------
+def import_tags(source, replace=False, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Importe les variables d'un fichier (.csv / .json) ou d'une liste de dictionnaires.
+    - replace=True : les variables absentes de la source sont supprimées (avec leurs événements
+      et leur historique), dans la même transaction que l'import. Refusé si une ligne est
+      rejetée ou si la source ne contient aucune variable valide : rien n'est modifié
+    - les équipements inconnus sont créés
+    Retourne {"lues", "ajoutees", "mises_a_jour", "supprimees", "doublons", "rejetees",
+    "erreurs": [(numéro de ligne, message)], "refus": motif du refus ou None}.
+    """
+    lignes = read_tags(source) if isinstance(source, str) else list(enumerate(source, start=1))
+    valides, erreurs, vues, doublons = [], [], set(), 0
+    for numero, ligne in lignes:
+        try:
+            tag = validate(ligne)
+        except (ValueError, AttributeError) as e:
+            erreurs.append((numero, str(e)))
+            continue
+        if tag["adresse_opc"] in vues:
+            doublons += 1
+            erreurs.append((numero, f"adresse_opc en double : {tag['adresse_opc']}"))
+            continue
+        vues.add(tag["adresse_opc"])
+        valides.append(tag)
+
+    resultat = {
+        "lues": len(lignes),
+        "ajoutees": 0,
+        "mises_a_jour": 0,
+        "supprimees": 0,
+        "doublons": doublons,
+        "rejetees": len(erreurs) - doublons,
+        "erreurs": erreurs,
+        "refus": None,
+    }
+    if replace and (erreurs or not valides):
+        # Une ligne rejetée ferait supprimer sa variable existante, une source vide toutes
+        resultat["refus"] = (f"remplacement refusé : {len(erreurs)} lignes en erreur, à corriger" if erreurs
+                             else "remplacement refusé : aucune variable valide dans la source")
+        return resultat
+
+    with transaction() as c:
+        c.execute("SELECT adresse_opc, id FROM variables")
+        existantes = dict(c.fetchall())
+        c.execute("SELECT id, designation FROM etats")
+        equipements = {designation: etat_id for etat_id, designation in c.fetchall()}
+        for designation in {t["equipement"] for t in valides if t["equipement"]} - set(equipements):
+            c.execute("INSERT INTO etats (designation, activation) VALUES (?, 1)", (designation,))
+            equipements[designation] = c.lastrowid
+        if replace:
+            # Tout ou rien : une surveillance ne voit jamais la moitié de la nouvelle configuration
+            _upsert(c, valides, equipements)
+            a_supprimer = [var_id for adresse, var_id in existantes.items() if adresse not in vues]
+            delete_variables(c, a_supprimer)
+            resultat["supprimees"] = len(a_supprimer)
+
+    if not replace:
+        # Sans suppression, chaque lot est une mise à jour idempotente : un import interrompu se relance
+        for debut in range(0, len(valides), batch_size):
+            with transaction() as c:
+                _upsert(c, valides[debut:debut + batch_size], equipements)
+
+    resultat["mises_a_jour"] = len(vues & set(existantes))
+    resultat["ajoutees"] = len(valides) - resultat["mises_a_jour"]
+    return resultat
+
+
+def _upsert(c, tags, equipements):
+    c.executemany(SQL_UPSERT_VARIABLE, [
+        (t["nom_variable"], t["adresse_opc"], t["description"], t["type"], t["min"], t["max"],
+         t["last_value"], equipements.get(t["equipement"]), t["endpoint"], t["scan_class"],
+         t["deadband"], t["deadband_pct"])
+        for t in tags
+    ])
+
+
+# -------- Export --------
+def export_tags(path):
+    """Écrit toutes les variables dans un fichier .csv ou .json (format relu par import_tags) ; retourne leur nombre."""
+    with transaction() as c:
+        c.execute("""
+            SELECT v.nom_variable, v.adresse_opc, v.description, v.type, v.min, v.max, v.last_value,
+                   e.designation, v.endpoint, v.scan_class, v.deadband, v.deadband_pct
+            FROM variables v LEFT JOIN etats e ON e.id = v.etat_id
+            ORDER BY v.nom_variable, v.id
+        """)
+        lignes = c.fetchall()
+
+    if path.lower().endswith(".json"):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump([dict(zip(COLUMNS, ligne)) for ligne in lignes], f, ensure_ascii=False, indent=1)
+    else:
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            writer.writerows([["" if v is None else v for v in ligne] for ligne in lignes])
+    return len(lignes)
+
+
+def summary(resultat):
+    return (f"{resultat['lues']} lues | +{resultat['ajoutees']} ajoutées | "
+            f"{resultat['mises_a_jour']} mises à jour | -{resultat['supprimees']} supprimées | "
+            f"{resultat['doublons']} doublons | {resultat['rejetees']} rejetées")
+
+
+# -------- Exécution directe --------
+# python tag_import.py import variables.csv [--replace]
+# python tag_import.py export variables.json
+if __name__ == "__main__":
+    from database import init_db
+
+    if len(sys.argv) < 3 or sys.argv[1] not in ("import", "export"):
+        print("Usage : python tag_import.py import|export fichier.csv|fichier.json [--replace]")
+        sys.exit(2)
+    init_db()
+    action, chemin = sys.argv[1], sys.argv[2]
+
+    if action == "export":
+        print(f"✅ {export_tags(chemin)} variables exportées dans {chemin}")
+        sys.exit(0)
+
+    if not os.path.exists(chemin):
+        print(f"❌ Fichier introuvable : {chemin}")
+        sys.exit(2)
+    resultat = import_tags(chemin, replace="--replace" in sys.argv[3:])
+    for numero, message in resultat["erreurs"][:20]:
+        print(f"⚠️ Ligne {numero} : {message}")
+    if len(resultat["erreurs"]) > 20:
+        print(f"⚠️ … {len(resultat['erreurs']) - 20} autres erreurs")
+    if resultat["refus"]:
+        print(f"❌ Import : {resultat['refus']} (aucune variable modifiée)")
+        sys.exit(1)
+    print(f"✅ Import : {summary(resultat)}")
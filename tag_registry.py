@@ -0,0 +1,204 @@
+# tag_registry.py
+"""
+Registre des variables en mémoire, chargé une fois depuis SQLite :
+- configuration (ids, seuils, types) et dernières valeurs dans des tableaux NumPy
+  contigus ; une variable = une position dans ces tableaux
+- états d'alarme (AlarmStateMachine) dans les mêmes positions
+- rechargement à chaud : refresh() ne relit que les variables du journal des
+  changements de configuration (ajouts, suppressions, modifications)
+- classe de scrutation (fast / normal / slow) et bande morte d'écriture par variable
+- écriture différée en base : voir writeback.py (le scan ne fait que déposer le lot)
+"""
+import threading
+
+import numpy as np
+
+from alarm_state import AlarmStateMachine
+from config import SCAN_CLASSES, SCAN_CLASS_DEFAULT, DEADBAND_DEFAULT, DEADBAND_PCT_DEFAULT
+from database import get_active_variables, get_variables, get_config_changes, last_config_change
+from opc_client import endpoint_url
+
+
+def session_key(adresse_opc):
+    """Clé de regroupement d'une variable : namespace OPC UA (ns=2, ns=3…)."""
+    if adresse_opc and adresse_opc.startswith("ns="):
+        return adresse_opc.split(";", 1)[0]
+    return "ns=0"
+
+
+def _config(row):
+    """
+    Colonnes de configuration d'une ligne (nom, adresse, type, min, max, endpoint,
+    classe de scrutation, bandes mortes).
+    """
+    return row[1], row[2], row[4], row[5], row[6], row[11], row[12], row[13], row[14]
+
+
+def to_values(values):
+    """Valeurs lues (None, bool, nombres, autres) → tableau float64, NaN si illisible."""
+    resultat = np.empty(len(values))
+    for i, v in enumerate(values):
+        try:
+            resultat[i] = np.nan if v is None else float(v)
+        except (TypeError, ValueError):
+            resultat[i] = np.nan
+    return resultat
+
+
+class TagRegistry:
+    """Variables surveillées, indexées par position (voir by_id / by_address)."""
+
+    def __init__(self):
+        self.loaded = False
+        self.seq = 0
+        self.rows = {}
+        self.alarm_states = AlarmStateMachine()
+        # Acquittements (thread des alarmes) exclus pendant le remplacement de la configuration
+        self.lock = threading.Lock()
+        self._set_rows([])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def load(self, rows=None):
+        """
+        (Re)charge la configuration depuis la base (ou depuis `rows`, lignes de get_active_variables).
+        Les états d'alarme des variables toujours présentes sont conservés.
+        """
+        # Numéro lu avant les lignes : un changement concurrent sera ré-appliqué par refresh()
+        self.seq = last_config_change()
+        self._replace({r[0]: r for r in (get_active_variables() if rows is None else rows)})
+        self.loaded = True
+
+    def refresh(self):
+        """
+        Applique les changements de configuration enregistrés depuis le dernier chargement
+        (journal variables_changes) : seules les variables concernées sont relues.
+        Retourne (ajoutées, supprimées, modifiées).
+        """
+        changements = get_config_changes(self.seq)
+        if changements is None:                 # journal purgé entre-temps
+            avant = set(self.rows)
+            self.load()
+            apres = set(self.rows)
+            return len(apres - avant), len(avant - apres), len(apres & avant)
+
+        seq, ids = changements
+        self.seq = seq
+        if not ids:
+            return 0, 0, 0
+        lues = {r[0]: r for r in get_variables(ids)}
+        rows = dict(self.rows)
+        ajoutees = supprimees = modifiees = 0
+        for var_id in ids:
+            ligne = lues.get(var_id)
+            if ligne is None:
+                supprimees += rows.pop(var_id, None) is not None
+            elif var_id not in rows:
+                rows[var_id] = ligne
+                ajoutees += 1
+            elif _config(rows[var_id]) != _config(ligne):
+                rows[var_id] = ligne
+                modifiees += 1
+        if ajoutees or supprimees or modifiees:
+            self._replace(rows)
+        return ajoutees, supprimees, modifiees
+
+    def invalidate(self):
+        """La configuration a changé en base : rechargement complet au prochain scan."""
+        self.loaded = False
+
+    def _replace(self, rows):
+        """
+        Nouvelle configuration {var_id: ligne} ; états d'alarme, dernières valeurs
+        et qualités des variables conservées sont reportés à leur nouvelle position.
+        """
+        with self.lock:
+            anciens, ancien_etats = self.by_id, self.alarm_states
+            ancienne_valeur, ancienne_qualite, ancienne_ecrite = self.last_value, self.quality, self.last_written
+            self.rows = rows
+            self._set_rows(list(rows.values()))
+
+            etats = AlarmStateMachine(size=len(self.ids))
+            communs = [(pos, anciens[var_id]) for var_id, pos in self.by_id.items() if var_id in anciens]
+            if communs:
+                nouveau, ancien = np.array(communs, np.int64).T
+                for nom in ("state", "side", "since_out", "since_in"):
+                    getattr(etats, nom)[nouveau] = getattr(ancien_etats, nom)[ancien]
+                self.last_value[nouveau] = ancienne_valeur[ancien]
+                self.quality[nouveau] = ancienne_qualite[ancien]
+                self.last_written[nouveau] = ancienne_ecrite[ancien]
+            self.alarm_states = etats
+
+    def _set_rows(self, rows):
+        n = len(rows)
+        self.ids = np.fromiter((r[0] for r in rows), np.int64, n)
+        self.noms = [r[1] for r in rows]
+        self.adresses = [r[2] for r in rows]
+        self.types = [r[4] for r in rows]
+        self.endpoints = [endpoint_url(r[11]) for r in rows]
+        self.vmin = np.fromiter((np.nan if r[5] is None else r[5] for r in rows), np.float64, n)
+        self.vmax = np.fromiter((np.nan if r[6] is None else r[6] for r in rows), np.float64, n)
+        self.last_value = np.fromiter((np.nan if r[7] is None else r[7] for r in rows), np.float64, n)
+        # Dernière valeur écrite en base (référence de la bande morte)
+        self.last_written = self.last_value.copy()
+        # Qualité de la dernière lecture (opc_client.QUALITY_*), -1 = pas encore lue
+        self.quality = np.full(n, -1, np.int8)
+        self.by_id = {var_id: i for i, var_id in enumerate(self.ids.tolist())}
+        self.by_address = {adresse: i for i, adresse in enumerate(self.adresses)}
+
+        # Bande morte : écart minimal avec la dernière valeur écrite pour réécrire en base
+        absolue = np.fromiter((DEADBAND_DEFAULT if r[13] is None else r[13] for r in rows), np.float64, n)
+        pct = np.fromiter((DEADBAND_PCT_DEFAULT if r[14] is None else r[14] for r in rows), np.float64, n)
+        plage = np.nan_to_num(self.vmax - self.vmin, nan=0.0, posinf=0.0, neginf=0.0)
+        self.deadband = np.maximum(absolue, pct * np.abs(plage) / 100)
+
+        # Classe de scrutation (une classe inconnue est scrutée avec la classe par défaut)
+        self.scan_classes = [r[12] if r[12] in SCAN_CLASSES else SCAN_CLASS_DEFAULT for r in rows]
+        inconnues = {r[12] for r in rows if r[12] not in SCAN_CLASSES}
+        if inconnues:
+            print(f"⚠️ Classes de scrutation inconnues {sorted(map(str, inconnues))} : "
+                  f"variables scrutées en \"{SCAN_CLASS_DEFAULT}\"")
+
+        # Une session par (serveur, namespace, classe de scrutation)
+        groupes, classes = {}, {}
+        for i, (url, adresse, classe) in enumerate(zip(self.endpoints, self.adresses, self.scan_classes)):
+            groupes.setdefault((url, session_key(adresse), classe), []).append(i)
+            classes.setdefault(classe, []).append(i)
+        self.groups = {key: np.array(pos, np.int64) for key, pos in groupes.items()}
+        self.class_positions = {classe: np.array(pos, np.int64) for classe, pos in classes.items()}
+
+    # -------- Accès --------
+    def due_groups(self, classes=None):
+        """Groupes {(serveur, namespace, classe): positions} des classes `classes` (None = toutes)."""
+        if classes is None:
+            return self.groups
+        return {key: pos for key, pos in self.groups.items() if key[2] in classes}
+
+    def positions_of(self, classes=None):
+        """Positions des variables des classes `classes` (None = toutes), en ordre croissant."""
+        if classes is None:
+            return np.arange(len(self))
+        morceaux = [self.class_positions[c] for c in classes if c in self.class_positions]
+        return np.sort(np.concatenate(morceaux)) if morceaux else np.empty(0, np.int64)
+
+    def read_specs(self, positions):
+        """[(adresse_opc, nom, type)] pour OPCClient.read_many."""
+        return [(self.adresses[i], self.noms[i], self.types[i]) for i in positions.tolist()]
+
+    def simulation_specs(self, positions):
+        """[(adresse_opc, nom, type, min, max)] pour PlantSimulator.add_tags."""
+        return [(self.adresses[i], self.noms[i], self.types[i], self.vmin[i], self.vmax[i])
+                for i in positions.tolist()]
+
+    def row(self, pos, value):
+        """Ligne publiée pour l'interface : (var_id, nom, adresse, valeur, min, max)."""
+        return (int(self.ids[pos]), self.noms[pos], self.adresses[pos], value,
+                float(self.vmin[pos]), float(self.vmax[pos]))
+
+    def acknowledge(self, var_id):
+        """Acquittement opérateur, appelé par le thread des alarmes (AlarmManager.on_acknowledge)."""
+        with self.lock:
+            pos = self.by_id.get(var_id)
+            return pos is not None and self.alarm_states.acknowledge(pos)
+
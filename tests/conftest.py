@@ -0,0 +1,41 @@
+# tests/conftest.py
+import os
+import socket
+import sys
+
+import pytest
+
+# Les modules du projet sont à la racine du dépôt (pas de paquet installé)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Base temporaire migrée et vide (connexion partagée de database.py)."""
+    import database
+    database.close_shared_connection()
+    monkeypatch.setattr(database, "DB_FILE", str(tmp_path / "essai.db"))
+    database.init_db()
+    yield database
+    database.close_shared_connection()
+
+
+def add_variables(db, *noms, vmin=0, vmax=100):
+    """Crée des variables réelles ; retourne leurs ids dans l'ordre."""
+    with db.transaction() as c:
+        ids = []
+        for nom in noms:
+            c.execute("""
+                INSERT INTO variables (nom_variable, adresse_opc, type, min, max)
+                VALUES (?, ?, 'reel', ?, ?)
+            """, (nom, f"ns=2;s=Essai.{nom}", vmin, vmax))
+            ids.append(c.lastrowid)
+    return ids
+
+
+@pytest.fixture
+def free_port():
+    """Port TCP local libre (serveur OPC UA d'essai, ou port sans serveur)."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
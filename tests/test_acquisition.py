@@ -0,0 +1,65 @@
+# tests/test_acquisition.py
+import numpy as np
+import pytest
+
+from acquisition import AcquisitionPool
+from opc_client import QUALITY_BAD, QUALITY_SIMULATED
+
+
+class FakeRegistry:
+    """Registre réduit à ce qu'utilise AcquisitionPool : groupes et variables simulées."""
+
+    def __init__(self, groupes):
+        self.groups = {key: np.arange(debut, fin) for key, (debut, fin) in groupes.items()}
+
+    def __len__(self):
+        return sum(len(pos) for pos in self.groups.values())
+
+    def simulation_specs(self, positions):
+        return [(f"ns=2;s=Essai.T{i}", f"T{i}", "reel", 0.0, 100.0) for i in positions.tolist()]
+
+
+GROUPES = {("opc.tcp://a", "ns=2", "normal"): (0, 40),
+           ("opc.tcp://b", "ns=2", "normal"): (40, 80),
+           ("opc.tcp://c", "ns=2", "fast"): (80, 100)}
+
+
+@pytest.fixture
+def pool():
+    pool = AcquisitionPool(3, simulation="always", timeout=30)
+    pool.assign(FakeRegistry(GROUPES))
+    yield pool
+    pool.close()
+
+
+def test_scan_toutes_les_variables(pool):
+    values, quality = pool.scan()
+    assert len(values) == 100
+    assert not np.isnan(values).any()
+    assert (quality == QUALITY_SIMULATED).all()
+
+
+def test_reaffectation_des_seuls_paquets_modifies(pool):
+    pids = [process.pid for process in pool.processes]
+    pool.assign(FakeRegistry(GROUPES))
+    assert [process.pid for process in pool.processes] == pids
+
+    groupes = dict(GROUPES)
+    groupes[("opc.tcp://c", "ns=2", "fast")] = (80, 105)
+    pool.assign(FakeRegistry(groupes))
+    gardes = [process.pid for process in pool.processes if process.pid in pids]
+    assert len(gardes) == 2 and pool.stats["reassigned_workers"] == 1
+    values, _ = pool.scan()
+    assert len(values) == 105 and not np.isnan(values).any()
+
+
+def test_processus_en_retard_ecartes(pool):
+    pool.scan()
+    pool.timeout = 0.0          # aucun accusé attendu : valeurs en cours d'écriture écartées
+    values, quality = pool.scan()
+    assert np.isnan(values).all() and (quality == QUALITY_BAD).all()
+    assert pool.stats["late_workers"] == len(pool.processes)
+
+    pool.timeout = 30
+    values, quality = pool.scan()
+    assert not np.isnan(values).any() and (quality == QUALITY_SIMULATED).all()
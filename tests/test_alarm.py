@@ -0,0 +1,99 @@
+import queue
+import threading
+import time
+
+import pytest
+
+import alarm
+from alarm import AlarmManager, AlarmSink
+
+
+class SinkEssai(AlarmSink):
+    """Sortie d'essai : note les alarmes reçues, bloque tant que `libere` n'est pas posé."""
+
+    def __init__(self, acquitte=False, bloquant=False):
+        self.recues = queue.Queue()
+        self.libere = threading.Event()
+        if not bloquant:
+            self.libere.set()
+        self.acquitte = acquitte
+
+    def notify(self, message, variable_id):
+        self.recues.put((message, variable_id))
+        self.libere.wait(5)
+        return self.acquitte
+
+
+class SinkEnErreur(AlarmSink):
+    def notify(self, message, variable_id):
+        raise RuntimeError("sortie HS")
+
+
+def _attendre(condition, delai=5):
+    fin = time.monotonic() + delai
+    while not condition():
+        assert time.monotonic() < fin, "délai dépassé"
+        time.sleep(0.01)
+
+
+def test_non_bloquant_dedoublonnage_file_pleine():
+    sink = SinkEssai(bloquant=True)
+    manager = AlarmManager(max_pending=1, sinks=[sink])
+
+    debut = time.monotonic()
+    assert manager.trigger_alarm("A haute", 1)
+    assert sink.recues.get(timeout=5) == ("A haute", 1)   # affichée, opérateur absent
+    assert not manager.trigger_alarm("A haute", 1)        # déjà affichée
+    assert manager.trigger_alarm("B haute", 2)
+    assert not manager.trigger_alarm("B haute", 2)        # déjà en attente
+    assert not manager.trigger_alarm("C haute", 3)        # file pleine
+    assert time.monotonic() - debut < 1
+
+    assert manager.stats["raised"] == 2
+    assert manager.stats["deduplicated"] == 2
+    assert manager.stats["dropped"] == 1
+
+    sink.libere.set()
+    assert sink.recues.get(timeout=5) == ("B haute", 2)
+    _attendre(lambda: not manager.pending)
+    assert manager.trigger_alarm("A haute", 1)            # de nouveau acceptée une fois traitée
+
+
+def test_acquittement(monkeypatch):
+    acquittees, rappels = [], []
+    monkeypatch.setattr(alarm, "acquit_alarme", acquittees.append)
+    manager = AlarmManager(sinks=[SinkEssai(acquitte=True)])
+    manager.on_acknowledge = rappels.append
+
+    manager.trigger_alarm("A haute", 7)
+    manager.trigger_alarm("Message sans variable")
+    _attendre(lambda: not manager.pending)
+    assert acquittees == [7]
+    assert rappels == [7]
+    assert manager.stats["acknowledged"] == 1
+
+
+def test_limite_de_debit():
+    sink = SinkEssai()
+    manager = AlarmManager(rate_limit=2, sinks=[sink])
+    for var_id in range(5):
+        manager.trigger_alarm(f"Alarme {var_id}", var_id)
+    _attendre(lambda: manager.stats["rate_limited"] == 3)
+    assert [sink.recues.get(timeout=5) for _ in range(2)] == [("Alarme 0", 0), ("Alarme 1", 1)]
+    assert sink.recues.empty()
+    assert manager.suppressed == 3
+
+
+def test_sortie_en_erreur_n_arrete_pas_les_autres():
+    sink = SinkEssai()
+    manager = AlarmManager(sinks=[SinkEnErreur(), sink])
+    manager.trigger_alarm("A haute", 1)
+    assert sink.recues.get(timeout=5) == ("A haute", 1)
+    _attendre(lambda: manager.stats["sink_errors"] == 1)
+
+
+def test_sorties_par_nom():
+    sinks = alarm.make_sinks(["console", "log"])
+    assert [type(s) for s in sinks] == [alarm.ConsoleSink, alarm.LogSink]
+    with pytest.raises(ValueError, match="inconnue"):
+        alarm.make_sinks(["sirene"])
@@ -0,0 +1,77 @@
+import numpy as np
+
+from alarm_state import AlarmStateMachine, as_slice
+
+
+def _maj(machine, valeurs, now, pos=None, vmin=0.0, vmax=100.0):
+    """Une mise à jour sur les positions `pos` (par défaut 0..n-1), seuils [vmin, vmax] communs."""
+    valeurs = np.asarray(valeurs, float)
+    pos = np.arange(len(valeurs)) if pos is None else np.asarray(pos)
+    activees, cotes, revenues, cotes_revenues = machine.update(
+        pos, valeurs, np.full(len(valeurs), vmin), np.full(len(valeurs), vmax), now)
+    return list(zip(activees.tolist(), cotes.tolist())), list(zip(revenues.tolist(), cotes_revenues.tolist()))
+
+
+def test_temporisation_apparition():
+    machine = AlarmStateMachine(hysteresis_pct=0, on_delay=5, off_delay=0, size=1)
+    assert _maj(machine, [120], now=0) == ([], [])
+    assert machine.get(0) == "normal"
+    assert _maj(machine, [120], now=4) == ([], [])
+    assert _maj(machine, [120], now=5) == ([(0, 1)], [])
+    assert machine.get(0) == "active"
+    # Pas de nouvelle activation tant que le côté ne change pas
+    assert _maj(machine, [130], now=10) == ([], [])
+
+
+def test_depassement_fugitif_ignore():
+    machine = AlarmStateMachine(hysteresis_pct=0, on_delay=5, off_delay=0, size=1)
+    _maj(machine, [-1], now=0)
+    _maj(machine, [50], now=3)       # retour avant la fin de la temporisation
+    assert _maj(machine, [-1], now=6) == ([], [])
+    assert _maj(machine, [-1], now=11) == ([(0, -1)], [])
+
+
+def test_hysteresis_et_temporisation_disparition():
+    machine = AlarmStateMachine(hysteresis_pct=10, on_delay=0, off_delay=3, size=1)
+    assert _maj(machine, [105], now=0) == ([(0, 1)], [])
+    # Revenue sous le max mais dans la bande d'hystérésis (> 90) : toujours en alarme
+    assert _maj(machine, [95], now=1) == ([], [])
+    assert _maj(machine, [95], now=10) == ([], [])
+    assert machine.get(0) == "active"
+    assert _maj(machine, [80], now=11) == ([], [])
+    assert _maj(machine, [80], now=13) == ([], [])
+    assert _maj(machine, [80], now=14) == ([], [(0, 1)])
+    assert machine.get(0) == "cleared"
+    assert _maj(machine, [80], now=15) == ([], [])
+    assert machine.get(0) == "normal"
+
+
+def test_acquittement():
+    machine = AlarmStateMachine(hysteresis_pct=0, on_delay=0, off_delay=0, size=1)
+    assert not machine.acknowledge(0)             # rien à acquitter
+    _maj(machine, [150], now=0)
+    assert machine.acknowledge(0)
+    assert machine.get(0) == "acknowledged"
+    assert not machine.acknowledge(0)
+    # Acquittée, même côté : pas de nouvelle alarme ; le côté est conservé
+    assert _maj(machine, [150], now=1) == ([], [])
+    assert machine.side[0] == 1
+    # Changement de côté : nouvelle alarme, de nouveau à acquitter
+    assert _maj(machine, [-5], now=2) == ([(0, -1)], [])
+    assert machine.get(0) == "active"
+    # Retour à la normale depuis l'état acquitté
+    machine.acknowledge(0)
+    assert _maj(machine, [50], now=3) == ([], [(0, -1)])
+
+
+def test_positions_non_contigues_et_agrandissement():
+    machine = AlarmStateMachine(hysteresis_pct=0, on_delay=0, off_delay=0, size=3)
+    machine.resize(6)
+    assert len(machine.state) == 6
+    assert as_slice(np.array([2, 3, 4])) == slice(2, 5)
+    pos = np.array([1, 3, 5])
+    assert isinstance(as_slice(pos), np.ndarray)
+    assert _maj(machine, [50, 200, -3], now=0, pos=pos) == ([(3, 1), (5, -1)], [])
+    assert [machine.get(i) for i in range(6)] == ["normal"] * 3 + ["active", "normal", "active"]
+    machine.forget(3)
+    assert machine.get(3) == "normal"
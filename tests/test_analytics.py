@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+import analytics
+from conftest import add_variables
+from database import EVENT_RETOUR_NORMAL
+
+# (ts, variable_id, retour à la normale)
+EVENEMENTS = [
+    # 1 : épisode fugitif (5 s), puis épisode de 200 s avec changement de côté
+    (1000, 1, False), (1005, 1, True), (1100, 1, False), (1130, 1, False), (1300, 1, True),
+    # 2 : alarme jamais revenue (permanente)
+    (1200, 2, False),
+    # 3 : battement, quatre apparitions en 30 s
+    (2000, 3, False), (2005, 3, True), (2010, 3, False), (2015, 3, True),
+    (2020, 3, False), (2025, 3, True), (2030, 3, False), (2035, 3, True),
+]
+NOW = 1200 + 24 * 3600 + 1
+
+
+@pytest.fixture
+def ev():
+    # Ordre d'arrivée mélangé : events_frame trie par (variable, temps)
+    ordre = np.random.default_rng(0).permutation(len(EVENEMENTS))
+    ts, var, retour = (np.array(colonne)[ordre] for colonne in zip(*EVENEMENTS))
+    return analytics.events_frame(ts, var, retour)
+
+
+def test_episodes(ev):
+    ep = analytics.alarm_episodes(ev)
+    assert ep["variable_id"].tolist() == [1, 1, 2, 3, 3, 3, 3]
+    assert ep["debut"].tolist() == [1000, 1100, 1200, 2000, 2010, 2020, 2030]
+    assert np.array_equal(ep["fin"], [1005, 1300, np.nan, 2005, 2015, 2025, 2035], equal_nan=True)
+
+
+def test_indicateurs_par_variable(ev):
+    stats = analytics.alarm_statistics(ev, now=NOW)
+    assert stats["episodes"].to_dict() == {1: 2, 2: 1, 3: 4}
+    assert stats.loc[1, "mttr_s"] == 102.5
+    assert stats.loc[1, "mtbf_s"] == 95
+    assert stats.loc[3, "mtbf_s"] == 5
+    assert np.isnan(stats.loc[2, "mttr_s"])
+    assert stats["fugitives"].to_dict() == {1: 1, 2: 0, 3: 4}
+    assert stats["permanentes"].to_dict() == {1: 0, 2: 1, 3: 0}
+    assert stats.loc[2, "permanente_max_s"] == 24 * 3600 + 1
+    assert stats["battements"].to_dict() == {1: 0, 2: 0, 3: 2}
+
+
+def test_battements_et_avalanches(ev):
+    assert analytics.chattering_counts(ev, nombre=3, fenetre=60).to_dict() == {3: 2}
+    assert analytics.chattering_counts(ev, nombre=3, fenetre=10).empty
+    avalanches = analytics.flood_windows(ev, seuil=3, fenetre=600)
+    assert avalanches.to_dict("records") == [{"debut": 1800, "alarmes": 4}]
+
+
+def test_aucun_evenement():
+    vide = np.empty(0, np.int64)
+    ev = analytics.events_frame(vide, vide, np.empty(0, bool))
+    assert analytics.alarm_statistics(ev).empty
+    assert analytics.flood_windows(ev).empty
+
+
+def test_analyse_depuis_la_base(db):
+    ids = add_variables(db, "A", "B", "C")
+    with db.transaction() as c:
+        c.executemany("INSERT INTO evenements (date_heure, ts, variable_id, evenement, alarme) VALUES ('', ?, ?, ?, ?)",
+                      [(ts, ids[var - 1], EVENT_RETOUR_NORMAL if retour else "max", int(not retour))
+                       for ts, var, retour in EVENEMENTS])
+    resultat = analytics.analyse(db_file=db.DB_FILE, now=NOW)
+    assert resultat["par_variable"]["episodes"].to_dict() == dict(zip(ids, (2, 1, 4)))
+    assert resultat["avalanches"].empty
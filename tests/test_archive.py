@@ -0,0 +1,71 @@
+import os
+import sqlite3
+
+import pytest
+
+import archive
+import history
+from conftest import add_variables
+
+# Lundi 2 septembre 2024 00:00 UTC ; archivage le 20 octobre (septembre terminé depuis plus de 7 jours)
+T0 = 1725235200
+NOW = T0 + 48 * 86400
+SEPTEMBRE = (T0 - 86400, T0 + 29 * 86400)
+
+
+def _evenements(db):
+    with db.transaction() as c:
+        c.execute("SELECT variable_id, evenement, alarme FROM evenements ORDER BY ts")
+        return c.fetchall()
+
+
+def test_compact_sans_pyarrow(db, monkeypatch):
+    monkeypatch.setattr(archive, "ARROW_AVAILABLE", False)
+    with pytest.raises(RuntimeError):
+        archive.compact(NOW)
+
+
+def test_aller_retour_parquet(db):
+    pytest.importorskip("pyarrow")
+    a, b = add_variables(db, "A", "B")
+    db.flush_scan([(a, 10.0, 0), (b, 1.0, 0)], ts=T0 + 5)
+    db.flush_scan([(a, 20.0, 0)], events=[(a, "max", 1)], ts=T0 + 65)
+    db.flush_scan([(a, 30.0, 0)], events=[(a, "normal", 0)], acquits=[a], ts=T0 + 125)
+    db.flush_scan([], events=[(b, "min", 1)], ts=T0 + 185)       # alarme non acquittée
+    history.rollup(NOW)
+
+    resultat = archive.compact(NOW)
+    assert resultat["evenements"] == 2 and resultat["historique"] == 4
+    # L'alarme active reste en base, la partition brute de septembre est supprimée
+    assert _evenements(db) == [(b, "min", 1)]
+    with db.transaction() as c:
+        assert not [t for t in db.list_history_partitions(c) if t.endswith("202409")]
+        fichiers = archive.cold_files(c, "evenements", *SEPTEMBRE)
+    assert len(fichiers) == 1 and all(os.path.exists(f) for f in fichiers)
+
+    # Lecture base + archive : mêmes lignes qu'avant l'archivage
+    conn = sqlite3.connect(db.DB_FILE)
+    try:
+        ev = archive.query_events(conn, *SEPTEMBRE)
+        assert ev["variable_id"].tolist() == [a, a, b]
+        assert ev["evenement"].tolist() == ["max", "normal", "min"]
+        assert ev["ts"].tolist() == [T0 + 65, T0 + 125, T0 + 185]
+        assert archive.query_events(conn, *SEPTEMBRE, var_ids=[b])["ts"].tolist() == [T0 + 185]
+        assert archive.latest_events(conn, 1)["evenement"].tolist() == ["normal"]
+    finally:
+        conn.close()
+    assert history.query_history([a], T0, T0 + 3600, "raw") == [
+        (a, T0 + 5, 10.0, 10.0, 10.0), (a, T0 + 65, 20.0, 20.0, 20.0), (a, T0 + 125, 30.0, 30.0, 30.0)]
+    # Agrégats inchangés (restent en base)
+    assert history.query_history([b], T0, T0 + 3600, "1m") == [(b, T0, 1.0, 1.0, 1.0)]
+
+    # Alarme acquittée ensuite : second fichier du même mois
+    db.flush_scan([], acquits=[b], ts=NOW)
+    assert archive.compact(NOW)["evenements"] == 1
+    assert _evenements(db) == []
+    assert archive.status()["evenements"][0][:2] == ("202409", 2)
+    conn = sqlite3.connect(db.DB_FILE)
+    try:
+        assert archive.query_events(conn, *SEPTEMBRE)["variable_id"].tolist() == [a, a, b]
+    finally:
+        conn.close()
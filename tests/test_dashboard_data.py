@@ -0,0 +1,81 @@
+from datetime import datetime
+
+import pytest
+
+from conftest import add_variables
+from dashboard_data import DashboardData
+
+T0 = int(datetime(2024, 9, 2, 8, 15).timestamp())
+
+
+@pytest.fixture
+def donnees(db):
+    data = DashboardData(db.DB_FILE, ttl=0)
+    yield data
+    data.conn.close()
+
+
+def _alarme(db, var_id, ts, alarme=1):
+    with db.transaction() as c:
+        c.execute("INSERT INTO evenements (date_heure, ts, variable_id, evenement, alarme) VALUES ('', ?, ?, 'max', ?)",
+                  (ts, var_id, alarme))
+        return c.lastrowid
+
+
+def test_agregats_incrementaux(db, donnees, monkeypatch):
+    a, b = add_variables(db, "A", "B")
+    recalculs = []
+    recompute = donnees._recompute
+    monkeypatch.setattr(donnees, "_recompute", lambda c: (recalculs.append(1), recompute(c)))
+
+    _alarme(db, a, T0)
+    _alarme(db, b, T0 + 3600)
+    _alarme(db, b, T0 + 3600, alarme=0)        # événement sans alarme : pas compté
+    donnees.refresh()
+    _alarme(db, a, T0 + 3600)
+    donnees.refresh()
+    assert recalculs == []
+    assert donnees.alarms_by_hour().to_dict() == {8: 1, 9: 2}
+    assert donnees.alarms_by_variable().to_dict() == {"A": 2, "B": 1}
+
+
+def test_acquittement_recalcule(db, donnees):
+    (a,) = add_variables(db, "A")
+    premier = _alarme(db, a, T0)
+    _alarme(db, a, T0 + 3600)
+    donnees.refresh()
+    db.reset_alarm(premier)
+    donnees.refresh()
+    assert donnees.alarms_by_hour().to_dict() == {9: 1}
+    assert donnees.alarms_by_variable().to_dict() == {"A": 1}
+
+
+def test_cache_invalide_par_le_filigrane(db, donnees):
+    (a,) = add_variables(db, "A")
+    _alarme(db, a, T0)
+    donnees.refresh()
+    premiers = donnees.recent_events()
+    donnees.refresh()
+    assert donnees.recent_events() is premiers             # rien de nouveau : servi depuis le cache
+    _alarme(db, a, T0 + 60)
+    donnees.refresh()
+    recents = donnees.recent_events()
+    assert recents is not premiers
+    assert recents["ts"].tolist() == [T0 + 60, T0]
+
+
+def test_controle_de_fraicheur_par_ttl(db):
+    (a,) = add_variables(db, "A")
+    donnees = DashboardData(db.DB_FILE, ttl=3600)
+    try:
+        donnees.refresh()
+        _alarme(db, a, T0)
+        donnees.refresh()                                  # dans le TTL : base non relue
+        assert donnees.alarms_by_variable().empty
+        donnees.checked_at = float("-inf")
+        donnees.refresh()
+        assert donnees.alarms_by_variable().to_dict() == {"A": 1}
+        # Valeurs courantes : expiration par TTL même sans nouvel événement
+        assert donnees.variables() is donnees.variables()
+    finally:
+        donnees.conn.close()
@@ -0,0 +1,94 @@
+import threading
+
+import pytest
+
+import archive
+import history
+from conftest import add_variables
+
+# Lundi 2 septembre 2024 00:00 UTC : début d'heure, loin des changements d'heure
+T0 = 1725235200
+
+
+def _agregats(db, table):
+    with db.transaction() as c:
+        c.execute(f"SELECT variable_id, ts, vmin, vmax, vavg, n FROM {table} ORDER BY variable_id, ts")
+        return c.fetchall()
+
+
+def test_rollup_minutes_et_heures(db):
+    a, b = add_variables(db, "A", "B")
+    db.flush_scan([(a, 10.0, "good"), (b, 1.0, "good")], ts=T0 + 5)
+    db.flush_scan([(a, 20.0, "good"), (b, 3.0, "good")], ts=T0 + 35)
+    db.flush_scan([(a, 40.0, "good")], ts=T0 + 65)
+    history.rollup(T0 + 3600 + 10)
+
+    assert _agregats(db, "historique_1m") == [
+        (a, T0, 10.0, 20.0, 15.0, 2),
+        (a, T0 + 60, 40.0, 40.0, 40.0, 1),
+        (b, T0, 1.0, 3.0, 2.0, 2),
+    ]
+    # Moyenne horaire pondérée par le nombre d'échantillons de chaque minute
+    assert _agregats(db, "historique_1h") == [
+        (a, T0, 10.0, 40.0, pytest.approx(70 / 3), 3),
+        (b, T0, 1.0, 3.0, 2.0, 2),
+    ]
+
+
+def test_lot_en_retard_reagrege(db):
+    (a,) = add_variables(db, "A")
+    db.flush_scan([(a, 10.0, "good")], ts=T0 + 5)
+    history.rollup(T0 + 3600 + 10)
+
+    # Lot écrit après le passage (rejeu du journal) mais horodaté dans la minute déjà agrégée
+    db.flush_scan([(a, 30.0, "good")], ts=T0 + 50, seq=1)
+    history.rollup(T0 + 3600 + 20)
+    assert _agregats(db, "historique_1m") == [(a, T0, 10.0, 30.0, 20.0, 2)]
+    assert _agregats(db, "historique_1h") == [(a, T0, 10.0, 30.0, 20.0, 2)]
+
+    # Marqueur consommé : un scan à l'heure ne déclenche pas de nouveau recalcul
+    with db.transaction() as c:
+        assert history._get_meta(c, "rollup_retard", None) is None
+        db.append_history(c, T0 + 3600 + 30, [(a, 1.0, "good")])
+        assert history._get_meta(c, "rollup_retard", None) is None
+
+
+def test_retention_sans_filtre_de_variable(db, monkeypatch):
+    a, b = add_variables(db, "A", "B")
+    ancien, recent = T0, T0 + 400 * 86400
+    for ts in (ancien, recent):
+        db.flush_scan([(a, 1.0, "good"), (b, 2.0, "good")], ts=ts)
+    history.rollup(recent + 7200)
+    # Variable supprimée : ses agrégats anciens doivent partir avec la rétention
+    with db.transaction() as c:
+        c.execute("DELETE FROM variables WHERE id = ?", (b,))
+
+    monkeypatch.setattr(archive, "enabled", lambda: False)
+    monkeypatch.setattr(history, "HISTORY_1M_RETENTION_DAYS", 30)
+    monkeypatch.setattr(history, "HISTORY_1H_RETENTION_DAYS", 365)
+    history.apply_retention(recent + 7200)
+
+    for table in ("historique_1m", "historique_1h"):
+        assert {(var_id, ts) for var_id, ts, *_ in _agregats(db, table)} == {(a, recent), (b, recent)}
+    with db.transaction() as c:
+        assert db.list_history_partitions(c) == [db.history_partition(recent)]
+
+
+def test_lecture_froide_hors_verrou(db, monkeypatch):
+    (a,) = add_variables(db, "A")
+    db.flush_scan([(a, 5.0, "good")], ts=T0 + 5)
+    verrou_libre = []
+    lire = archive.read_files
+
+    def read_files(*args, **kwargs):
+        # Un autre thread (scan, écriture différée) doit pouvoir prendre le verrou de la base
+        resultat = []
+        t = threading.Thread(target=lambda: resultat.append(db._lock.acquire(timeout=1) and db._lock.release()))
+        t.start()
+        t.join()
+        verrou_libre.append(resultat == [None])
+        return lire(*args, **kwargs)
+
+    monkeypatch.setattr(archive, "read_files", read_files)
+    assert history.query_history(a, T0, T0 + 60, "raw") == [(a, T0 + 5, 5.0, 5.0, 5.0)]
+    assert verrou_libre == [True]
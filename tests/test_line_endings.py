@@ -0,0 +1,27 @@
+# tests/test_line_endings.py
+import os
+import subprocess
+
+import pytest
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _fichiers_crlf():
+    """Fichiers suivis soumis à la règle CRLF de .gitattributes."""
+    try:
+        sortie = subprocess.run(["git", "ls-files", "*.py", "requirements.txt"], cwd=RACINE,
+                                capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        pytest.skip("dépôt git indisponible")
+    return sortie.split()
+
+
+def test_fins_de_ligne_crlf():
+    lf = []
+    for chemin in _fichiers_crlf():
+        with open(os.path.join(RACINE, chemin), "rb") as f:
+            data = f.read()
+        if data.count(b"\n") != data.count(b"\r\n"):
+            lf.append(chemin)
+    assert lf == [], f"Fichiers avec des fins de ligne LF : {lf}"
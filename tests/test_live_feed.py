@@ -0,0 +1,83 @@
+import time
+
+import pytest
+
+from dashboard_data import live_variables
+from live_feed import FeedClient, FeedServer, Snapshot
+
+LIGNES = [(1, "A", "ns=2;s=Essai.A", 10.0, 0, 100), (2, "B", "ns=2;s=Essai.B", 20.0, 0, 100)]
+
+
+def _attendre(condition, timeout=5):
+    fin = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < fin, "délai dépassé"
+        time.sleep(0.02)
+
+
+def test_snapshot_changements_et_historique():
+    snap = Snapshot(backlog=2)
+    snap.publish(LIGNES)
+    snap.publish(LIGNES)                    # aucun changement : pas de nouvelle version
+    assert snap.version == 1
+    snap.publish([(1, "A", "ns=2;s=Essai.A", 11.0, 0, 100)], events=[(1, "MAX", 1)])
+    assert snap.changes_since(1) == (2, [(1, "A", "ns=2;s=Essai.A", 11.0, 0, 100)])
+    snap.replace(LIGNES[1:])
+    assert snap.full() == (3, [LIGNES[1]])
+    # Historique borné : la version 0 n'est plus rejouable, un instantané est nécessaire
+    assert snap.deltas_since(0, timeout=0) == (3, None)
+    version, deltas = snap.deltas_since(2, timeout=0)
+    assert version == 3 and [d[4] for d in deltas] == [[1]]
+
+
+@pytest.fixture
+def serveur(free_port):
+    snap = Snapshot()
+    snap.publish(LIGNES)
+    feed = FeedServer(snap, "127.0.0.1", free_port, heartbeat=0.5)
+    yield snap, feed
+    feed.close()
+
+
+def test_client_instantane_puis_deltas(serveur):
+    snap, feed = serveur
+    client = FeedClient(f"http://127.0.0.1:{feed.port}/events", heartbeat=0.5).start()
+    try:
+        _attendre(lambda: client.connected)
+        assert client.snapshot.full()[1] == LIGNES
+        assert client.stats["snapshots"] == 1
+
+        snap.publish([(2, "B", "ns=2;s=Essai.B", 150.0, 0, 100)], events=[(2, "MAX", 1)])
+        _attendre(lambda: client.seq == snap.version)
+        assert [e[1:] for e in client.events] == [(2, "MAX", 1)]
+        assert client.last_id == f"{feed.instance}-{snap.version}"
+
+        # Le dashboard affiche le Snapshot local, sans lire la base
+        df = live_variables(client.snapshot)
+        assert df["nom_variable"].tolist() == ["A", "B"]
+        assert df["last_value"].tolist() == [10.0, 150.0]
+    finally:
+        client.stop()
+
+
+def test_reprise_apres_deconnexion(serveur):
+    snap, feed = serveur
+    # Identifiant d'une autre instance (surveillance redémarrée) : instantané complet
+    assert feed.resume_version("autre-1") is None
+    assert feed.resume_version(f"{feed.instance}-{snap.version + 1}") is None
+    assert feed.resume_version(f"{feed.instance}-{snap.version}") == snap.version
+
+    client = FeedClient(f"http://127.0.0.1:{feed.port}/events", heartbeat=0.5)
+    client.last_id = f"{feed.instance}-{snap.version}"
+    client.seq = snap.version
+    client.snapshot.replace(LIGNES)
+    client.start()
+    try:
+        _attendre(lambda: feed.stats["connections"] == 1)
+        snap.publish([(1, "A", "ns=2;s=Essai.A", 12.0, 0, 100)])
+        _attendre(lambda: client.seq == snap.version)
+        # Reprise : seuls les changements manqués, pas de nouvel instantané
+        assert client.stats["snapshots"] == 0 and client.stats["messages"] == 1
+        assert client.snapshot.lookup([1])[1][3] == 12.0
+    finally:
+        client.stop()
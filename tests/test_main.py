@@ -0,0 +1,39 @@
+import json
+import os
+import subprocess
+import sys
+
+import analytics
+from conftest import add_variables
+from dashboard_data import DashboardData
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_service_once_sans_interface(tmp_path):
+    base = tmp_path / "service.db"
+    sortie = subprocess.run(
+        [sys.executable, os.path.join(RACINE, "main.py"), "--once", "--db", str(base),
+         "--simulation", "always", "--workers", "0", "--sinks", "log", "--interval", "1"],
+        cwd=tmp_path, capture_output=True, text=True, timeout=120,
+    )
+    assert sortie.returncode == 0, sortie.stderr
+    mesures = json.loads(sortie.stdout.strip().splitlines()[-1])
+    assert mesures["variables"] > 0
+    assert mesures["heavy_modules"] == []
+    # --db : la base demandée est utilisée, aucune base créée dans le dossier courant
+    assert base.exists()
+    assert not (tmp_path / "surveillance.db").exists()
+
+
+def test_base_resolue_a_l_appel(db):
+    # Comme main.py --db : seul database.DB_FILE change après l'import des modules
+    (a,) = add_variables(db, "A")
+    db.flush_scan([], events=[(a, "MAX", 1)])
+    assert analytics.load_events()["variable_id"].tolist() == [a]
+    donnees = DashboardData(ttl=0)
+    try:
+        assert donnees.db_file == db.DB_FILE
+        assert len(donnees.recent_events(10)) == 1
+    finally:
+        donnees.conn.close()
@@ -0,0 +1,97 @@
+import io
+import json
+import logging
+import urllib.error
+import urllib.request
+
+import pytest
+
+import metrics
+
+
+@pytest.fixture(autouse=True)
+def etat_vierge(monkeypatch):
+    """Métriques vides et activées (état global du module restauré après chaque test)."""
+    monkeypatch.setattr(metrics, "_enabled", True)
+    monkeypatch.setattr(metrics, "_phases", {})
+    monkeypatch.setattr(metrics, "_collectors", {})
+    monkeypatch.setattr(metrics, "_last_totals", {})
+
+
+def test_desactive_sans_cout():
+    metrics.enable(False)
+    assert metrics.timer("opc_read") is metrics._NULL
+    with metrics.timer("opc_read"):
+        pass
+    assert metrics.phase_totals() == {}
+
+
+def test_histogramme_des_phases():
+    with metrics.timer("db_write"):
+        pass
+    metrics.observe("db_write", 0.02)
+    metrics.observe("db_write", 60.0)
+    nombre, somme, maximum = metrics.phase_totals()["db_write"]
+    assert nombre == 3 and maximum == 60.0 and somme == pytest.approx(60.02, abs=0.01)
+
+    texte = metrics.render()
+    assert "# TYPE surveillance_phase_seconds histogram" in texte
+    assert 'surveillance_phase_seconds_bucket{phase="db_write",le="0.01"} 1' in texte
+    assert 'surveillance_phase_seconds_bucket{phase="db_write",le="0.05"} 2' in texte
+    assert 'surveillance_phase_seconds_bucket{phase="db_write",le="10.0"} 2' in texte
+    assert 'surveillance_phase_seconds_bucket{phase="db_write",le="+Inf"} 3' in texte
+    assert 'surveillance_phase_seconds_count{phase="db_write"} 3' in texte
+
+
+def test_compteurs_et_jauges():
+    stats = {"reads": 5, "queue": 2}
+    metrics.register_stats(stats, "opc", gauges=("queue",))
+    metrics.register("gauge", "sessions", "Sessions OPC UA", lambda: {"srv1": 1, "srv2": 0})
+    metrics.register("counter", "en_erreur", "Collecteur en échec", lambda: 1 / 0)
+    stats["reads"] = 7        # lu au moment de l'exposition
+
+    texte = metrics.render()
+    assert "# TYPE surveillance_opc_reads_total counter" in texte
+    assert "surveillance_opc_reads_total 7.0" in texte
+    assert "# TYPE surveillance_opc_queue gauge" in texte
+    assert 'surveillance_sessions{key="srv1"} 1.0' in texte
+    assert "en_erreur" not in texte
+
+
+def test_point_d_acces_http(free_port):
+    metrics.register("gauge", "variables", "Variables surveillées", lambda: 42)
+    serveur = metrics.start_server(port=free_port, host="127.0.0.1")
+    try:
+        assert metrics.start_server(port=free_port, host="127.0.0.1") is serveur
+        with urllib.request.urlopen(f"http://127.0.0.1:{free_port}/metrics", timeout=5) as reponse:
+            assert reponse.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert "surveillance_variables 42.0" in reponse.read().decode()
+        with pytest.raises(urllib.error.HTTPError) as erreur:
+            urllib.request.urlopen(f"http://127.0.0.1:{free_port}/autre", timeout=5)
+        assert erreur.value.code == 404
+    finally:
+        metrics.stop_server()
+
+
+def test_journal_par_scan():
+    flux = io.StringIO()
+    handler = logging.StreamHandler(flux)
+    handler.setFormatter(metrics.JsonFormatter())
+    metrics.logger.addHandler(handler)
+    niveau = metrics.logger.level
+    metrics.logger.setLevel(logging.INFO)
+    try:
+        metrics.register("gauge", "alarmes_en_attente", "File d'alarmes", lambda: 2)
+        metrics.observe("opc_read", 0.5)
+        metrics.log_scan(0.75, 3)
+        metrics.observe("opc_read", 0.25)
+        metrics.log_scan(0.5, 3)
+    finally:
+        metrics.logger.removeHandler(handler)
+        metrics.logger.setLevel(niveau)
+
+    premier, second = (json.loads(ligne) for ligne in flux.getvalue().splitlines())
+    assert premier["msg"] == "scan" and premier["scan_s"] == 0.75 and premier["variables"] == 3
+    # Temps de phase propre à chaque scan, pas le cumul
+    assert premier["opc_read_s"] == 0.5 and second["opc_read_s"] == 0.25
+    assert second["alarmes_en_attente"] == 2
@@ -0,0 +1,114 @@
+# tests/test_opc_client.py
+import time
+
+import pytest
+
+pytest.importorskip("opcua")
+
+from opc_client import OPCClient, QUALITY_BAD, QUALITY_GOOD  # noqa: E402
+from opc_server import LocalOPCServer  # noqa: E402
+
+N_VARIABLES = 25
+
+
+@pytest.fixture
+def serveur(free_port):
+    """Serveur OPC UA local avec N_VARIABLES mesures (valeur = indice) et un contact."""
+    server = LocalOPCServer(f"opc.tcp://127.0.0.1:{free_port}")
+    server.add_variables([(f"ns=2;s=Essai.Mesure{i}", f"Mesure{i}", float(i), "reel")
+                          for i in range(N_VARIABLES)])
+    server.add_variable("ns=2;s=Essai.Contact", "Contact", True, "bool")
+    with server:
+        yield server
+
+
+@pytest.fixture
+def client(serveur):
+    client = OPCClient(serveur.endpoint, simulation="never")
+    yield client
+    client.disconnect()
+
+
+def _mesures(n=N_VARIABLES):
+    return [(f"ns=2;s=Essai.Mesure{i}", f"Mesure{i}", "reel") for i in range(n)]
+
+
+def test_read_many_par_paquets(client, monkeypatch):
+    assert client.connect()
+    appels = []
+    read = client.client.uaclient.read
+
+    def read_compte(params):
+        appels.append(len(params.NodesToRead))
+        return read(params)
+
+    monkeypatch.setattr(client.client.uaclient, "read", read_compte)
+    variables = _mesures() + [("ns=2;s=Essai.Contact", "Contact", "bool")]
+    results = client.read_many(variables, chunk_size=10)
+
+    assert appels == [10, 10, 6]
+    assert [r.value for r in results] == [float(i) for i in range(N_VARIABLES)] + [True]
+    assert all(r.quality == QUALITY_GOOD and r.status == "Good" for r in results)
+
+
+def test_read_many_suit_les_valeurs_du_serveur(serveur, client):
+    serveur.set_value("ns=2;s=Essai.Mesure3", 42.5)
+    assert client.read_variable("ns=2;s=Essai.Mesure3", "Mesure3") == 42.5
+
+
+def test_noeud_inconnu_qualite_bad(client):
+    variables = _mesures(3) + [("ns=2;s=Essai.Inconnu", "Inconnu", "reel")] + _mesures(2)
+    results = client.read_many(variables, chunk_size=4)
+
+    inconnu = results[3]
+    assert inconnu.status == "BadNodeIdUnknown"
+    assert inconnu.quality == QUALITY_BAD
+    assert inconnu.value is None
+    # Le nœud inconnu n'affecte ni les autres valeurs ni la session
+    assert [r.value for r in results[:3] + results[4:]] == [0.0, 1.0, 2.0, 0.0, 1.0]
+    assert client.connected and client.breaker.state == "closed"
+
+
+def test_adresse_invalide_qualite_bad(client):
+    variables = _mesures(2) + [("pas une adresse", "Invalide", "reel"), ("ns=2;x=Essai", "Invalide2", "reel")]
+    for _ in range(3):
+        results = client.read_many(variables + _mesures(2), chunk_size=3)
+        assert [r.status for r in results[2:4]] == ["BadNodeIdInvalid"] * 2
+        assert all(r.quality == QUALITY_BAD and r.value is None for r in results[2:4])
+        assert [r.value for r in results[:2] + results[4:]] == [0.0, 1.0, 0.0, 1.0]
+    # Une adresse invalide n'est pas une perte de connexion
+    assert client.connected and client.breaker.state == "closed"
+    assert client.stats["read_errors"] == 0 and client.stats["reconnects"] == 0
+    assert client.stats["reads"] == 3 * 6
+
+
+def test_disjoncteur_ouvert_echec_immediat(free_port):
+    client = OPCClient(f"opc.tcp://127.0.0.1:{free_port}", simulation="never")
+    variables = _mesures(5)
+    for _ in range(client.breaker.threshold):
+        results = client.read_many(variables)
+        assert all(r.quality == QUALITY_BAD for r in results)
+    assert client.breaker.state == "open"
+
+    debut = time.monotonic()
+    results = client.read_many(variables)
+    assert time.monotonic() - debut < 0.1
+    assert [(r.value, r.status, r.quality) for r in results] == [(None, "BadNotConnected", QUALITY_BAD)] * 5
+    assert client.breaker.stats["rejected"] == 1
+    assert client.stats["fast_failures"] == 5 * (client.breaker.threshold + 1)
+    assert client.stats["reads"] == 0           # échecs immédiats : aucune lecture envoyée
+    assert not client.simulation_mode
+
+
+def test_serveur_perdu_puis_disjoncteur(serveur, client):
+    variables = _mesures(5)
+    assert all(r.quality == QUALITY_GOOD for r in client.read_many(variables))
+    serveur.stop()
+
+    for _ in range(client.breaker.threshold):
+        results = client.read_many(variables)
+        assert all(r.quality == QUALITY_BAD and r.value is None for r in results)
+    assert not client.connected
+    assert client.breaker.state == "open"
+    assert client.stats["read_errors"] == 1
+    serveur.start()
@@ -0,0 +1,109 @@
+# tests/test_query_plans.py
+import random
+import sqlite3
+
+import pytest
+
+import database
+import migrations
+
+N_VARIABLES = 5000
+N_EVENEMENTS = 50_000
+
+
+@pytest.fixture
+def base(tmp_path, monkeypatch):
+    """Base temporaire migrée et peuplée (tables assez grosses pour que le planificateur choisisse)."""
+    database.close_shared_connection()
+    monkeypatch.setattr(database, "DB_FILE", str(tmp_path / "plans.db"))
+    database.init_db()
+    rng = random.Random(42)
+    with database.transaction() as c:
+        c.executemany("""
+            INSERT INTO variables (nom_variable, adresse_opc, type, min, max, last_value, etat_id)
+            VALUES (?, ?, 'reel', 0, 100, ?, ?)
+        """, [(f"Tag{i}", f"ns=2;s=Essai.Tag{i}", rng.uniform(-10, 110), i % 20) for i in range(N_VARIABLES)])
+        c.executemany("""
+            INSERT INTO evenements (date_heure, ts, variable_id, evenement, alarme)
+            VALUES ('', ?, ?, ?, ?)
+        """, [(i * 10, i % N_VARIABLES + 1, rng.choice(("min", "max", database.EVENT_RETOUR_NORMAL)),
+               int(i % 100 == 0)) for i in range(N_EVENEMENTS)])
+    yield database
+    database.close_shared_connection()
+
+
+@pytest.mark.parametrize("statistiques", [False, True], ids=["sans_analyze", "apres_analyze"])
+def test_aucun_parcours_complet(base, statistiques):
+    with database.transaction() as c:
+        if statistiques:
+            c.execute("ANALYZE")
+        assert migrations.full_scans(c) == {}
+        migrations.check_query_plans(c)
+
+
+def test_parcours_detectes(base, monkeypatch):
+    hot_queries = migrations.hot_queries
+    monkeypatch.setattr(migrations, "hot_queries", lambda: {
+        **hot_queries(),
+        "evenements_par_type": ("SELECT * FROM evenements WHERE evenement = ?", ("max",)),
+        # Parcours d'un index complet : refusé hors ALLOWED_SCANS
+        "nombre_variables": ("SELECT COUNT(*) FROM variables", ()),
+        # Tri de toute la table en B-tree temporaire
+        "tri_valeur": ("SELECT id FROM variables ORDER BY last_value LIMIT 50", ()),
+    })
+    with database.transaction() as c:
+        scans = migrations.full_scans(c)
+        assert set(scans) == {"evenements_par_type", "nombre_variables", "tri_valeur"}
+        assert "USING COVERING INDEX" in scans["nombre_variables"][0]
+        assert scans["tri_valeur"] == ["SCAN variables", "USE TEMP B-TREE FOR ORDER BY"]
+        with pytest.raises(RuntimeError):
+            migrations.check_query_plans(c)
+
+
+@pytest.mark.parametrize("filtres", [{}, {"alarme": False}, {"alarme": True}, {"prefix": "Tag1"}, {"etat_id": 3}])
+@pytest.mark.parametrize("colonne", list(database.SORTABLE_COLUMNS))
+def test_tri_des_pages(base, filtres, colonne):
+    """Le tri écarté de l'index ("+colonne") donne le même ordre que le tri Python."""
+    total, lignes = database.query_variables(order_by=colonne, desc=True, limit=10_000, **filtres)
+    assert len(lignes) == total > 0
+    rang = ("id", "nom_variable", "adresse_opc", "last_value", "min", "max").index(colonne)
+    assert lignes == sorted(lignes, key=lambda ligne: (ligne[rang], ligne[0]), reverse=True)
+
+
+def test_tri_sur_la_valeur_refuse(base):
+    with pytest.raises(ValueError):
+        database.query_variables(order_by="last_value")
+
+
+def test_vue_paginee_couverte():
+    """Chaque combinaison de filtres, colonne triable et sens est contrôlée."""
+    requetes = migrations.hot_queries()
+    for filtre in migrations.PAGE_FILTERS:
+        for filtre_alarme in migrations.ALARM_FILTERS:
+            for colonne in database.SORTABLE_COLUMNS:
+                assert f"vue{filtre}{filtre_alarme}_tri_{colonne}" in requetes
+                assert f"vue{filtre}{filtre_alarme}_tri_{colonne}_desc" in requetes
+
+
+def test_migration_adresses_en_double(tmp_path, capsys):
+    """Base antérieure à la migration 2 : les doublons sont fusionnés dans la variable de plus petit id."""
+    conn = sqlite3.connect(tmp_path / "ancienne.db")
+    c = conn.cursor()
+    database._create_tables(c)
+    c.execute("PRAGMA user_version = 1")
+    c.executemany("INSERT INTO variables (id, nom_variable, adresse_opc) VALUES (?, ?, ?)",
+                  [(1, "A", "ns=2;s=A"), (2, "B", "ns=2;s=B"), (3, "A bis", "ns=2;s=A"), (4, "A ter", "ns=2;s=A")])
+    c.executemany("INSERT INTO evenements (variable_id, evenement, alarme) VALUES (?, 'max', 1)", [(3,), (4,), (2,)])
+    c.executemany("INSERT INTO historique_1m (variable_id, ts, vmin, vmax, vavg, n) VALUES (?, ?, 0, 0, ?, 1)",
+                  [(1, 60, 1.0), (3, 60, 3.0), (3, 120, 3.0)])
+    conn.commit()
+
+    migrations.migrate(c)
+    c.execute("SELECT id FROM variables ORDER BY id")
+    assert c.fetchall() == [(1,), (2,)]
+    c.execute("SELECT variable_id FROM evenements ORDER BY id")
+    assert c.fetchall() == [(1,), (1,), (2,)]
+    c.execute("SELECT variable_id, ts, vavg FROM historique_1m ORDER BY ts")
+    assert c.fetchall() == [(1, 60, 1.0), (1, 120, 3.0)]
+    assert "[3, 4] fusionnée(s) dans 1" in capsys.readouterr().out
+    conn.close()
@@ -0,0 +1,96 @@
+import time
+from datetime import date
+
+import numpy as np
+import pytest
+
+import report
+from conftest import add_variables
+
+# 27 octobre 2024 à Paris : retour à l'heure d'hiver, 2 h du matin vécue deux fois (jour de 25 h)
+JOUR = date(2024, 10, 27)
+EVENEMENTS = [
+    (1729985400, "2024-10-27 01:30:00", "max", 1),   # 01:30 CEST
+    (1729989000, "2024-10-27 02:30:00", "min", 0),   # 02:30 CEST
+    (1729992600, "2024-10-27 02:30:00", "max", 1),   # 02:30 CET
+    (1730001600, "2024-10-27 05:00:00", "max", 1),   # 05:00 CET
+]
+
+
+@pytest.fixture
+def paris(monkeypatch):
+    monkeypatch.setenv("TZ", "Europe/Paris")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+@pytest.fixture
+def textes(monkeypatch, tmp_path, db):
+    """Génère les rapports dans tmp_path et note le texte de chaque cellule du PDF."""
+    monkeypatch.chdir(tmp_path)
+    notes = []
+    cell = report.FPDF.cell
+
+    def noter(self, w=None, h=None, text="", *args, **kwargs):
+        notes.append(text)
+        return cell(self, w, h, text, *args, **kwargs)
+
+    monkeypatch.setattr(report.FPDF, "cell", noter)
+    return notes
+
+
+def _inserer(db, var_id, evenements):
+    with db.transaction() as c:
+        c.executemany("INSERT INTO evenements (ts, date_heure, variable_id, evenement, alarme) VALUES (?, ?, ?, ?, ?)",
+                      [(ts, date_heure, var_id, evenement, alarme) for ts, date_heure, evenement, alarme in evenements])
+
+
+def test_heures_locales_jour_de_changement_d_heure(db, paris):
+    (var_id,) = add_variables(db, "Pression")
+    _inserer(db, var_id, EVENEMENTS)
+    debut, fin = db.day_bounds(JOUR)
+    assert fin - debut == 25 * 3600
+    with db.transaction() as c:
+        resume = report.daily_summary(c, debut, fin)
+    assert resume["total"] == 4 and resume["alarmes"] == 3
+    assert resume["par_heure"] == [(1, 1), (2, 2), (5, 1)]
+    assert resume["top"] == [("Pression", 4, 1, 3)]
+
+
+def test_synthese_avec_evenements_archives(db, paris):
+    (var_id,) = add_variables(db, "Pression")
+    _inserer(db, var_id, EVENEMENTS[:2])
+    froids = EVENEMENTS[2:]
+    froid = {
+        "ts": np.array([e[0] for e in froids]),
+        "date_heure": np.array([e[1] for e in froids], dtype=object),
+        "variable_id": np.array([var_id] * len(froids)),
+        "evenement": np.array([e[2] for e in froids], dtype=object),
+        "alarme": np.array([e[3] for e in froids]),
+    }
+    debut, fin = db.day_bounds(JOUR)
+    with db.transaction() as c:
+        resume = report.daily_summary(c, debut, fin, froid=froid)
+        lignes = list(report.event_rows(c, debut, fin, froid))
+    assert resume["par_heure"] == [(1, 1), (2, 2), (5, 1)]
+    assert resume["top"] == [("Pression", 4, 1, 3)]
+    assert [ligne[0] for ligne in lignes] == [e[1] for e in EVENEMENTS]
+
+
+def test_rapport_pdf(db, paris, textes, tmp_path):
+    (var_id,) = add_variables(db, "Pression")
+    _inserer(db, var_id, EVENEMENTS)
+    etapes = []
+    fichier = report.generate_daily_report(JOUR, progress=lambda fraction, message: etapes.append(fraction))
+    assert (tmp_path / fichier).exists() and fichier == "rapport_2024-10-27.pdf"
+    assert "Événements : 4   dont alarmes : 3" in textes
+    assert "02h : 2" in textes
+    assert "[2024-10-27 05:00:00] Pression - max - ALARME" in textes
+    assert etapes[0] == 0.0 and etapes[-1] == 1.0
+
+
+def test_rapport_jour_sans_evenement(db, textes):
+    report.generate_daily_report(date(2024, 3, 5))
+    assert "Aucun événement le 2024-03-05." in textes
@@ -0,0 +1,92 @@
+import threading
+
+import numpy as np
+import pytest
+
+from alarm import AlarmManager
+from conftest import add_variables
+from opc_client import QUALITY_BAD, QUALITY_GOOD, QUALITY_UNCERTAIN
+from surveillance import Surveillance
+
+
+class SessionLente:
+    """Session OPC UA dont la déconnexion attend `libere`."""
+
+    server_url = "opc.tcp://retire:4840"
+
+    def __init__(self):
+        self.libere = threading.Event()
+        self.deconnectee = threading.Event()
+
+    def disconnect(self):
+        self.libere.wait(5)
+        self.deconnectee.set()
+
+
+@pytest.fixture
+def surveillance(db):
+    s = Surveillance(alarm_manager=AlarmManager(sinks=["log"]), workers=0, simulation="always")
+    yield s
+    s.control.shutdown()
+
+
+def test_sessions_retirees_deconnectees_hors_du_controle(db, surveillance):
+    add_variables(db, "A")
+    surveillance.load_registry()
+    lente = SessionLente()
+    surveillance.sessions[("opc.tcp://retire:4840", "ns=9", "normal")] = lente
+
+    add_variables(db, "B")
+    surveillance.last_reload = float("-inf")
+    assert surveillance.refresh_registry()          # rend la main sans attendre la déconnexion
+    assert surveillance.sessions == {}
+    assert not lente.deconnectee.is_set()
+    lente.libere.set()
+    assert lente.deconnectee.wait(5)
+
+
+class Ecritures:
+    """Remplace l'écriture différée : garde les lots déposés."""
+
+    def __init__(self):
+        self.lots = []
+
+    def submit(self, ids, values, quality, events=(), acquits=(), bad=()):
+        self.lots.append((dict(zip(ids.tolist(), values.tolist())), list(events), list(bad)))
+
+
+def test_bande_morte_filtre_les_ecritures(db, surveillance):
+    a, b = add_variables(db, "A", "B")
+    with db.transaction() as c:
+        c.execute("UPDATE variables SET deadband = 1 WHERE id IN (?, ?)", (a, b))
+    surveillance.load_registry()
+    surveillance.writer = ecritures = Ecritures()
+    positions = np.array([0, 1])
+
+    def scan(*valeurs, quality=(QUALITY_GOOD, QUALITY_GOOD)):
+        surveillance.check_values(positions, np.array(valeurs, float), np.array(quality, np.int8))
+        return ecritures.lots.pop() if ecritures.lots else None
+
+    assert scan(50.0, 20.0)[0] == {a: 50.0, b: 20.0}      # première lecture : toujours écrite
+    assert scan(50.6, 20.4) is None                       # dans la bande morte
+    assert scan(51.2, 20.9)[0] == {a: 51.2}               # écart mesuré depuis la dernière écrite
+    assert surveillance.stats["deadband_suppressed"] == 3
+    # Changement de qualité : écrit malgré la bande morte
+    assert scan(51.3, 20.9, quality=(QUALITY_GOOD, QUALITY_UNCERTAIN))[0] == {b: 20.9}
+    # Lecture en échec : seule la qualité est écrite, la valeur reste en mémoire
+    assert scan(51.3, np.nan)[1:] == ([], [(b, QUALITY_BAD)])
+    assert surveillance.registry.last_value[1] == 20.9
+
+
+def test_bande_morte_ignoree_sur_changement_d_alarme(db, surveillance):
+    (a,) = add_variables(db, "A", vmin=0, vmax=100)
+    with db.transaction() as c:
+        c.execute("UPDATE variables SET deadband = 1000 WHERE id = ?", (a,))
+    surveillance.load_registry()
+    surveillance.writer = ecritures = Ecritures()
+    surveillance.registry.alarm_states.on_delay = 0
+    positions = np.array([0])
+    surveillance.check_values(positions, np.array([50.0]))
+    surveillance.check_values(positions, np.array([150.0]))
+    valeurs, events, _ = ecritures.lots[-1]
+    assert valeurs == {a: 150.0} and [e[0] for e in events] == [a]
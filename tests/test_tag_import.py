@@ -0,0 +1,107 @@
+import json
+
+import pytest
+
+import opc_client
+import tag_import
+from tag_import import import_tags, export_tags
+
+
+def _tag(nom, **colonnes):
+    return {"nom": nom, "adresse": f"ns=2;s=Essai.{nom}", "seuil_min": 0, "seuil_max": 100, **colonnes}
+
+
+def _variables(db):
+    with db.transaction() as c:
+        c.execute("SELECT nom_variable, adresse_opc, min, max FROM variables ORDER BY nom_variable")
+        return c.fetchall()
+
+
+def test_import_csv_et_mise_a_jour(db, tmp_path):
+    chemin = tmp_path / "variables.csv"
+    # Séparateur ";" (tableur français) : adresses entre guillemets
+    chemin.write_text('nom;adresse;seuil_min;seuil_max;etat;classe\n'
+                      'A;"ns=2;s=Essai.A";0;10,5;Four 1;fast\n'
+                      'B;"ns=2;s=Essai.B";5;1;Four 1;\n'             # min > max
+                      'C;"ns=2;s=Essai.A";0;1;;\n', encoding="utf-8")  # doublon d'adresse
+    resultat = import_tags(str(chemin))
+    assert (resultat["ajoutees"], resultat["rejetees"], resultat["doublons"]) == (1, 1, 1)
+    assert [numero for numero, _ in resultat["erreurs"]] == [3, 4]
+    assert _variables(db) == [("A", "ns=2;s=Essai.A", 0.0, 10.5)]
+
+    resultat = import_tags([_tag("A", seuil_max=20), _tag("B")])
+    assert (resultat["ajoutees"], resultat["mises_a_jour"]) == (1, 1)
+    assert _variables(db)[0] == ("A", "ns=2;s=Essai.A", 0.0, 20.0)
+
+
+@pytest.mark.parametrize("adresse", ["Essai.A", "ns=x;s=A", "ns=2;", "ns=2;s=a;b"])
+@pytest.mark.parametrize("opcua", [True, False], ids=["opcua", "sans_opcua"])
+def test_adresse_invalide_rejetee(db, monkeypatch, adresse, opcua):
+    if opcua and not opc_client.OPCUA_AVAILABLE:
+        pytest.skip("opcua non installé")
+    monkeypatch.setattr(opc_client, "OPCUA_AVAILABLE", opcua)
+    resultat = import_tags([{"nom": "A", "adresse": adresse}])
+    assert resultat["rejetees"] == 1 and "NodeId" in resultat["erreurs"][0][1]
+    assert opc_client.valid_address("ns=2;s=Fours.Four1.Temp") and opc_client.valid_address("i=85")
+
+
+def test_remplacement(db):
+    import_tags([_tag("A"), _tag("B"), _tag("C")])
+    with db.transaction() as c:
+        c.execute("SELECT id FROM variables WHERE nom_variable = 'C'")
+        (c_id,) = c.fetchone()
+        c.execute("INSERT INTO evenements (date_heure, ts, variable_id, evenement, alarme) VALUES ('', 0, ?, 'max', 1)",
+                  (c_id,))
+        db.append_history(c, 1725235200, [(c_id, 1.0, 0)])
+        c.execute("INSERT INTO historique_1m (variable_id, ts, vmin, vmax, vavg, n) VALUES (?, 0, 1, 1, 1, 1)", (c_id,))
+
+    resultat = import_tags([_tag("A"), _tag("B", seuil_max=50), _tag("D")], replace=True)
+    assert resultat["refus"] is None
+    assert (resultat["ajoutees"], resultat["mises_a_jour"], resultat["supprimees"]) == (1, 2, 1)
+    assert [nom for nom, *_ in _variables(db)] == ["A", "B", "D"]
+    # Événements et historique de la variable supprimée partis avec elle
+    with db.transaction() as c:
+        for table in ("evenements", "historique_1m", db.history_partition(1725235200)):
+            c.execute(f"SELECT COUNT(*) FROM {table} WHERE variable_id = ?", (c_id,))
+            assert c.fetchone()[0] == 0, table
+
+
+@pytest.mark.parametrize("source", [
+    [_tag("A"), {"nom": "B", "adresse": "ns=2;s=Essai.B", "type": "texte"}],   # une ligne rejetée
+    [_tag("A"), _tag("A")],                                                      # doublon
+    [],                                                                          # source vide
+    [{"nom": "", "adresse": "ns=2;s=X"}],                                        # aucune ligne valide
+])
+def test_remplacement_refuse(db, source):
+    import_tags([_tag("A"), _tag("B"), _tag("C", seuil_max=7)])
+    avant = _variables(db)
+    resultat = import_tags(source, replace=True)
+    assert resultat["refus"] and resultat["supprimees"] == 0
+    assert _variables(db) == avant
+
+
+def test_remplacement_tout_ou_rien(db, monkeypatch):
+    import_tags([_tag("A"), _tag("B")])
+    avant = _variables(db)
+
+    def panne(c, ids):
+        raise RuntimeError("disque plein")
+
+    monkeypatch.setattr(tag_import, "delete_variables", panne)
+    with pytest.raises(RuntimeError):
+        import_tags([_tag("A", seuil_max=1), _tag("C")], replace=True)
+    assert _variables(db) == avant
+
+
+@pytest.mark.parametrize("extension", ["csv", "json"])
+def test_export_relu_par_l_import(db, tmp_path, extension):
+    import_tags([_tag("A", etat="Four 1", description="Température", bande_morte=0.5), _tag("B", classe="slow")])
+    chemin = str(tmp_path / f"variables.{extension}")
+    assert export_tags(chemin) == 2
+    if extension == "json":
+        with open(chemin, encoding="utf-8") as f:
+            assert json.load(f)[0]["equipement"] == "Four 1"
+    avant = _variables(db)
+    resultat = import_tags(chemin, replace=True)
+    assert (resultat["mises_a_jour"], resultat["supprimees"], resultat["erreurs"]) == (2, 0, [])
+    assert _variables(db) == avant
@@ -0,0 +1,95 @@
+import threading
+
+import numpy as np
+import pytest
+
+from conftest import add_variables
+from tag_registry import TagRegistry
+
+
+@pytest.fixture
+def registre(db):
+    """Registre chargé avec trois variables ; retourne (registre, ids)."""
+    ids = add_variables(db, "A", "B", "C")
+    reg = TagRegistry()
+    reg.load()
+    return reg, ids
+
+
+def _mettre_en_alarme(reg, var_id, now=0.0):
+    pos = np.array([reg.by_id[var_id]])
+    reg.alarm_states.update(pos, np.array([500.0]), reg.vmin[pos], reg.vmax[pos], now)
+    reg.alarm_states.update(pos, np.array([500.0]), reg.vmin[pos], reg.vmax[pos], now + 3600)
+    assert reg.alarm_states.get(pos[0]) == "active"
+
+
+def test_rechargement_conserve_les_etats(db, registre):
+    registre, (a, b, c) = registre
+    _mettre_en_alarme(registre, c)
+    with db.transaction() as cur:
+        cur.execute("DELETE FROM variables WHERE id = ?", (a,))
+        cur.execute("UPDATE variables SET max = 50 WHERE id = ?", (b,))
+    add_variables(db, "D")
+    assert registre.refresh() == (1, 1, 1)
+    assert registre.alarm_states.get(registre.by_id[c]) == "active"
+    assert registre.vmax[registre.by_id[b]] == 50
+    assert a not in registre.by_id
+    assert registre.refresh() == (0, 0, 0)
+
+
+def test_acquittement_pendant_un_rechargement(db, registre):
+    registre, (a, b, c) = registre
+    _mettre_en_alarme(registre, c)
+    with db.transaction() as cur:
+        cur.execute("DELETE FROM variables WHERE id = ?", (a,))
+
+    # Acquittement (thread des alarmes) et rechargement (thread de contrôle) concurrents :
+    # dans les deux ordres possibles, l'acquittement se retrouve dans la nouvelle machine d'états
+    resultats = []
+    with registre.lock:
+        threads = [threading.Thread(target=lambda: resultats.append(registre.acknowledge(c))),
+                   threading.Thread(target=registre.refresh)]
+        for t in threads:
+            t.start()
+    for t in threads:
+        t.join(5)
+    assert resultats == [True]
+    assert a not in registre.by_id
+    assert registre.alarm_states.get(registre.by_id[c]) == "acknowledged"
+
+
+def test_acquittement_variable_inconnue(registre):
+    registre, _ = registre
+    assert not registre.acknowledge(10_000)
+
+
+def test_classes_de_scrutation(db):
+    ids = add_variables(db, "A", "B", "C", "D")
+    with db.transaction() as c:
+        c.executemany("UPDATE variables SET scan_class = ? WHERE id = ?",
+                      [("fast", ids[0]), ("slow", ids[1]), ("inconnue", ids[2]), ("fast", ids[3])])
+    reg = TagRegistry()
+    reg.load()
+    # Classe inconnue → classe par défaut
+    assert reg.scan_classes == ["fast", "slow", "normal", "fast"]
+    assert reg.positions_of().tolist() == [0, 1, 2, 3]
+    assert reg.positions_of(["fast"]).tolist() == [0, 3]
+    assert reg.positions_of(["slow", "fast"]).tolist() == [0, 1, 3]
+    assert reg.positions_of(["absente"]).tolist() == []
+    # Une session par (serveur, namespace, classe) : les classes ne partagent pas de groupe
+    groupes = reg.due_groups(["fast", "normal"])
+    assert sorted(key[2] for key in groupes) == ["fast", "normal"]
+    assert sorted(pos for positions in groupes.values() for pos in positions.tolist()) == [0, 2, 3]
+    assert reg.due_groups() is reg.groups
+
+
+def test_bande_morte_absolue_ou_en_pourcentage(db):
+    ids = add_variables(db, "A", "B", "C", vmin=0, vmax=200)
+    with db.transaction() as c:
+        c.execute("UPDATE variables SET deadband = 1.5 WHERE id = ?", (ids[0],))
+        c.execute("UPDATE variables SET deadband_pct = 2 WHERE id = ?", (ids[1],))
+        c.execute("UPDATE variables SET deadband = 10, deadband_pct = 2 WHERE id = ?", (ids[2],))
+    reg = TagRegistry()
+    reg.load()
+    # La plus grande des deux bandes : 2 % de la plage 0–200 = 4
+    assert reg.deadband.tolist() == [1.5, 4.0, 10.0]
@@ -0,0 +1,106 @@
+import sqlite3
+import time
+
+import numpy as np
+
+import database
+from conftest import add_variables
+from writeback import Journal, WriteBehind
+
+
+def _lot(ids, valeurs, events=()):
+    return (time.time(), np.array(ids), np.array(valeurs, float), np.zeros(len(ids), np.int8), events, (), ())
+
+
+def _valeurs(db):
+    with db.transaction() as c:
+        c.execute("SELECT id, last_value FROM variables ORDER BY id")
+        return dict(c.fetchall())
+
+
+def test_rejeu_du_journal_au_redemarrage(db, tmp_path):
+    a, b = add_variables(db, "A", "B")
+    chemin = str(tmp_path / "essai.journal")
+    # Arrêt brutal : trois lots journalisés, seul le premier avait été écrit en base
+    journal = Journal(chemin)
+    for seq, valeur in ((1, 10.0), (2, 20.0), (3, 30.0)):
+        journal.append(seq, _lot([a, b], [valeur, valeur + 1]))
+    journal.close()
+    db.flush_scan([(a, 10.0, 0), (b, 11.0, 0)], seq=1)
+
+    writer = WriteBehind(journal=chemin)
+    assert writer.pending() == 2
+    assert writer.flush(timeout=5)
+    assert writer.stats["skipped"] == 1 and writer.stats["replayed"] == 2
+    assert _valeurs(db) == {a: 30.0, b: 31.0}
+    assert db.get_writeback_seq() == 3
+    assert writer.close() == 0
+    assert not writer.thread.is_alive()
+
+
+def test_lot_rejete_mis_en_quarantaine(db, tmp_path, monkeypatch):
+    (a,) = add_variables(db, "A")
+    ecrire = database.flush_scan
+
+    def flush_scan(updates, *args, **kwargs):
+        if updates[0][1] < 0:
+            raise ValueError("lot invalide")
+        return ecrire(updates, *args, **kwargs)
+
+    monkeypatch.setattr(database, "flush_scan", flush_scan)
+    chemin = str(tmp_path / "essai.journal")
+    writer = WriteBehind(journal=chemin)
+    writer.submit(*_lot([a], [-1.0])[1:4])
+    writer.submit(*_lot([a], [42.0])[1:4])
+    # Le lot rejeté ne bloque pas les suivants
+    assert writer.flush(timeout=5)
+    writer.close()
+    assert writer.stats["quarantined"] == 1 and writer.stats["batches"] == 1
+    assert _valeurs(db) == {a: 42.0}
+    rejets = Journal(chemin + ".rejets")
+    (seq, lot), = rejets.pending()
+    rejets.close()
+    assert seq == 1 and lot[2].tolist() == [-1.0]
+
+
+def test_base_verrouillee_reessayee(db, tmp_path, monkeypatch):
+    (a,) = add_variables(db, "A")
+    ecrire, echecs = database.flush_scan, []
+
+    def flush_scan(*args, **kwargs):
+        if len(echecs) < 2:
+            echecs.append(1)
+            raise sqlite3.OperationalError("database is locked")
+        return ecrire(*args, **kwargs)
+
+    monkeypatch.setattr(database, "flush_scan", flush_scan)
+    writer = WriteBehind(journal=str(tmp_path / "essai.journal"), retry_max=0.01)
+    writer.submit(*_lot([a], [5.0])[1:4])
+    assert writer.flush(timeout=5)
+    writer.close()
+    assert writer.stats["errors"] == 2 and writer.stats["quarantined"] == 0
+    assert _valeurs(db) == {a: 5.0}
+
+
+def test_close_garde_les_lots_non_ecrits(db, tmp_path, monkeypatch):
+    (a,) = add_variables(db, "A")
+    ecrire = database.flush_scan
+
+    def verrouillee(*args, **kwargs):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(database, "flush_scan", verrouillee)
+    chemin = str(tmp_path / "essai.journal")
+    writer = WriteBehind(journal=chemin, retry_max=0.01)
+    writer.submit(*_lot([a], [7.0])[1:4])
+    assert not writer.flush(timeout=0.2)
+    # Arrêt pendant les essais : le thread s'arrête, le lot reste dans le journal
+    assert writer.close() == 1
+    assert not writer.thread.is_alive()
+
+    monkeypatch.setattr(database, "flush_scan", ecrire)
+    writer = WriteBehind(journal=chemin)
+    assert writer.flush(timeout=5)
+    writer.close()
+    assert writer.stats["replayed"] == 1
+    assert _valeurs(db) == {a: 7.0}
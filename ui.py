@@ -1,12 +1,26 @@
 # ui.py
 import tkinter as tk
-from tkinter import ttk, simpledialog, messagebox
+from tkinter import ttk, simpledialog, messagebox, filedialog
+import queue
 import subprocess
 import threading
 
-from database import get_active_variables, init_db, ensure_example_data
+from database import init_db, ensure_example_data, get_equipements, query_variables
 from surveillance import Surveillance
-from report import generate_daily_report
+from live_feed import FeedClient
+from config import SCAN_CLASSES, SCAN_CLASS_DEFAULT
+
+
+# Nombre de lignes matérialisées dans le Treeview (fenêtre visible)
+PAGE_SIZE = 25
+
+# Colonne affichée → colonne SQL utilisée pour le tri
+SORT_COLUMNS = {
+    "Nom": "nom_variable",
+    "Adresse OPC": "adresse_opc",
+    "Seuil Min": "min",
+    "Seuil Max": "max",
+}
 
 
 class SurveillanceUI:
@@ -15,11 +29,45 @@ class SurveillanceUI:
         self.root.title("🟢 Application de Surveillance Industrielle")
         self.root.geometry("1000x600")
 
+        # -------- Barre de recherche (filtres appliqués par SQLite) --------
+        barre = tk.Frame(root)
+        barre.pack(fill="x", padx=5, pady=5)
+
+        tk.Label(barre, text="Nom commence par :").pack(side="left")
+        self.filtre_nom = tk.StringVar()
+        entry = tk.Entry(barre, textvariable=self.filtre_nom, width=20)
+        entry.pack(side="left", padx=5)
+        entry.bind("<Return>", lambda e: self.apply_filters())
+
+        self.equipements = {designation: etat_id for etat_id, designation in get_equipements()}
+        tk.Label(barre, text="Équipement :").pack(side="left")
+        self.filtre_equipement = ttk.Combobox(barre, values=["Tous"] + list(self.equipements),
+                                              state="readonly", width=20)
+        self.filtre_equipement.set("Tous")
+        self.filtre_equipement.pack(side="left", padx=5)
+
+        tk.Label(barre, text="Alarme :").pack(side="left")
+        self.filtre_alarme = ttk.Combobox(barre, values=["Toutes", "ACTIVE", "OK"], state="readonly", width=8)
+        self.filtre_alarme.set("Toutes")
+        self.filtre_alarme.pack(side="left", padx=5)
+
+        for combo in (self.filtre_equipement, self.filtre_alarme):
+            combo.bind("<<ComboboxSelected>>", lambda e: self.apply_filters())
+        tk.Button(barre, text="🔍 Rechercher", command=self.apply_filters).pack(side="left", padx=5)
+        self.total_label = tk.Label(barre, text="")
+        self.total_label.pack(side="right")
+
+        # -------- Tableau virtualisé --------
+        # Le Treeview ne contient que PAGE_SIZE lignes ; la barre de défilement
+        # représente la totalité des lignes filtrées et déplace la fenêtre lue en base.
+        cadre = tk.Frame(root)
+        cadre.pack(fill="both", expand=True)
+
         self.tree = ttk.Treeview(
-            root,
+            cadre,
             columns=("Nom", "Adresse OPC", "Valeur", "Seuil Min", "Seuil Max", "Alarme"),
             show="headings",
-            height=20
+            height=PAGE_SIZE
         )
         self.tree.heading("Nom", text="Nom")
         self.tree.heading("Adresse OPC", text="Adresse OPC")
@@ -27,6 +75,8 @@ class SurveillanceUI:
         self.tree.heading("Seuil Min", text="Min")
         self.tree.heading("Seuil Max", text="Max")
         self.tree.heading("Alarme", text="Alarme")
+        for colonne in SORT_COLUMNS:
+            self.tree.heading(colonne, command=lambda c=colonne: self.sort_by(c))
 
         self.tree.column("Nom", width=170)
         self.tree.column("Adresse OPC", width=220)
@@ -35,50 +85,204 @@ class SurveillanceUI:
         self.tree.column("Seuil Max", width=90, anchor="center")
         self.tree.column("Alarme", width=100, anchor="center")
 
-        self.tree.pack(fill="both", expand=True)
+        self.scrollbar = ttk.Scrollbar(cadre, orient="vertical", command=self.on_scroll)
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.tree.tag_configure("alarme", background="red", foreground="white")
+        self.tree.bind("<MouseWheel>", lambda e: self.set_offset(self.offset - e.delta // 40))
+        self.tree.bind("<Button-4>", lambda e: self.set_offset(self.offset - 3))
+        self.tree.bind("<Button-5>", lambda e: self.set_offset(self.offset + 3))
+
+        # Périodes des classes de scrutation : SCAN_CLASSES (classe normal = SURVEILLANCE_INTERVAL)
+        self.surv = Surveillance()
+        # Flux en direct d'une surveillance lancée ailleurs (autre processus, service)
+        self.feed = FeedClient().start()
+
+        # Fenêtre courante et paramètres de la requête
+        self.offset = 0
+        self.total = 0
+        self.order_by = "nom_variable"
+        self.desc = False
+        self.window_ids = set()
 
-        self.surv = Surveillance(interval=5)
+        # Rafraîchissement incrémental :
+        # - la lecture (snapshot de la surveillance ou base) se fait dans un thread à part
+        # - le thread Tk n'applique que les lignes modifiées (tree.item), sans tout redessiner
+        self.snapshot_version = 0
+        self.source = None              # Snapshot suivi (surveillance locale, flux en direct) ou None (base)
+        self.fetching = False
+        self.refetch = False           # une relecture de la fenêtre a été demandée pendant une lecture
+        self.changes = queue.Queue()
 
         self.menu_button = tk.Button(root, text="🔔", font=("Arial", 18), bg="lightblue", command=self.show_menu)
         self.menu_button.place(relx=1.0, rely=1.0, x=-60, y=-60, anchor="se", width=50, height=50)
 
-        self.update_table()
+        self.update_table(full=True)
         self.auto_refresh()
+        self.poll_changes()
 
-    def update_table(self):
-        for row in self.tree.get_children():
-            self.tree.delete(row)
-
-        variables = get_active_variables()
-        for var in variables:
-            (
-                var_id, nom_variable, adresse_opc, description,
-                vtype, vmin, vmax, last_value, last_update,
-                alarme_min, alarme_max
-            ) = var
-
-            valeur_txt = f"{last_value:.2f}" if last_value is not None else "-"
-            alarme_txt = "ACTIVE" if (
-                (last_value is not None and last_value < vmin) or
-                (last_value is not None and last_value > vmax)
-            ) else "OK"
-
-            self.tree.insert("", "end", iid=var_id,
-                             values=(nom_variable, adresse_opc, valeur_txt, vmin, vmax, alarme_txt))
-            if alarme_txt == "ACTIVE":
-                self.tree.item(var_id, tags=("alarme",))
-        self.tree.tag_configure("alarme", background="red", foreground="white")
+    @staticmethod
+    def format_row(nom_variable, adresse_opc, last_value, vmin, vmax):
+        valeur_txt = f"{last_value:.2f}" if last_value is not None else "-"
+        alarme_txt = "ACTIVE" if (
+            (last_value is not None and last_value < vmin) or
+            (last_value is not None and last_value > vmax)
+        ) else "OK"
+        return (nom_variable, adresse_opc, valeur_txt, vmin, vmax, alarme_txt)
+
+    # -------- Filtres, tri et défilement --------
+    def query_params(self):
+        """Paramètres de query_variables() lus depuis les widgets (thread Tk)."""
+        alarme = {"ACTIVE": True, "OK": False}.get(self.filtre_alarme.get())
+        return dict(
+            prefix=self.filtre_nom.get().strip() or None,
+            etat_id=self.equipements.get(self.filtre_equipement.get()),
+            alarme=alarme,
+            order_by=self.order_by,
+            desc=self.desc,
+            limit=PAGE_SIZE,
+            offset=self.offset,
+        )
+
+    def apply_filters(self):
+        self.offset = 0
+        self.update_table(full=True)
+
+    def sort_by(self, colonne):
+        order_by = SORT_COLUMNS[colonne]
+        self.desc = not self.desc if order_by == self.order_by else False
+        self.order_by = order_by
+        self.offset = 0
+        self.update_table(full=True)
+
+    def on_scroll(self, action, value, unit=None):
+        if action == "moveto":
+            self.set_offset(int(float(value) * self.total))
+        elif action == "scroll":
+            pas = PAGE_SIZE if unit == "pages" else 1
+            self.set_offset(self.offset + int(value) * pas)
+
+    def set_offset(self, offset):
+        offset = max(0, min(offset, self.total - PAGE_SIZE))
+        if offset != self.offset:
+            self.offset = offset
+            self.update_scrollbar()
+            self.update_table(full=True)
+
+    def update_scrollbar(self):
+        if self.total:
+            self.scrollbar.set(self.offset / self.total, min(1.0, (self.offset + PAGE_SIZE) / self.total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    # -------- Lecture en arrière-plan --------
+    def live_snapshot(self):
+        """Valeurs en mémoire : surveillance de cette fenêtre, sinon flux en direct, sinon None (base)."""
+        if self.surv.running:
+            return self.surv.snapshot
+        if self.feed.connected:
+            return self.feed.snapshot
+        return None
+
+    def fetch_changes(self, params, full, window_ids, snapshot):
+        """
+        Thread de lecture :
+        - full, ou aucune surveillance joignable → relecture de la fenêtre visible en base
+        - sinon → flux de changements publié par le moteur (Snapshot local ou reçu
+          du flux en direct), limité aux variables de la fenêtre visible
+        Résultat déposé dans self.changes.
+        """
+        try:
+            if full or snapshot is None:
+                self.snapshot_version = snapshot.version if snapshot is not None else 0
+                total, rows = query_variables(**params)
+                if snapshot is not None:
+                    # Valeurs en mémoire plus récentes que la base (écriture différée)
+                    recentes = snapshot.lookup([row[0] for row in rows])
+                    rows = [recentes.get(row[0], row) for row in rows]
+                window = [(var_id, self.format_row(nom_variable, adresse_opc, last_value, vmin, vmax))
+                          for var_id, nom_variable, adresse_opc, last_value, vmin, vmax in rows]
+                self.changes.put(("window", total, window))
+            else:
+                self.snapshot_version, rows = snapshot.changes_since(self.snapshot_version)
+                modifies = {
+                    var_id: self.format_row(nom_variable, adresse_opc, last_value, vmin, vmax)
+                    for var_id, nom_variable, adresse_opc, last_value, vmin, vmax in rows
+                    if var_id in window_ids
+                }
+                if modifies:
+                    self.changes.put(("delta", modifies))
+        except Exception as e:
+            print(f"⚠️ Erreur de lecture des variables : {e}")
+        finally:
+            self.fetching = False
+
+    def apply_changes(self):
+        """Thread Tk : mise à jour en place des seules lignes modifiées."""
+        while True:
+            try:
+                change = self.changes.get_nowait()
+            except queue.Empty:
+                return
+            if change[0] == "window":
+                _, self.total, window = change
+                self.apply_window(window)
+                self.update_scrollbar()
+                self.total_label.config(text=f"{self.total} variables")
+            else:
+                for var_id, valeurs in change[1].items():
+                    if self.tree.exists(var_id):
+                        tags = ("alarme",) if valeurs[5] == "ACTIVE" else ()
+                        self.tree.item(var_id, values=valeurs, tags=tags)
+
+    def apply_window(self, window):
+        """Remplace la fenêtre affichée en réutilisant les lignes déjà présentes."""
+        ids = {str(var_id) for var_id, _ in window}
+        for iid in self.tree.get_children():
+            if iid not in ids:
+                self.tree.delete(iid)
+        for index, (var_id, valeurs) in enumerate(window):
+            tags = ("alarme",) if valeurs[5] == "ACTIVE" else ()
+            if self.tree.exists(var_id):
+                self.tree.item(var_id, values=valeurs, tags=tags)
+                self.tree.move(var_id, "", index)
+            else:
+                self.tree.insert("", index, iid=var_id, values=valeurs, tags=tags)
+        self.window_ids = {var_id for var_id, _ in window}
+
+    def update_table(self, full=False):
+        """Lance une lecture en arrière-plan (full=True : relecture de la fenêtre en base)."""
+        if self.fetching:
+            self.refetch = self.refetch or full
+            return
+        snapshot = self.live_snapshot()
+        if snapshot is not self.source:
+            # Changement de source (surveillance démarrée / arrêtée, flux connecté / perdu)
+            self.source = snapshot
+            full = True
+        self.fetching = True
+        threading.Thread(target=self.fetch_changes,
+                         args=(self.query_params(), full, set(self.window_ids), snapshot),
+                         daemon=True).start()
 
     def auto_refresh(self):
         self.update_table()
         self.root.after(3000, self.auto_refresh)
 
+    def poll_changes(self):
+        self.apply_changes()
+        if self.refetch and not self.fetching:
+            self.refetch = False
+            self.update_table(full=True)
+        self.root.after(200, self.poll_changes)
+
     def show_menu(self):
         menu = tk.Menu(self.root, tearoff=0)
         menu.add_command(label="▶️ Activer Surveillance", command=self.start_surveillance)
         menu.add_command(label="⏹ Désactiver Surveillance", command=self.stop_surveillance)
         menu.add_command(label="📑 Générer Rapport", command=self.show_report)
         menu.add_command(label="➕ Ajouter un Élément", command=self.add_variable)
+        menu.add_command(label="📥 Importer des Variables", command=self.import_variables)
         menu.add_command(label="🌐 Accéder Dashboard", command=self.open_dashboard)
         try:
             menu.tk_popup(self.menu_button.winfo_rootx(), self.menu_button.winfo_rooty() - 10)
@@ -94,11 +298,46 @@ class SurveillanceUI:
         messagebox.showinfo("Surveillance", "🛑 Surveillance arrêtée")
 
     def show_report(self):
-        try:
-            filename = generate_daily_report()
-            messagebox.showinfo("Rapport", f"📑 Rapport généré : {filename}")
-        except Exception as e:
-            messagebox.showerror("Erreur", f"Impossible de générer le rapport : {e}")
+        """Génération du rapport en arrière-plan avec une fenêtre de progression."""
+        fenetre = tk.Toplevel(self.root)
+        fenetre.title("Rapport")
+        libelle = tk.Label(fenetre, text="Préparation…", width=45)
+        libelle.pack(padx=10, pady=5)
+        barre = ttk.Progressbar(fenetre, length=300, maximum=1.0)
+        barre.pack(padx=10, pady=10)
+
+        # Le thread du rapport ne touche pas à Tk : il passe par une file lue ici
+        messages = queue.Queue()
+
+        def suivre():
+            fin = None
+            while True:
+                try:
+                    message = messages.get_nowait()
+                except queue.Empty:
+                    break
+                if message[0] == "progress":
+                    barre["value"], texte = message[1], message[2]
+                    libelle.config(text=texte)
+                else:
+                    fin = message
+            if fin is None:
+                fenetre.after(100, suivre)
+                return
+            fenetre.destroy()
+            _, filename, erreur = fin
+            if erreur is None:
+                messagebox.showinfo("Rapport", f"📑 Rapport généré : {filename}")
+            else:
+                messagebox.showerror("Erreur", f"Impossible de générer le rapport : {erreur}")
+
+        # Import ici : fpdf n'est chargé qu'au premier rapport (démarrage de l'interface plus rapide)
+        from report import generate_report_in_background
+        generate_report_in_background(
+            on_done=lambda filename, erreur: messages.put(("done", filename, erreur)),
+            progress=lambda fraction, texte: messages.put(("progress", fraction, texte)),
+        )
+        suivre()
 
     def add_variable(self):
         """Ajout manuel d’une variable avec un petit formulaire."""
@@ -114,6 +353,16 @@ class SurveillanceUI:
             entry.grid(row=i, column=1, padx=5, pady=5)
             entries[label] = entry
 
+        tk.Label(form, text="Équipement").grid(row=len(labels), column=0, padx=5, pady=5, sticky="w")
+        equipement = ttk.Combobox(form, values=["-"] + list(self.equipements), state="readonly")
+        equipement.set("-")
+        equipement.grid(row=len(labels), column=1, padx=5, pady=5)
+
+        tk.Label(form, text="Classe de scrutation").grid(row=len(labels) + 1, column=0, padx=5, pady=5, sticky="w")
+        classe = ttk.Combobox(form, values=list(SCAN_CLASSES), state="readonly")
+        classe.set(SCAN_CLASS_DEFAULT)
+        classe.grid(row=len(labels) + 1, column=1, padx=5, pady=5)
+
         def valider():
             try:
                 nom = entries["Nom"].get()
@@ -125,15 +374,50 @@ class SurveillanceUI:
                 val_init = float(entries["Valeur initiale"].get())
 
                 from database import insert_variable
-                insert_variable(nom, adresse, desc, vtype, vmin, vmax, val_init)
+                insert_variable(nom, adresse, desc, vtype, vmin, vmax, val_init,
+                                etat_id=self.equipements.get(equipement.get()), scan_class=classe.get())
 
-                self.update_table()
+                self.update_table(full=True)
                 messagebox.showinfo("Ajout", f"✅ Variable {nom} ajoutée avec succès")
                 form.destroy()
             except Exception as e:
                 messagebox.showerror("Erreur", f"Impossible d’ajouter la variable : {e}")
 
-        tk.Button(form, text="Valider", command=valider).grid(row=len(labels), column=0, columnspan=2, pady=10)
+        tk.Button(form, text="Valider", command=valider).grid(row=len(labels) + 2, column=0, columnspan=2, pady=10)
+
+    def import_variables(self):
+        """Import en masse d'un fichier CSV / JSON dans un thread (voir tag_import.py)."""
+        chemin = filedialog.askopenfilename(
+            title="Importer des variables",
+            filetypes=[("CSV ou JSON", "*.csv *.json"), ("Tous les fichiers", "*.*")])
+        if not chemin:
+            return
+
+        resultat = queue.Queue()
+
+        def importer():
+            from tag_import import import_tags
+            try:
+                resultat.put((import_tags(chemin), None))
+            except Exception as e:
+                resultat.put((None, e))
+
+        def suivre():
+            try:
+                res, erreur = resultat.get_nowait()
+            except queue.Empty:
+                self.root.after(200, suivre)
+                return
+            if erreur is not None:
+                messagebox.showerror("Erreur", f"Impossible d’importer le fichier : {erreur}")
+                return
+            from tag_import import summary
+            details = "\n".join(f"Ligne {numero} : {message}" for numero, message in res["erreurs"][:10])
+            messagebox.showinfo("Import", f"📥 {summary(res)}" + (f"\n\n{details}" if details else ""))
+            self.update_table(full=True)
+
+        threading.Thread(target=importer, daemon=True).start()
+        suivre()
 
     def open_dashboard(self):
         cmd = ["python", "-m", "streamlit", "run", "dashboard.py"]
@@ -0,0 +1,324 @@
+# writeback.py
+"""
+Écriture différée des scans en base, avec stockage et retransmission :
+- les lots attendent dans une file en mémoire bornée ; quand elle est pleine (base
+  verrouillée par le dashboard ou un rapport, disque lent…), les lots suivants vont à un
+  journal disque en ajout seul jusqu'à ce qu'il soit vidé → ordre conservé
+- un lot contenant des événements d'alarme est toujours journalisé (fsync)
+- WRITEBACK_JOURNAL_ALL = True : tous les lots passent par le journal (aucun lot perdu
+  même si le processus est tué, au prix d'une écriture disque par scan)
+- le journal n'est ouvert (et rejoué) que par le processus qui fait l'acquisition
+  (Surveillance.start)
+- une écriture refusée par SQLite (sqlite3.OperationalError : base verrouillée, erreur
+  d'E/S, disque plein) est réessayée (backoff jusqu'à WRITEBACK_RETRY_MAX) : rien n'est perdu
+- toute autre erreur vient du lot lui-même (réessayer ne changerait rien) : il est mis en
+  quarantaine dans <journal>.rejets et l'écriture continue avec les suivants
+- chaque lot porte un numéro, enregistré dans la même transaction que le lot : au
+  redémarrage le journal est rejoué dans l'ordre, les lots déjà écrits sont ignorés
+- journal trop gros (WRITEBACK_JOURNAL_MAX_MB) → submit() attend : contre-pression sur le scan
+- close() arrête le thread d'écriture et ferme le journal (Surveillance.close_writer)
+"""
+import os
+import pickle
+import sqlite3
+import struct
+import threading
+import time
+from collections import deque
+
+import database
+from config import (
+    REGISTRY_WRITEBACK_QUEUE, WRITEBACK_JOURNAL, WRITEBACK_JOURNAL_ALL,
+    WRITEBACK_JOURNAL_MAX_MB, WRITEBACK_RETRY_MAX,
+)
+
+# En-tête d'un enregistrement du journal : longueur du lot picklé, numéro du lot
+_HEADER = struct.Struct("<QQ")
+
+
+class Journal:
+    """
+    Fichier en ajout seul, un enregistrement par lot : [longueur][numéro][lot picklé].
+    Lu séquentiellement à partir de `offset` (premier lot pas encore écrit en base) ;
+    un enregistrement incomplet en fin de fichier (arrêt pendant l'écriture) est ignoré.
+    Non protégé : les appels sont faits sous le verrou de WriteBehind.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "a+b")
+        self.size = self.file.seek(0, os.SEEK_END)
+        self.offset = 0
+        self.generation = 0     # incrémenté à chaque réécriture (positions invalidées)
+
+    def __len__(self):
+        """Octets en attente de rejeu."""
+        return self.size - self.offset
+
+    @staticmethod
+    def _record(seq, lot):
+        data = pickle.dumps(lot, protocol=pickle.HIGHEST_PROTOCOL)
+        return _HEADER.pack(len(data), seq) + data
+
+    def append(self, seq, lot, sync=False):
+        record = self._record(seq, lot)
+        self.file.write(record)
+        self.file.flush()
+        if sync:
+            os.fsync(self.file.fileno())
+        self.size += len(record)
+
+    def peek(self):
+        """(numéro, lot, taille) du prochain enregistrement non rejoué, ou None."""
+        if self.offset >= self.size:
+            return None
+        self.file.seek(self.offset)
+        entete = self.file.read(_HEADER.size)
+        if len(entete) == _HEADER.size:
+            longueur, seq = _HEADER.unpack(entete)
+            data = self.file.read(longueur)
+            if len(data) == longueur:
+                try:
+                    return seq, pickle.loads(data), _HEADER.size + longueur
+                except Exception:
+                    pass
+        print(f"⚠️ Journal d'écriture incomplet ({self.path}) : tronqué à {self.offset} octets")
+        self.file.truncate(self.offset)
+        self.size = self.offset
+        return None
+
+    def advance(self, taille):
+        self.offset += taille
+        if self.offset >= self.size:
+            self.reset()
+
+    def pending(self):
+        """[(numéro, lot)] de tous les enregistrements non rejoués (sans avancer)."""
+        debut, lots = self.offset, []
+        while (record := self.peek()) is not None:
+            lots.append(record[:2])
+            self.offset += record[2]
+        self.offset = debut
+        return lots
+
+    def seqs(self):
+        """Numéros des lots présents dans le fichier (lecture des seuls en-têtes)."""
+        numeros, position = [], 0
+        while position + _HEADER.size <= self.size:
+            self.file.seek(position)
+            longueur, seq = _HEADER.unpack(self.file.read(_HEADER.size))
+            position += _HEADER.size + longueur
+            if position <= self.size:
+                numeros.append(seq)
+        return numeros
+
+    def reset(self):
+        self.file.truncate(0)
+        self.size = self.offset = 0
+
+    def rewrite(self, lots):
+        """Remplace le contenu par `lots` [(numéro, lot)] (fichier temporaire puis renommage atomique)."""
+        temporaire = self.path + ".tmp"
+        with open(temporaire, "wb") as f:
+            for seq, lot in lots:
+                f.write(self._record(seq, lot))
+            f.flush()
+            os.fsync(f.fileno())
+        self.file.close()
+        os.replace(temporaire, self.path)
+        self.file = open(self.path, "a+b")
+        self.size = self.file.seek(0, os.SEEK_END)
+        self.offset = 0
+        self.generation += 1
+
+    def close(self):
+        self.file.close()
+
+
+class WriteBehind:
+    """
+    Écriture des scans en base dans un thread dédié (voir l'en-tête du module).
+    submit() ne bloque que si le journal dépasse WRITEBACK_JOURNAL_MAX_MB.
+    Le journal est propre à la base de destination (<DB_FILE>.journal par défaut).
+    """
+
+    def __init__(self, maxsize=REGISTRY_WRITEBACK_QUEUE, journal=WRITEBACK_JOURNAL,
+                 journal_all=WRITEBACK_JOURNAL_ALL, journal_max_mb=WRITEBACK_JOURNAL_MAX_MB,
+                 retry_max=WRITEBACK_RETRY_MAX):
+        self.maxsize = maxsize
+        self.journal_all = journal_all
+        self.journal_max = journal_max_mb * 1024 * 1024
+        self.retry_max = retry_max
+        self.cond = threading.Condition()
+        self.memory = deque()                   # [(numéro, lot)], plus anciens que le journal
+        self.journal = Journal(journal or f"{database.DB_FILE}.journal")
+        # Lots restés dans le journal (exécution précédente) : rejoués avant les nouveaux
+        self.spilling = self.journal.size > 0
+        self.committed = database.get_writeback_seq()
+        numeros = self.journal.seqs()
+        self.seq = max([self.committed, *numeros])
+        self.last_committed_ts = 0.0
+        self.pending_since = 0.0
+        self.stats = {"batches": 0, "rows": 0, "errors": 0, "journaled": 0, "replayed": 0,
+                      "skipped": 0, "quarantined": 0, "blocked_s": 0.0}
+        self.stop = threading.Event()
+        a_rejouer = sum(seq > self.committed for seq in numeros)
+        if a_rejouer:
+            print(f"🔁 Journal d'écriture : {a_rejouer} lots à rejouer ({self.journal.path})")
+        self.thread = threading.Thread(target=self._worker, daemon=True)
+        self.thread.start()
+
+    def submit(self, ids, values, quality, events=(), acquits=(), bad=()):
+        """
+        Dépose un lot : ids / values / quality (tableaux NumPy), événements, acquittements
+        et lectures en échec [(var_id, qualité)] (voir database.flush_scan).
+        """
+        lot = (time.time(), ids, values, quality, events, acquits, bad)
+        durable = bool(events or acquits)
+        with self.cond:
+            while len(self.journal) > self.journal_max:
+                debut = time.monotonic()
+                self.cond.wait(0.5)
+                self.stats["blocked_s"] += time.monotonic() - debut
+            if not self.pending():
+                self.pending_since = lot[0]
+            self.seq += 1
+            if self.spilling or self.journal_all or durable or len(self.memory) >= self.maxsize:
+                self.spilling = True
+                self.journal.append(self.seq, lot, sync=durable)
+                self.stats["journaled"] += 1
+            else:
+                self.memory.append((self.seq, lot))
+            self.cond.notify_all()
+
+    # -------- Contre-pression --------
+    def pending(self):
+        """Lots déposés pas encore écrits en base."""
+        return self.seq - self.committed
+
+    def journal_bytes(self):
+        return len(self.journal)
+
+    def lag(self):
+        """Retard d'écriture (s) : âge approximatif du plus ancien lot en attente."""
+        if not self.pending():
+            return 0.0
+        return time.time() - max(self.pending_since, self.last_committed_ts)
+
+    # -------- Attente / arrêt --------
+    def flush(self, timeout=None):
+        """Attend que tous les lots déposés soient écrits ; False si `timeout` est dépassé."""
+        fin = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            while self.committed < self.seq:
+                reste = None if fin is None else fin - time.monotonic()
+                if reste is not None and reste <= 0:
+                    return False
+                self.cond.wait(reste)
+        return True
+
+    def spill(self):
+        """
+        Arrêt sans perte quand la base n'a pas suivi : les lots encore en mémoire sont
+        placés dans le journal, devant les lots déjà journalisés. Retourne leur nombre.
+        """
+        with self.cond:
+            if not self.memory:
+                return 0
+            nombre = len(self.memory)
+            self.journal.rewrite(list(self.memory) + self.journal.pending())
+            self.memory.clear()
+            self.spilling = True
+            self.stats["journaled"] += nombre
+            return nombre
+
+    def close(self):
+        """
+        Arrête le thread d'écriture (après le lot en cours) et ferme le journal ;
+        les lots pas encore écrits restent dans le journal. Retourne leur nombre.
+        """
+        with self.cond:
+            self.stop.set()
+            self.cond.notify_all()
+        self.thread.join()
+        self.spill()
+        self.journal.close()
+        return self.pending()
+
+    # -------- Thread d'écriture --------
+    def _next(self):
+        """Prochain lot dans l'ordre : mémoire d'abord (plus ancienne), puis journal ; None à l'arrêt."""
+        with self.cond:
+            while not self.stop.is_set():
+                if self.memory:
+                    seq, lot = self.memory[0]
+                    return seq, lot, None, None
+                record = self.journal.peek()
+                if record is not None:
+                    seq, lot, taille = record
+                    return seq, lot, taille, self.journal.generation
+                if self.spilling and not self.journal_all:
+                    self.journal.reset()
+                    self.spilling = False
+                self.cond.wait()
+            return None
+
+    def _done(self, seq, lot, taille, generation):
+        with self.cond:
+            self.committed = max(self.committed, seq)
+            self.last_committed_ts = lot[0]
+            if taille is None:
+                if self.memory and self.memory[0][0] == seq:
+                    self.memory.popleft()
+            elif generation == self.journal.generation:
+                self.journal.advance(taille)
+            self.cond.notify_all()
+
+    def _quarantine(self, seq, lot, erreur):
+        """Lot impossible à écrire : mis de côté dans <journal>.rejets (même format que le journal)."""
+        self.stats["quarantined"] += 1
+        chemin = self.journal.path + ".rejets"
+        print(f"❌ Lot {seq} rejeté par la base ({erreur!r}) : mis en quarantaine dans {chemin}")
+        try:
+            rejets = Journal(chemin)
+            try:
+                rejets.append(seq, lot, sync=True)
+            finally:
+                rejets.close()
+        except Exception as e:
+            print(f"⚠️ Quarantaine impossible ({e}) : lot {seq} abandonné")
+
+    def _worker(self):
+        echecs = 0
+        while (suivant := self._next()) is not None:
+            seq, lot, taille, generation = suivant
+            if seq <= self.committed:           # déjà en base (rejeu après un arrêt)
+                self.stats["skipped"] += 1
+                self._done(seq, lot, taille, generation)
+                continue
+
+            ts, ids, values, quality, events, acquits, bad = lot
+            try:
+                database.flush_scan(list(zip(ids.tolist(), values.tolist(), quality.tolist())),
+                                    events, acquits, bad, ts=ts, seq=seq)
+            except sqlite3.OperationalError as e:
+                echecs += 1
+                self.stats["errors"] += 1
+                if echecs == 1:
+                    print(f"⚠️ Écriture en base impossible ({e}) : lots conservés, nouvel essai…")
+                self.stop.wait(min(self.retry_max, 0.1 * 2 ** (echecs - 1)))
+                continue
+            except Exception as e:
+                self.stats["errors"] += 1
+                self._quarantine(seq, lot, e)
+                self._done(seq, lot, taille, generation)
+                continue
+
+            if echecs:
+                print(f"✅ Écriture en base rétablie après {echecs} essais ({self.pending() - 1} lots en attente)")
+                echecs = 0
+            self.stats["batches"] += 1
+            self.stats["rows"] += len(ids) + len(events) + len(bad)
+            if taille is not None:
+                self.stats["replayed"] += 1
+            self._done(seq, lot, taille, generation)